@@ -0,0 +1,74 @@
+"""
+Account Roster
+A user's TikTok accounts with their scheduled post counts and next scheduled
+time, loaded in one grouped query for the dashboard
+"""
+
+import logging
+
+from sqlalchemy import func, case
+
+from models import db, TikTokAccount, ScheduledPost
+from serializers import iso_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Scheduled post statuses counted per account
+ROSTER_STATUSES = ('pending', 'processing', 'completed', 'failed')
+
+# Account columns the dashboard renders (tokens and scopes never leave the server)
+ROSTER_ACCOUNT_FIELDS = ('id', 'username', 'display_name', 'avatar_url', 'is_verified', 'is_active',
+                         'follower_count', 'following_count', 'likes_count', 'video_count')
+
+
+def load_account_roster(user_id, active_only=False):
+    """
+    Load a user's accounts with per-account scheduled post statistics.
+
+    Post counts are aggregated per account in a subquery and outer-joined to
+    the accounts, so the whole roster is a single statement no matter how
+    many accounts or posts the user has (instead of one query per account).
+
+    Args:
+        user_id: Owner of the accounts
+        active_only: Skip deactivated accounts
+
+    Returns:
+        list: One dict per account (ROSTER_ACCOUNT_FIELDS plus 'scheduled'
+              with a count per ROSTER_STATUSES entry and next_scheduled_time)
+    """
+    counts = [
+        func.count(case((ScheduledPost.status == status, 1))).label(status)
+        for status in ROSTER_STATUSES
+    ]
+    stats = (
+        db.session.query(
+            ScheduledPost.tiktok_account_id.label('account_id'),
+            *counts,
+            func.min(case((ScheduledPost.status == 'pending', ScheduledPost.scheduled_time))).label('next_scheduled_time')
+        )
+        .filter(ScheduledPost.user_id == user_id)
+        .group_by(ScheduledPost.tiktok_account_id)
+        .subquery()
+    )
+
+    query = (
+        db.session.query(
+            *(getattr(TikTokAccount, name) for name in ROSTER_ACCOUNT_FIELDS),
+            *(getattr(stats.c, status) for status in ROSTER_STATUSES),
+            stats.c.next_scheduled_time
+        )
+        .outerjoin(stats, stats.c.account_id == TikTokAccount.id)
+        .filter(TikTokAccount.user_id == user_id)
+        .order_by(TikTokAccount.id)
+    )
+    if active_only:
+        query = query.filter(TikTokAccount.is_active.is_(True))
+
+    roster = []
+    for row in query:
+        account = {name: getattr(row, name) for name in ROSTER_ACCOUNT_FIELDS}
+        account['scheduled'] = {status: getattr(row, status) or 0 for status in ROSTER_STATUSES}
+        account['scheduled']['next_scheduled_time'] = iso_timestamp(row.next_scheduled_time)
+        roster.append(account)
+    return roster
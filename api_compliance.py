@@ -8,7 +8,9 @@ from flask_login import login_required, current_user
 from models import db, TikTokAccount
 from tiktok_compliance import TikTokComplianceValidator, TikTokPostStatusMonitor, TikTokAPIErrorHandler
 from config import TikTokConfig
-import requests
+from tiktok_client import tiktok_client
+from chunked_upload import build_source_info
+from creator_info_cache import creator_info_cache
 import logging
 import os
 
@@ -17,9 +19,6 @@ logger = logging.getLogger(__name__)
 # Create blueprint
 compliance_bp = Blueprint('compliance', __name__)
 
-# TikTok API configuration
-TIKTOK_BASE_URL = 'https://open.tiktokapis.com/v2'
-
 
 @compliance_bp.route('/api/creator/info/enhanced', methods=['GET'])
 @login_required
@@ -50,19 +49,10 @@ def get_enhanced_creator_info():
         if not account:
             return jsonify({'error': 'No TikTok account found'}), 404
         
-        # Make API request to get creator info
-        headers = {
-            'Authorization': f'Bearer {account.access_token}',
-            'Content-Type': 'application/json; charset=UTF-8'
-        }
-        
-        response = requests.post(
-            f'{TIKTOK_BASE_URL}/post/publish/creator_info/query/',
-            headers=headers
-        )
+        # Get creator info (cached briefly per account)
+        status_code, creator_data = creator_info_cache.get(account.id, account.access_token)
         
-        if response.status_code == 200:
-            creator_data = response.json()
+        if status_code == 200:
             
             # Add account info to response
             if 'data' in creator_data:
@@ -80,7 +70,7 @@ def get_enhanced_creator_info():
             
             return jsonify(creator_data)
         else:
-            error_data = response.json()
+            error_data = creator_data
             logger.error(f"Failed to fetch creator info: {error_data}")
             
             # Handle specific errors
@@ -93,9 +83,9 @@ def get_enhanced_creator_info():
                 return jsonify({
                     'error': friendly_error,
                     'error_code': error_code
-                }), response.status_code
+                }), status_code
             
-            return jsonify(error_data), response.status_code
+            return jsonify(error_data), status_code
             
     except Exception as e:
         logger.error(f"Error fetching creator info: {str(e)}")
@@ -128,23 +118,15 @@ def post_video_compliant():
         
         # Step 1: Fetch and validate creator info (Requirement 1)
         logger.info("Fetching creator info for compliance check...")
-        headers = {
-            'Authorization': f'Bearer {account.access_token}',
-            'Content-Type': 'application/json; charset=UTF-8'
-        }
-        
-        creator_response = requests.post(
-            f'{TIKTOK_BASE_URL}/post/publish/creator_info/query/',
-            headers=headers
-        )
+        creator_status, creator_response = creator_info_cache.get(account.id, account.access_token)
         
-        if creator_response.status_code != 200:
+        if creator_status != 200:
             return jsonify({
                 'error': 'Unable to verify creator capabilities',
-                'details': creator_response.json()
+                'details': creator_response
             }), 400
         
-        creator_info = creator_response.json().get('data', {})
+        creator_info = creator_response.get('data', {})
         
         # Requirement 1b: Check if creator can post
         can_post, error_msg = TikTokComplianceValidator.validate_creator_can_post(creator_info)
@@ -249,13 +231,12 @@ def post_video_compliant():
                 'video_url': data.get('video_url')
             }
         else:
-            video_size = data.get('video_size', 0)
-            source_info = {
-                'source': 'FILE_UPLOAD',
-                'video_size': video_size,
-                'chunk_size': video_size,
-                'total_chunk_count': 1
-            }
+            # Chunk sizes must follow TikTok's media transfer rules and match
+            # what /api/post/upload/chunk later sends
+            try:
+                source_info = build_source_info(int(data.get('video_size', 0)), data.get('chunk_size'))
+            except (TypeError, ValueError) as e:
+                return jsonify({'error': f'Invalid video_size: {e}'}), 400
         
         # Make the actual post request
         request_body = {
@@ -266,16 +247,21 @@ def post_video_compliant():
         logger.info(f"Posting video with compliance checks passed")
         logger.info(f"Post info: {post_info}")
         
-        response = requests.post(
-            f'{TIKTOK_BASE_URL}/post/publish/video/init/',
-            headers=headers,
-            json=request_body
-        )
+        response = tiktok_client.publish_video_init(account.access_token, request_body)
         
         response_data = response.json()
         
         if response.status_code == 200:
+            # Posting changes the creator's quota, so the cached info is stale
+            creator_info_cache.invalidate(account.id)
+            
             # Success - add compliance info to response
+            if source_info['source'] == 'FILE_UPLOAD':
+                response_data['upload_plan'] = {
+                    'chunk_size': source_info['chunk_size'],
+                    'total_chunk_count': source_info['total_chunk_count']
+                }
+            
             response_data['compliance'] = {
                 'creator_nickname': creator_info.get('creator_nickname'),
                 'content_label': TikTokComplianceValidator.get_content_label(
@@ -288,6 +274,7 @@ def post_video_compliant():
             return jsonify(response_data)
         else:
             # Handle API errors
+            creator_info_cache.invalidate_on_error(account.id, response_data)
             if 'error' in response_data:
                 error_code = response_data['error'].get('code')
                 friendly_error = TikTokAPIErrorHandler.get_user_friendly_error(
@@ -339,20 +326,7 @@ def get_enhanced_post_status(publish_id):
         if not account:
             return jsonify({'error': 'No TikTok account found'}), 404
         
-        headers = {
-            'Authorization': f'Bearer {account.access_token}',
-            'Content-Type': 'application/json; charset=UTF-8'
-        }
-        
-        request_body = {
-            'publish_id': publish_id
-        }
-        
-        response = requests.post(
-            f'{TIKTOK_BASE_URL}/post/publish/status/fetch/',
-            headers=headers,
-            json=request_body
-        )
+        response = tiktok_client.publish_status(account.access_token, publish_id)
         
         if response.status_code == 200:
             response_data = response.json()
@@ -428,20 +402,12 @@ def validate_video():
             return jsonify({'error': 'Account not found'}), 404
         
         # Fetch creator info for validation
-        headers = {
-            'Authorization': f'Bearer {account.access_token}',
-            'Content-Type': 'application/json; charset=UTF-8'
-        }
-        
-        creator_response = requests.post(
-            f'{TIKTOK_BASE_URL}/post/publish/creator_info/query/',
-            headers=headers
-        )
+        creator_status, creator_response = creator_info_cache.get(account.id, account.access_token)
         
-        if creator_response.status_code != 200:
+        if creator_status != 200:
             return jsonify({'error': 'Unable to fetch creator info'}), 400
         
-        creator_info = creator_response.json().get('data', {})
+        creator_info = creator_response.get('data', {})
         
         validation_results = {
             'is_valid': True,
@@ -1,25 +1,10 @@
-# Disable NNPACK before any imports to prevent warnings on Cloud Run
 import os
-os.environ.setdefault('USE_NNPACK', '0')
-os.environ.setdefault('PYTORCH_DISABLE_NNPACK', '1')
-
-# Force CPU on Cloud Run (no GPU available)
-is_cloud_run = os.getenv('K_SERVICE') is not None or os.getenv('GAE_ENV') is not None
-if is_cloud_run:
-    os.environ.setdefault('FORCE_CPU', '1')
-    # Set model cache to writable location
-    cache_dir = os.path.join(os.getcwd(), '.cache')
-    os.makedirs(cache_dir, exist_ok=True)
-    os.environ.setdefault('XDG_CACHE_HOME', cache_dir)
-
-# Suppress NNPACK warnings
-import warnings
-warnings.filterwarnings('ignore', message='.*NNPACK.*')
-warnings.filterwarnings('ignore', category=UserWarning, module='torch')
+# Imported first so that, with STARTUP_PROFILE=1, every later import is timed
+from startup_profile import startup_profiler, STARTUP_LAZY_IMPORTS
 
 import secrets
 import requests
-from flask import Flask, render_template, redirect, request, session, jsonify, url_for, send_from_directory, flash
+from flask import Flask, render_template, redirect, request, session, jsonify, url_for, send_from_directory, send_file, flash
 from flask_login import LoginManager, login_required, current_user
 from dotenv import load_dotenv
 from urllib.parse import urlencode
@@ -28,16 +13,34 @@ import time
 import hashlib
 import base64
 from datetime import datetime, timedelta
-from flask_migrate import Migrate
-from models import db, User, TikTokAccount, ScheduledPost, PostedVideo
+from models import db, User, TikTokAccount, ScheduledPost, PostedVideo, UploadedFile
 import json
 from config import TikTokConfig
+from streaming_upload import MultipartFileStream, HashingRequest, file_sha256
+from sqlalchemy.exc import IntegrityError
 
 load_dotenv()
 
+from scheduled_dispatcher import get_dispatcher, claim_due_posts
+from tiktok_client import tiktok_client, TIKTOK_BASE_URL, TIKTOK_TOKEN_URL
+from chunked_upload import ChunkedUploader
+from publish_status_tracker import status_tracker, STATUS_LONG_POLL_MAX_WAIT
+from creator_info_cache import creator_info_cache
+from token_refresh import apply_token_response, build_refresh_params
+from profile_sync import profile_revalidator
+from render_jobs import render_queue, RenderCapacityError
+from user_cache import user_cache
+from db_engine import get_database_url, engine_options, attach_pool_metrics, pool_stats
+from db_bootstrap import migrate_database, check_schema_version, init_migrate, register_migrate_command
+from pagination import parse_page_args, paginate, PaginationError
+from serializers import scheduled_post_serializer, posted_video_serializer, FieldSelectionError
+from account_roster import load_account_roster
+
 import logging
 import sys
 
+startup_profiler.checkpoint('imports')
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(message)s',
@@ -80,30 +83,38 @@ if os.environ.get('FLASK_ENV') == 'production' or os.environ.get('GAE_ENV', '').
     logger.propagate = False
 
 app = Flask(__name__)
+# Uploads are hashed while they are received, for deduplication
+app.request_class = HashingRequest
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', secrets.token_urlsafe(32))
 app.config['WTF_CSRF_SECRET_KEY'] = os.environ.get('WTF_CSRF_SECRET_KEY', secrets.token_urlsafe(32))
 
-database_url = os.environ.get('DATABASE_URL')
-
 # Log the database configuration status
-if database_url:
-    logger.info(f"DATABASE_URL found: {database_url[:30]}...")
-    # Fix for Railway PostgreSQL URL (postgresql:// -> postgresql+psycopg2://)
-    if database_url.startswith('postgresql://'):
-        database_url = database_url.replace('postgresql://', 'postgresql+psycopg2://', 1)
-        logger.info("Converted database URL to use psycopg2 driver")
+if os.environ.get('DATABASE_URL'):
+    logger.info(f"DATABASE_URL found: {os.environ['DATABASE_URL'][:30]}...")
 else:
     logger.warning("DATABASE_URL not found in environment variables")
-    # Use a default SQLite database for development
-    database_url = 'sqlite:///app.db'
     logger.info("Using SQLite database for development")
 
+# URL normalization and pool settings are shared with background_jobs
+database_url = get_database_url()
 app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+startup_profiler.checkpoint('app_config')
+
 # Always initialize db with the app
 db.init_app(app)
-migrate = Migrate(app, db)
+with app.app_context():
+    # Creating the engine does not connect; it just lets metrics hook its pool
+    attach_pool_metrics(db.engine)
+# Flask-Migrate (alembic) is only needed by migration commands
+if STARTUP_LAZY_IMPORTS:
+    register_migrate_command(app)
+else:
+    init_migrate(app)
+status_tracker.init_app(app)
+profile_revalidator.init_app(app)
 
 # Initialize Flask-Login
 login_manager = LoginManager()
@@ -112,47 +123,34 @@ login_manager.login_view = 'auth.login'
 login_manager.login_message = 'Please log in to access this page.'
 login_manager.login_message_category = 'info'
 
+user_cache.init_app(app)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Served from a short-lived snapshot; falls back to the database on a miss
+    return user_cache.load(user_id)
 
-def init_database():
-    """Initialize database tables - safe for production"""
+# Migrations run once per release (`flask --app app migrate-db` as a Cloud Run job,
+# see cloudbuild.yaml), never on the request path; the server only checks the
+# schema version at boot
+startup_profiler.checkpoint('extensions')
+
+if os.environ.get('WERKZEUG_RUN_MAIN') == 'true' or __name__ == '__main__':
     try:
-        with app.app_context():
-            logger.info(f"Attempting to connect to database: {app.config.get('SQLALCHEMY_DATABASE_URI', 'Not configured')[:50]}...")
-            
-            # Create tables if they don't exist
-            db.create_all()
-            logger.info("Database tables created/verified")
-            
-            # Only run migrations if migrations folder exists
-            if os.path.exists('migrations'):
-                from flask_migrate import upgrade
-                upgrade()
-                logger.info("Database migrations applied successfully")
-            else:
-                logger.info("Migrations folder not found, skipping migrations")
+        migrate_database(app)
     except Exception as e:
         logger.error(f"Database initialization error: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
+elif os.environ.get('FLASK_RUN_FROM_CLI') != 'true':
+    # Skipped for CLI commands such as migrate-db, which would only warn about
+    # the schema they are about to upgrade
+    check_schema_version(app)
 
-if os.environ.get('WERKZEUG_RUN_MAIN') == 'true' or __name__ == '__main__':
-    init_database()
-else:
-    @app.before_request
-    def initialize_database():
-        if not hasattr(app, 'db_initialized'):
-            init_database()
-            app.db_initialized = True
+startup_profiler.checkpoint('schema_check')
 
 TIKTOK_CLIENT_KEY = os.environ.get('TIKTOK_CLIENT_KEY')
 TIKTOK_CLIENT_SECRET = os.environ.get('TIKTOK_CLIENT_SECRET')
 TIKTOK_REDIRECT_URI = os.environ.get('TIKTOK_REDIRECT_URI')
 TIKTOK_AUTH_URL = 'https://www.tiktok.com/v2/auth/authorize/'
-TIKTOK_TOKEN_URL = 'https://open.tiktokapis.com/v2/oauth/token/'
-TIKTOK_BASE_URL = 'https://open.tiktokapis.com/v2'
 
 ALLOWED_EXTENSIONS = {'mp4', 'mov', 'avi', 'flv', 'wmv'}
 MAX_CONTENT_LENGTH = 500 * 1024 * 1024
@@ -164,8 +162,7 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 def index():
     try:
         if current_user.is_authenticated:
-            tiktok_accounts = TikTokAccount.query.filter_by(user_id=current_user.id).all()
-            return render_template('dashboard.html', tiktok_accounts=tiktok_accounts)
+            return render_dashboard()
         return render_template('index.html')
     except Exception as e:
         return jsonify({'error': str(e)})
@@ -297,7 +294,7 @@ def debug_db():
             'tables': tables,
             'user_count': user_count,
             'scheduled_post_count': scheduled_post_count,
-            'db_initialized': hasattr(app, 'db_initialized')
+            'schema_current': check_schema_version(app)
         })
     except Exception as e:
         return jsonify({
@@ -307,6 +304,13 @@ def debug_db():
         }), 500
 
 
+@app.route('/debug/db-pool')
+@login_required
+def debug_db_pool():
+    """Connection pool usage for this instance (counts only, safe in production)"""
+    return jsonify(pool_stats(db.engine))
+
+
 @app.route('/debug/delete-test-user', methods=['DELETE'])
 def delete_test_user():
     # Only show in development
@@ -442,13 +446,8 @@ def tiktok_callback():
         'code_verifier': session.get('code_verifier')
     }
     
-    headers = {
-        'Content-Type': 'application/x-www-form-urlencoded',
-        'Cache-Control': 'no-cache'
-    }
-    
     try:
-        response = requests.post(TIKTOK_TOKEN_URL, data=token_params, headers=headers)
+        response = tiktok_client.request_token(token_params)
         token_data = response.json()
         
         if 'access_token' in token_data:
@@ -467,21 +466,9 @@ def tiktok_callback():
             logger.info(f"Open ID: {token_data.get('open_id')}")
             
             # Fetch user info from TikTok
-            user_info_headers = {
-                'Authorization': f'Bearer {token_data["access_token"]}'
-            }
-            
             try:
                 # First try creator_info/query endpoint (works with video.publish scope)
-                creator_headers = {
-                    'Authorization': f'Bearer {token_data["access_token"]}',
-                    'Content-Type': 'application/json; charset=UTF-8'
-                }
-                
-                creator_response = requests.post(
-                    'https://open.tiktokapis.com/v2/post/publish/creator_info/query/',
-                    headers=creator_headers
-                )
+                creator_response = tiktok_client.creator_info(token_data['access_token'])
                 
                 if creator_response.status_code == 200:
                     creator_data = creator_response.json()
@@ -504,10 +491,10 @@ def tiktok_callback():
                         user_data = creator_data
                 else:
                     # Fallback to user/info endpoint if creator_info fails
-                    user_info_params = {
-                        'fields': 'open_id,union_id,avatar_url,display_name'
-                    }
-                    user_response = requests.get('https://open.tiktokapis.com/v2/user/info/', headers=user_info_headers, params=user_info_params)
+                    user_response = tiktok_client.user_info(
+                        token_data['access_token'],
+                        'open_id,union_id,avatar_url,display_name'
+                    )
                     user_data = user_response.json()
                 
                 logger.info(f"TikTok user data: {user_data}")
@@ -668,9 +655,31 @@ def tiktok_callback():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    # Get user's TikTok accounts for dashboard
-    tiktok_accounts = TikTokAccount.query.filter_by(user_id=current_user.id).all()
-    return render_template('dashboard.html', tiktok_accounts=tiktok_accounts)
+    return render_dashboard()
+
+
+def render_dashboard():
+    """Render the dashboard with the account roster embedded, so the page needs no per-account lookups"""
+    tiktok_accounts = load_account_roster(current_user.id)
+    return render_template('dashboard.html', tiktok_accounts=tiktok_accounts,
+                           current_account_id=session.get('current_tiktok_account_id'))
+
+
+@app.route('/api/dashboard/bootstrap')
+@login_required
+def dashboard_bootstrap():
+    """
+    Everything the dashboard needs up front: all of the user's TikTok accounts with
+    pending/processing/completed/failed scheduled post counts and the next scheduled time
+    """
+    try:
+        return jsonify({
+            'accounts': load_account_roster(current_user.id),
+            'current_account_id': session.get('current_tiktok_account_id')
+        })
+    except Exception as e:
+        logger.error(f"Failed to load dashboard bootstrap for user {current_user.id}: {e}")
+        return jsonify({'error': 'Failed to load dashboard', 'message': str(e)}), 500
 
 
 @app.route('/schedule_post/<int:account_id>')
@@ -902,40 +911,9 @@ def get_user_info():
     # You might want to modify this to return all accounts
     primary_account = tiktok_accounts[0]
     
-    # Try to get fresh data from TikTok API if we have an access token
-    if primary_account.access_token:
-        headers = {
-            'Authorization': f'Bearer {primary_account.access_token}'
-        }
-        
-        try:
-            # TikTok API requires fields parameter
-            user_info_params = {
-                'fields': 'open_id,union_id,avatar_url,display_name,username,follower_count,following_count,likes_count,video_count'
-            }
-            response = requests.get('https://open.tiktokapis.com/v2/user/info/', headers=headers, params=user_info_params)
-            api_data = response.json()
-            
-            # If API call successful, update local database and return fresh data
-            if response.ok and 'data' in api_data and 'user' in api_data['data']:
-                tiktok_user = api_data['data']['user']
-                
-                # Update local database with fresh data
-                primary_account.username = tiktok_user.get('username', primary_account.username)
-                primary_account.display_name = tiktok_user.get('display_name', primary_account.display_name)
-                primary_account.avatar_url = tiktok_user.get('avatar_url', primary_account.avatar_url)
-                primary_account.follower_count = tiktok_user.get('follower_count', primary_account.follower_count)
-                primary_account.following_count = tiktok_user.get('following_count', primary_account.following_count)
-                primary_account.likes_count = tiktok_user.get('likes_count', primary_account.likes_count)
-                primary_account.video_count = tiktok_user.get('video_count', primary_account.video_count)
-                db.session.commit()
-                
-                return jsonify(api_data)
-                
-        except Exception as e:
-            logger.warning(f"TikTok API failed, falling back to database: {e}")
+    # Serve stored data right away; refresh it in the background when stale
+    profile_revalidator.schedule(primary_account)
     
-    # Fallback to local database data
     return jsonify({
         'data': {
             'user': {
@@ -973,24 +951,21 @@ def upload_file_to_external_api(file, filename, max_retries=3, timeout=300):
     """
     external_api_url = 'https://ai-assistant-backend-1071001928522.europe-west1.run.app/api/file/upload-file'
     
-    # Read file content once to avoid stream consumption issues during retries
-    file.seek(0)
-    file_content = file.read()
-    content_type = file.content_type
+    # Stream the multipart body straight from the uploaded file (Werkzeug spools
+    # large uploads to disk) so memory stays bounded; rewind() replays it on retry
+    body = MultipartFileStream(file.stream, filename, file.content_type)
     
     for attempt in range(max_retries):
         try:
-            # Create a new file-like object for each attempt
-            from io import BytesIO
-            file_obj = BytesIO(file_content)
-            files = {'file': (filename, file_obj, content_type)}
+            body.rewind()
             
             logger.info(f"Uploading file to external API (attempt {attempt + 1}/{max_retries})...")
             
             # Make request with timeout
             response = requests.post(
                 external_api_url,
-                files=files,
+                data=body,
+                headers={'Content-Type': body.content_type},
                 timeout=timeout
             )
             
@@ -1046,6 +1021,51 @@ def upload_file_to_external_api(file, filename, max_retries=3, timeout=300):
     return False, None, "Upload failed after all retry attempts"
 
 
+def upload_file_deduplicated(file, filename):
+    """
+    Upload a file to the external API unless identical content was uploaded before.
+
+    The SHA-256 is computed while the request body is received; a hash already
+    in uploaded_files returns its stored fileUrl without re-sending the video.
+
+    Args:
+        file: File object to upload (Flask FileStorage)
+        filename: Name of the file
+
+    Returns:
+        tuple: (success: bool, response_data: dict or None, error: str or None);
+               response_data['deduplicated'] is True when the upload was skipped
+    """
+    content_hash = file_sha256(file.stream)
+
+    existing = UploadedFile.query.filter_by(content_hash=content_hash).first()
+    if existing:
+        logger.info(f"Reusing previous upload {existing.file_name} for content {content_hash[:12]}")
+        return True, {'fileName': existing.file_name, 'fileUrl': existing.file_url, 'deduplicated': True}, None
+
+    success, upload_data, error = upload_file_to_external_api(file, filename)
+    if not success:
+        return success, upload_data, error
+
+    file.stream.seek(0, os.SEEK_END)
+    try:
+        db.session.add(UploadedFile(
+            content_hash=content_hash,
+            file_name=upload_data['fileName'],
+            file_url=upload_data['fileUrl'],
+            size_bytes=file.stream.tell()
+        ))
+        db.session.commit()
+    except IntegrityError:
+        # The same content finished uploading concurrently; either URL serves it
+        db.session.rollback()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to record upload hash {content_hash[:12]}: {str(e)}")
+
+    return True, dict(upload_data, deduplicated=False), None
+
+
 def revoke_tiktok_token(access_token):
     """Revoke a TikTok access token
     
@@ -1060,17 +1080,8 @@ def revoke_tiktok_token(access_token):
             'token': access_token
         }
         
-        headers = {
-            'Content-Type': 'application/x-www-form-urlencoded',
-            'Cache-Control': 'no-cache'
-        }
-        
         logger.info("Attempting to revoke TikTok access token")
-        response = requests.post(
-            'https://open.tiktokapis.com/v2/oauth/revoke/',
-            data=revoke_params,
-            headers=headers
-        )
+        response = tiktok_client.revoke_token(revoke_params)
         
         if response.status_code == 200:
             # Success - response should be empty
@@ -1105,49 +1116,16 @@ def refresh_tiktok_token(tiktok_account):
         return False
     
     try:
-        token_params = {
-            'client_key': TIKTOK_CLIENT_KEY,
-            'client_secret': TIKTOK_CLIENT_SECRET,
-            'grant_type': 'refresh_token',
-            'refresh_token': tiktok_account.refresh_token
-        }
-        
-        headers = {
-            'Content-Type': 'application/x-www-form-urlencoded',
-            'Cache-Control': 'no-cache'
-        }
+        token_params = build_refresh_params(tiktok_account.refresh_token)
         
         logger.info(f"Attempting to refresh token for account {tiktok_account.username}")
-        response = requests.post(TIKTOK_TOKEN_URL, data=token_params, headers=headers)
+        response = tiktok_client.request_token(token_params)
         token_data = response.json()
         
         logger.info(f"Token refresh response: {response.status_code}")
         
-        if response.status_code == 200 and 'access_token' in token_data:
-            # Update ALL token fields as per TikTok documentation
-            tiktok_account.access_token = token_data['access_token']
-            
-            # IMPORTANT: The refresh_token may be different than the one used
-            # Always update to the new refresh_token if provided
-            if 'refresh_token' in token_data:
-                old_refresh = tiktok_account.refresh_token
-                new_refresh = token_data['refresh_token']
-                if old_refresh != new_refresh:
-                    logger.info("Refresh token changed, updating to new token")
-                tiktok_account.refresh_token = new_refresh
-            
-            # Update expiration times
-            if 'expires_in' in token_data:
-                tiktok_account.token_expires_at = datetime.utcnow() + timedelta(seconds=token_data['expires_in'])
-            
-            # Store additional fields if needed
-            if 'refresh_expires_in' in token_data:
-                tiktok_account.refresh_token_expires_at = datetime.utcnow() + timedelta(seconds=token_data['refresh_expires_in'])
-            
-            # Update scope if changed
-            if 'scope' in token_data:
-                tiktok_account.scope = token_data['scope']
-            
+        # Token fields are applied by the same helper the background refresh job uses
+        if response.status_code == 200 and apply_token_response(tiktok_account, token_data):
             db.session.commit()
             logger.info(f"Token refreshed successfully for account {tiktok_account.username}")
             logger.info(f"New token expires in: {token_data.get('expires_in', 'unknown')} seconds")
@@ -1183,18 +1161,9 @@ def get_creator_info_for_account(account_id):
         if not account:
             return jsonify({'error': 'Account not found'}), 404
         
-        headers = {
-            'Authorization': f'Bearer {account.access_token}',
-            'Content-Type': 'application/json; charset=UTF-8'
-        }
-        
-        response = requests.post(
-            'https://open.tiktokapis.com/v2/post/publish/creator_info/query/',
-            headers=headers
-        )
+        status_code, data = creator_info_cache.get(account.id, account.access_token)
         
-        if response.status_code == 200:
-            data = response.json()
+        if status_code == 200:
             if 'data' in data:
                 creator_data = data['data']
                 
@@ -1209,7 +1178,7 @@ def get_creator_info_for_account(account_id):
                     'data': creator_data
                 })
         
-        return jsonify({'error': 'Failed to fetch creator info'}), response.status_code
+        return jsonify({'error': 'Failed to fetch creator info'}), status_code
         
     except Exception as e:
         logger.error(f"Error fetching creator info: {str(e)}")
@@ -1221,16 +1190,8 @@ def get_creator_info_for_account(account_id):
 def get_creator_info():
     access_token = session.get('tiktok_access_token')
     
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json; charset=UTF-8'
-    }
-    
     try:
-        response = requests.post(
-            f'{TIKTOK_BASE_URL}/post/publish/creator_info/query/',
-            headers=headers
-        )
+        response = tiktok_client.creator_info(access_token)
         return jsonify(response.json())
     except Exception as e:
         return jsonify({'error': 'Failed to fetch creator info', 'message': str(e)}), 500
@@ -1256,8 +1217,8 @@ def upload_video_only():
                 timestamp = str(int(time.time()))
                 filename = f"{timestamp}_{filename}"
 
-                # Upload file with retry logic
-                success, upload_data, error = upload_file_to_external_api(file, filename)
+                # Upload file with retry logic, skipping content that was uploaded before
+                success, upload_data, error = upload_file_deduplicated(file, filename)
                 
                 if success:
                     logger.info(f"Video uploaded to external API: {upload_data['fileUrl']}")
@@ -1265,6 +1226,7 @@ def upload_video_only():
                         'success': True,
                         'fileName': upload_data['fileName'],
                         'fileUrl': upload_data['fileUrl'],
+                        'deduplicated': upload_data['deduplicated'],
                         'message': 'Video uploaded successfully'
                     }), 200
                 else:
@@ -1288,12 +1250,11 @@ def upload_video_only():
 @login_required
 def apply_watermark():
     """
-    Apply watermark to a video file using the video_watermark module.
+    Queue a watermark render for an uploaded video.
+    Rendering runs on the render process pool; poll the returned status_url
+    and fetch download_url once the job is completed.
     """
     try:
-        # Import the watermark function
-        from video_watermark import add_watermark
-
         # Check if video file is provided
         if 'video' not in request.files:
             return jsonify({'error': 'No video file provided'}), 400
@@ -1303,65 +1264,75 @@ def apply_watermark():
         if video_file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
 
-        # Get parameters from request
-
-        # Save the uploaded video to a temporary location
-        temp_dir = os.path.join(os.getcwd(), 'temp')
-        os.makedirs(temp_dir, exist_ok=True)
-
-        # Generate unique filename
-        timestamp = str(int(time.time()))
+        # Save the upload into the job's own workspace
         input_filename = secure_filename(video_file.filename)
-        input_path = os.path.join(temp_dir, f"{timestamp}_{input_filename}")
+        try:
+            job_id, input_path = render_queue.create_workspace(input_filename, request.content_length)
+        except RenderCapacityError as e:
+            return jsonify({'error': str(e)}), 507
 
-        # Save the uploaded file
-        video_file.save(input_path)
+        try:
+            video_file.save(input_path)
+            logger.info(f"Queueing watermark job {job_id} for video: {input_path}")
+            job = render_queue.submit(job_id, current_user.id, input_path, input_filename)
+        except Exception:
+            render_queue.remove_workspace(os.path.dirname(input_path))
+            raise
 
-        logger.info(f"Applying watermark to video: {input_path}")
-
-        output_path = add_watermark(
-            video_path=input_path,
-            output_path=None,
-            logo_path="images/logo.png",
-            fade_duration=1.0,
-            logo_scale=0.35,
-            position="bottom_center",
-            margin=260
-        )
-
-        if not output_path or not os.path.exists(output_path):
-            # Clean up temp file
-            if os.path.exists(input_path):
-                os.remove(input_path)
-            return jsonify({'error': 'Failed to apply watermark'}), 500
-
-        logger.info(f"Watermark applied successfully: {output_path}")
-
-        # Read the watermarked video file
-        with open(output_path, 'rb') as f:
-            watermarked_video = f.read()
-
-        # Clean up temporary files
-        if os.path.exists(input_path):
-            os.remove(input_path)
-        if os.path.exists(output_path):
-            os.remove(output_path)
-
-        # Return the watermarked video as a binary response
-        from flask import Response
-        return Response(
-            watermarked_video,
-            mimetype='video/mp4',
-            headers={
-                'Content-Disposition': f'attachment; filename=watermarked_{input_filename}'
-            }
-        )
+        job['status_url'] = url_for('get_watermark_job', job_id=job_id)
+        job['download_url'] = url_for('download_watermark_job', job_id=job_id)
+        return jsonify(job), 202
 
     except Exception as e:
         logger.error(f"Error applying watermark: {str(e)}")
         return jsonify({'error': 'Failed to apply watermark', 'message': str(e)}), 500
 
 
+@app.route('/api/watermark/jobs/<job_id>')
+@login_required
+def get_watermark_job(job_id):
+    """Status and progress of a watermark job"""
+    job, _ = render_queue.get(job_id, current_user.id)
+    if job is None:
+        return jsonify({'error': 'Watermark job not found'}), 404
+    return jsonify(job)
+
+
+@app.route('/api/watermark/jobs/<job_id>/download')
+@login_required
+def download_watermark_job(job_id):
+    """Download the rendered video of a completed watermark job"""
+    job, output_path = render_queue.get(job_id, current_user.id)
+    if job is None:
+        return jsonify({'error': 'Watermark job not found'}), 404
+    if job['status'] == 'failed':
+        return jsonify({'error': 'Failed to apply watermark', 'message': job['error']}), 500
+    if output_path is None or not os.path.exists(output_path):
+        return jsonify({'error': 'Watermark job is not finished', 'status': job['status']}), 409
+
+    # Stream the file from disk; conditional=True adds Range/ETag support so
+    # video players can seek without downloading the whole file
+    send_options = dict(
+        mimetype='video/mp4',
+        as_attachment=True,
+        download_name=f"watermarked_{job['filename']}",
+        conditional=True,
+        max_age=0
+    )
+
+    if request.range is None:
+        # A full download ends the job. The workspace is removed now; the open
+        # handle keeps the data readable until the response has been streamed
+        video = open(output_path, 'rb')
+        render_queue.discard(job_id)
+        response = send_file(video, **send_options)
+        response.content_length = os.fstat(video.fileno()).st_size
+        return response
+
+    # Range reads leave the file for further requests; it expires with the render TTL
+    return send_file(output_path, **send_options)
+
+
 @app.route('/api/post/video', methods=['POST'])
 @login_required
 def post_video():
@@ -1378,8 +1349,8 @@ def post_video():
                 timestamp = str(int(time.time()))
                 filename = f"{timestamp}_{filename}"
 
-                # Upload file with retry logic
-                success, upload_data, error = upload_file_to_external_api(file, filename)
+                # Upload file with retry logic, skipping content that was uploaded before
+                success, upload_data, error = upload_file_deduplicated(file, filename)
                 
                 if success:
                     video_url = upload_data['fileUrl']
@@ -1449,11 +1420,6 @@ def post_video():
             if token_age_days > 7:
                 logger.warning(f"Token is {token_age_days} days old - consider re-authenticating for fresh permissions")
 
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json; charset=UTF-8'
-        }
-
         # Prepare post info
         post_info = {
             'title': data.get('title', ''),
@@ -1485,11 +1451,7 @@ def post_video():
             'video_url': final_video_url,
             'account_id': tiktok_account_id
         }})
-        response = requests.post(
-            f'{TIKTOK_BASE_URL}/post/publish/video/init/',
-            headers=headers,
-            json=request_body
-        )
+        response = tiktok_client.publish_video_init(access_token, request_body)
 
         logger.info(f"TikTok video init response status: {response.status_code}")
         response_data = response.json()
@@ -1498,6 +1460,7 @@ def post_video():
         # Check if the response contains an error
         if response.status_code != 200:
             logger.error(f"TikTok API error: {response_data}")
+            creator_info_cache.invalidate_on_error(tiktok_account.id, response_data)
 
             # If token is invalid, try to refresh it once
             if ('error' in response_data and
@@ -1506,14 +1469,8 @@ def post_video():
                 refreshed = refresh_tiktok_token(tiktok_account)
                 if refreshed:
                     logger.info("Token refreshed, retrying request...")
-                    # Update headers with new token
-                    headers['Authorization'] = f'Bearer {tiktok_account.access_token}'
-                    # Retry the request
-                    response = requests.post(
-                        f'{TIKTOK_BASE_URL}/post/publish/video/init/',
-                        headers=headers,
-                        json=request_body
-                    )
+                    # Retry the request with the new token
+                    response = tiktok_client.publish_video_init(tiktok_account.access_token, request_body)
                     response_data = response.json()
                     logger.info(f"Retry response: {response_data}")
                     if response.status_code == 200:
@@ -1566,6 +1523,13 @@ def post_video():
             # Don't fail the request if database save fails
             pass
 
+        # Posting changes the creator's quota, so drop the cached creator info
+        creator_info_cache.invalidate(tiktok_account.id)
+
+        # Start polling TikTok server-side so browsers only read the shared status
+        if publish_id:
+            status_tracker.track(publish_id, tiktok_account.access_token, current_user.id)
+
         return jsonify(response_data)
     except Exception as e:
         logger.error(f"Error initiating video post: {str(e)}")
@@ -1604,25 +1568,18 @@ def upload_video_chunk():
         if not os.path.exists(video_path):
             return jsonify({'error': f'Video file not found: {video_path}'}), 404
         
-        with open(video_path, 'rb') as video_file:
-            video_data = video_file.read()
-            
-        logger.info(f"Video file size: {len(video_data)} bytes")
-            
-        headers = {
-            'Content-Type': 'video/mp4',
-            'Content-Range': f'bytes 0-{len(video_data)-1}/{len(video_data)}'
-        }
+        # Chunks are read from the file at their offsets, so memory stays bounded;
+        # a failed request can be repeated and resumes from the last good chunk
+        uploader = ChunkedUploader(upload_url, video_path, chunk_size=data.get('chunk_size'))
+        logger.info(f"Video file size: {uploader.plan['video_size']} bytes in "
+                    f"{uploader.plan['total_chunk_count']} chunk(s)")
         
         logger.info(f"Uploading to TikTok URL: {upload_url[:50]}...")
-        response = requests.put(upload_url, data=video_data, headers=headers)
-        logger.info(f"TikTok upload response status: {response.status_code}")
+        result = uploader.upload(completed_chunks=data.get('completed_chunks'))
+        logger.info(f"TikTok upload finished: {len(result['completed_chunks'])}/"
+                    f"{result['total_chunk_count']} chunks, last status {result['status_code']}")
         
-        return jsonify({
-            'success': response.status_code in [200, 201],
-            'status_code': response.status_code,
-            'response_text': response.text[:200] if response.text else None
-        })
+        return jsonify(result)
     except Exception as e:
         logger.error(f"Error uploading video chunk: {str(e)}")
         import traceback
@@ -1633,24 +1590,32 @@ def upload_video_chunk():
 @app.route('/api/post/status/<publish_id>')
 @login_required
 def get_post_status(publish_id):
+    """
+    Latest TikTok status for a post, served from the shared status tracker.
+
+    Query params:
+        since: Status version the client already has
+        wait: Seconds to wait for a newer version (long-poll, capped at STATUS_LONG_POLL_MAX_WAIT)
+    """
     access_token = session.get('tiktok_access_token')
-    
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json; charset=UTF-8'
-    }
-    
-    request_body = {
-        'publish_id': publish_id
-    }
+    since_version = request.args.get('since', 0, type=int)
+    wait_seconds = request.args.get('wait', 0, type=int)
     
     try:
-        response = requests.post(
-            f'{TIKTOK_BASE_URL}/post/publish/status/fetch/',
-            headers=headers,
-            json=request_body
-        )
-        return jsonify(response.json())
+        tracked = status_tracker.track(publish_id, access_token, current_user.id)
+        if tracked is None:
+            # Not trackable here (another user's post or tracker full) - ask TikTok directly
+            response = tiktok_client.publish_status(access_token, publish_id)
+            return jsonify(response.json())
+        
+        # A freshly started tracker has no snapshot yet, so wait for its first poll
+        if tracked.version == 0:
+            wait_seconds = STATUS_LONG_POLL_MAX_WAIT
+        
+        state = status_tracker.wait(tracked, since_version, wait_seconds)
+        response_data = dict(state['snapshot'] or {})
+        response_data['tracker'] = {'version': state['version'], 'done': state['done']}
+        return jsonify(response_data)
     except Exception as e:
         return jsonify({'error': 'Failed to fetch post status', 'message': str(e)}), 500
 
@@ -1662,6 +1627,13 @@ def init_db():
     print("Database initialized!")
 
 
+@app.cli.command('migrate-db')
+def migrate_db():
+    """Apply migrations under an advisory lock (release phase, before the server starts)."""
+    migrate_database(app)
+    print("Database is at the migrations head!")
+
+
 @app.route('/api/register', methods=['POST'])
 @login_required
 def register_user():
@@ -1681,14 +1653,13 @@ def register_user():
     
     # If not registered, fetch user info and register
     access_token = session.get('tiktok_access_token')
-    headers = {'Authorization': f'Bearer {access_token}'}
     
     try:
         # TikTok API requires fields parameter
-        user_info_params = {
-            'fields': 'open_id,union_id,avatar_url,display_name,username,follower_count,following_count,likes_count,video_count'
-        }
-        response = requests.get('https://open.tiktokapis.com/v2/user/info/', headers=headers, params=user_info_params)
+        response = tiktok_client.user_info(
+            access_token,
+            'open_id,union_id,avatar_url,display_name,username,follower_count,following_count,likes_count,video_count'
+        )
         user_data = response.json()
         
         if 'data' in user_data and 'user' in user_data['data']:
@@ -1802,31 +1773,37 @@ def create_scheduled_post():
         return jsonify({'error': 'Failed to create scheduled post', 'message': str(e)}), 500
 
 
+# /api/scheduled/list fields when fields= is not given (tiktok_account_id is opt-in there)
+USER_SCHEDULED_POST_FIELDS = tuple(name for name in scheduled_post_serializer.fields if name != 'tiktok_account_id')
+
+
 @app.route('/api/scheduled/list', methods=['GET'])
 @login_required
 def list_scheduled_posts():
-    """Get all scheduled posts for the current user"""
+    """
+    Get scheduled posts for the current user, newest first.
+
+    Query params: limit, cursor (next_cursor of the previous page), start/end (ISO 8601 window),
+    fields (comma-separated subset of the post fields)
+    """
     user_id = current_user.id
 
     try:
-        scheduled_posts = ScheduledPost.query.filter_by(user_id=user_id).order_by(ScheduledPost.scheduled_time.desc()).all()
-
-        posts_data = []
-        for post in scheduled_posts:
-            posts_data.append({
-                'id': post.id,
-                'title': post.title,
-                'description': post.description,
-                'video_url': post.video_url,
-                'privacy_level': post.privacy_level,
-                'scheduled_time': post.scheduled_time.isoformat() if post.scheduled_time else None,
-                'status': post.status,
-                'error_message': post.error_message,
-                'posted_at': post.posted_at.isoformat() if post.posted_at else None,
-                'created_at': post.created_at.isoformat() if post.created_at else None
-            })
+        page_args = parse_page_args(request.args)
+        fields = scheduled_post_serializer.parse_fields(request.args.get('fields'), USER_SCHEDULED_POST_FIELDS)
+    except (PaginationError, FieldSelectionError) as e:
+        return jsonify({'error': str(e)}), 400
 
-        return jsonify({'scheduled_posts': posts_data})
+    try:
+        scheduled_posts, next_cursor = paginate(
+            scheduled_post_serializer.select(ScheduledPost.query.filter_by(user_id=user_id), fields),
+            ScheduledPost.scheduled_time, ScheduledPost.id, page_args, descending=True
+        )
+
+        return jsonify({
+            'scheduled_posts': scheduled_post_serializer.dump(scheduled_posts, fields),
+            'next_cursor': next_cursor
+        })
 
     except Exception as e:
         return jsonify({'error': 'Failed to fetch scheduled posts', 'message': str(e)}), 500
@@ -1835,9 +1812,20 @@ def list_scheduled_posts():
 @app.route('/api/scheduled/list/<int:account_id>', methods=['GET'])
 @login_required
 def list_scheduled_posts_by_account(account_id):
-    """Get all scheduled posts for a specific TikTok account"""
+    """
+    Get scheduled posts for a specific TikTok account, in schedule order.
+
+    Query params: limit, cursor (next_cursor of the previous page), start/end (ISO 8601 window),
+    fields (comma-separated subset of the post fields)
+    """
     user_id = current_user.id
 
+    try:
+        page_args = parse_page_args(request.args)
+        fields = scheduled_post_serializer.parse_fields(request.args.get('fields'))
+    except (PaginationError, FieldSelectionError) as e:
+        return jsonify({'error': str(e)}), 400
+
     try:
         # Verify the account belongs to the current user
         account = TikTokAccount.query.filter_by(
@@ -1850,29 +1838,16 @@ def list_scheduled_posts_by_account(account_id):
             return jsonify({'error': 'Account not found or unauthorized'}), 404
 
         # Fetch scheduled posts for this account
-        scheduled_posts = ScheduledPost.query.filter_by(
-            user_id=user_id,
-            tiktok_account_id=account_id
-        ).order_by(ScheduledPost.scheduled_time.asc()).all()
-
-        posts_data = []
-        for post in scheduled_posts:
-            posts_data.append({
-                'id': post.id,
-                'title': post.title,
-                'description': post.description,
-                'video_url': post.video_url,
-                'privacy_level': post.privacy_level,
-                'scheduled_time': post.scheduled_time.isoformat() if post.scheduled_time else None,
-                'status': post.status,
-                'error_message': post.error_message,
-                'posted_at': post.posted_at.isoformat() if post.posted_at else None,
-                'created_at': post.created_at.isoformat() if post.created_at else None,
-                'tiktok_account_id': post.tiktok_account_id
-            })
+        scheduled_posts, next_cursor = paginate(
+            scheduled_post_serializer.select(
+                ScheduledPost.query.filter_by(user_id=user_id, tiktok_account_id=account_id), fields
+            ),
+            ScheduledPost.scheduled_time, ScheduledPost.id, page_args
+        )
 
         return jsonify({
-            'scheduled_posts': posts_data,
+            'scheduled_posts': scheduled_post_serializer.dump(scheduled_posts, fields),
+            'next_cursor': next_cursor,
             'account': {
                 'id': account.id,
                 'username': account.username,
@@ -1912,9 +1887,20 @@ def delete_scheduled_post(post_id):
 @app.route('/api/posted/list/<int:account_id>', methods=['GET'])
 @login_required
 def list_posted_videos_by_account(account_id):
-    """Get all posted videos for a specific TikTok account"""
+    """
+    Get posted videos for a specific TikTok account, newest first.
+
+    Query params: limit, cursor (next_cursor of the previous page), start/end (ISO 8601 window),
+    fields (comma-separated subset of the video fields)
+    """
     user_id = current_user.id
 
+    try:
+        page_args = parse_page_args(request.args)
+        fields = posted_video_serializer.parse_fields(request.args.get('fields'))
+    except (PaginationError, FieldSelectionError) as e:
+        return jsonify({'error': str(e)}), 400
+
     try:
         # Verify the account belongs to the current user
         account = TikTokAccount.query.filter_by(
@@ -1927,30 +1913,16 @@ def list_posted_videos_by_account(account_id):
             return jsonify({'error': 'Account not found or unauthorized'}), 404
 
         # Fetch posted videos for this account
-        posted_videos = PostedVideo.query.filter_by(
-            user_id=user_id,
-            tiktok_account_id=account_id
-        ).order_by(PostedVideo.posted_at.desc()).all()
-
-        videos_data = []
-        for video in posted_videos:
-            videos_data.append({
-                'id': video.id,
-                'title': video.title,
-                'description': video.description,
-                'video_url': video.video_url,
-                'privacy_level': video.privacy_level,
-                'post_id': video.post_id,
-                'publish_id': video.publish_id,
-                'status': video.status,
-                'error_message': video.error_message,
-                'posted_at': video.posted_at.isoformat() if video.posted_at else None,
-                'created_at': video.created_at.isoformat() if video.created_at else None,
-                'tiktok_account_id': video.tiktok_account_id
-            })
+        posted_videos, next_cursor = paginate(
+            posted_video_serializer.select(
+                PostedVideo.query.filter_by(user_id=user_id, tiktok_account_id=account_id), fields
+            ),
+            PostedVideo.posted_at, PostedVideo.id, page_args, descending=True
+        )
 
         return jsonify({
-            'posted_videos': videos_data,
+            'posted_videos': posted_video_serializer.dump(posted_videos, fields),
+            'next_cursor': next_cursor,
             'account': {
                 'id': account.id,
                 'username': account.username,
@@ -1964,173 +1936,44 @@ def list_posted_videos_by_account(account_id):
 
 @app.route('/api/scheduled/execute', methods=['POST'])
 def execute_scheduled_post():
-    """Execute all pending scheduled posts for user 18 that have passed their scheduled time"""
-
-    USER_ID = 18
-    current_time = datetime.utcnow()
+    """Execute all pending scheduled posts, for every user, that have passed their scheduled time"""
 
     try:
-        # Query all pending scheduled posts for user 18 where scheduled_time has passed
-        pending_posts = ScheduledPost.query.filter(
-            ScheduledPost.user_id == USER_ID,
-            ScheduledPost.status == 'pending',
-            ScheduledPost.scheduled_time <= current_time
-        ).all()
+        # Atomically claim due posts (and posts whose lease expired) so that
+        # several instances can run this endpoint at once without double-posting
+        pending_posts = claim_due_posts()
 
         if not pending_posts:
-            logger.info(f"No pending posts found for user {USER_ID} that are due for execution")
+            logger.info("No pending posts found that are due for execution")
             return jsonify({
                 'success': True,
                 'message': 'No pending posts to execute',
                 'posts_processed': 0
             })
 
-        logger.info(f"Found {len(pending_posts)} pending posts to execute for user {USER_ID}")
-
-        results = []
-        successful_posts = 0
-        failed_posts = 0
-
-        for scheduled_post in pending_posts:
-            post_result = {
-                'post_id': scheduled_post.id,
-                'title': scheduled_post.title,
-                'scheduled_time': scheduled_post.scheduled_time.isoformat()
-            }
-
-            try:
-                # Update status to processing
-                scheduled_post.status = 'processing'
-                db.session.commit()
-
-                # Get TikTok account access token
-                tiktok_account = TikTokAccount.query.filter_by(
-                    id=scheduled_post.tiktok_account_id,
-                    user_id=USER_ID,
-                    is_active=True
-                ).first()
-
-                if not tiktok_account or not tiktok_account.access_token:
-                    scheduled_post.status = 'failed'
-                    scheduled_post.error_message = 'TikTok account not found or access token missing'
-                    db.session.commit()
-                    post_result['status'] = 'failed'
-                    post_result['error'] = 'TikTok account not found or access token missing'
-                    failed_posts += 1
-                    results.append(post_result)
-                    continue
-
-                # Check if token is expired and refresh if needed
-                if tiktok_account.token_expires_at and tiktok_account.token_expires_at < datetime.utcnow():
-                    logger.info(f"Token expired for account {tiktok_account.username}, attempting refresh...")
-                    refreshed = refresh_tiktok_token(tiktok_account)
-                    if not refreshed:
-                        scheduled_post.status = 'failed'
-                        scheduled_post.error_message = 'Access token expired and refresh failed'
-                        db.session.commit()
-                        post_result['status'] = 'failed'
-                        post_result['error'] = 'Access token expired and refresh failed'
-                        failed_posts += 1
-                        results.append(post_result)
-                        continue
-
-                # Prepare TikTok API request
-                headers = {
-                    'Authorization': f'Bearer {tiktok_account.access_token}',
-                    'Content-Type': 'application/json; charset=UTF-8'
-                }
-
-                post_info = {
-                    'title': scheduled_post.title,
-                    'privacy_level': scheduled_post.privacy_level,
-                    'disable_duet': scheduled_post.disable_duet,
-                    'disable_comment': scheduled_post.disable_comment,
-                    'disable_stitch': scheduled_post.disable_stitch,
-                    'video_cover_timestamp_ms': scheduled_post.video_cover_timestamp_ms
-                }
-
-                # Use video_url (from external API)
-                if scheduled_post.video_url:
-                    source_info = {
-                        'source': 'PULL_FROM_URL',
-                        'video_url': scheduled_post.video_url
-                    }
-                else:
-                    scheduled_post.status = 'failed'
-                    scheduled_post.error_message = 'No video URL found'
-                    db.session.commit()
-                    post_result['status'] = 'failed'
-                    post_result['error'] = 'No video URL found'
-                    failed_posts += 1
-                    results.append(post_result)
-                    continue
+        logger.info(f"Claimed {len(pending_posts)} pending posts to execute")
 
-                request_body = {
-                    'post_info': post_info,
-                    'source_info': source_info
-                }
+        summary = get_dispatcher().dispatch(pending_posts, refresh_token=refresh_tiktok_token)
 
-                # Make TikTok API request
-                logger.info(f"Posting to TikTok for scheduled post {scheduled_post.id}")
-                response = requests.post(
-                    f'{TIKTOK_BASE_URL}/post/publish/video/init/',
-                    headers=headers,
-                    json=request_body
-                )
-
-                response_data = response.json()
-
-                if response.status_code == 200 and 'data' in response_data:
-                    # Update post as completed
-                    scheduled_post.status = 'completed'
-                    scheduled_post.posted_at = datetime.utcnow()
-                    scheduled_post.post_id = response_data['data'].get('publish_id')
-                    db.session.commit()
-
-                    post_result['status'] = 'completed'
-                    post_result['publish_id'] = scheduled_post.post_id
-                    successful_posts += 1
-                    logger.info(f"Successfully posted scheduled post {scheduled_post.id}")
-                else:
-                    scheduled_post.status = 'failed'
-                    error_message = response_data.get('error', {}).get('message', 'Unknown error')
-                    scheduled_post.error_message = error_message
-                    db.session.commit()
-
-                    post_result['status'] = 'failed'
-                    post_result['error'] = error_message
-                    failed_posts += 1
-                    logger.error(f"Failed to post scheduled post {scheduled_post.id}: {error_message}")
-
-                results.append(post_result)
-
-            except Exception as post_error:
-                scheduled_post.status = 'failed'
-                scheduled_post.error_message = str(post_error)
-                db.session.commit()
-
-                post_result['status'] = 'failed'
-                post_result['error'] = str(post_error)
-                failed_posts += 1
-                results.append(post_result)
-                logger.error(f"Exception while processing scheduled post {scheduled_post.id}: {str(post_error)}")
+        logger.info(f"Dispatched {summary['posts_processed']} scheduled posts in {summary['duration_ms']}ms "
+                    f"({summary['successful']} successful, {summary['failed']} failed)")
 
         return jsonify({
             'success': True,
-            'message': f'Processed {len(pending_posts)} posts',
-            'posts_processed': len(pending_posts),
-            'successful': successful_posts,
-            'failed': failed_posts,
-            'results': results
+            'message': f"Processed {summary['posts_processed']} posts",
+            **summary
         })
 
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Error in execute_scheduled_post: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
         return jsonify({'error': 'Failed to execute scheduled posts', 'message': str(e)}), 500
 
 
+startup_profiler.checkpoint('routes')
+
 from auth import auth_bp
 app.register_blueprint(auth_bp)
 
@@ -2140,6 +1983,10 @@ app.register_blueprint(compliance_bp)
 from display_api import display_bp
 app.register_blueprint(display_bp)
 
+startup_profiler.checkpoint('blueprints')
+startup_profiler.mark_app_ready()
+startup_profiler.instrument(app)
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8080))
     
@@ -5,29 +5,26 @@ Handles token refresh and profile updates
 
 import os
 import logging
-import requests
-from datetime import datetime, timedelta
+from datetime import datetime
 from apscheduler.schedulers.background import BackgroundScheduler
 from models import db, TikTokAccount
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from db_engine import create_db_engine, pool_stats
+from token_refresh import TokenRefreshEngine
+from profile_sync import ProfileSync
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Database configuration
-DATABASE_URL = os.environ.get('DATABASE_URL')
-if DATABASE_URL and DATABASE_URL.startswith('postgresql://'):
-    DATABASE_URL = DATABASE_URL.replace('postgresql://', 'postgresql+psycopg2://', 1)
+# Each job holds one session, so the scheduler only needs a small pool
+JOBS_DB_POOL_SIZE = int(os.environ.get('JOBS_DB_POOL_SIZE', 2))
 
-# Create database engine
-engine = create_engine(DATABASE_URL)
+# Create database engine (same URL handling and pool settings as the web app)
+engine = create_db_engine(pool_size=JOBS_DB_POOL_SIZE, max_overflow=0)
 Session = sessionmaker(bind=engine)
 
-# TikTok API configuration
-TIKTOK_BASE_URL = 'https://open.tiktokapis.com/v2'
-TIKTOK_TOKEN_URL = 'https://open.tiktokapis.com/v2/oauth/token/'
+PROFILE_SYNC_INTERVAL_MINUTES = int(os.environ.get('PROFILE_SYNC_INTERVAL_MINUTES', 60))
 
 def refresh_access_tokens():
     """
@@ -36,114 +33,28 @@ def refresh_access_tokens():
     """
     session = Session()
     try:
-        # Get accounts with tokens expiring in the next 12 hours
-        expiry_threshold = datetime.utcnow() + timedelta(hours=12)
-        
-        accounts = session.query(TikTokAccount).filter(
-            TikTokAccount.is_active == True,
-            TikTokAccount.token_expires_at < expiry_threshold,
-            TikTokAccount.refresh_token.isnot(None)
-        ).all()
-        
-        logger.info(f"Found {len(accounts)} accounts needing token refresh")
-        
-        for account in accounts:
-            try:
-                # Prepare refresh request
-                data = {
-                    'client_key': os.environ.get('TIKTOK_CLIENT_KEY'),
-                    'client_secret': os.environ.get('TIKTOK_CLIENT_SECRET'),
-                    'grant_type': 'refresh_token',
-                    'refresh_token': account.refresh_token
-                }
-                
-                # Make refresh request
-                response = requests.post(TIKTOK_TOKEN_URL, data=data)
-                
-                if response.status_code == 200:
-                    token_data = response.json()
-                    
-                    if 'data' in token_data:
-                        # Update tokens
-                        account.access_token = token_data['data'].get('access_token')
-                        account.refresh_token = token_data['data'].get('refresh_token')
-                        account.token_expires_at = datetime.utcnow() + timedelta(
-                            seconds=token_data['data'].get('expires_in', 86400)
-                        )
-                        account.refresh_token_expires_at = datetime.utcnow() + timedelta(
-                            seconds=token_data['data'].get('refresh_expires_in', 31536000)
-                        )
-                        
-                        session.commit()
-                        logger.info(f"Successfully refreshed token for @{account.username}")
-                    else:
-                        logger.error(f"Failed to refresh token for @{account.username}: Invalid response")
-                else:
-                    logger.error(f"Failed to refresh token for @{account.username}: {response.status_code}")
-                    
-            except Exception as e:
-                logger.error(f"Error refreshing token for @{account.username}: {str(e)}")
-                
+        return TokenRefreshEngine().run(session)
     except Exception as e:
         logger.error(f"Error in refresh_access_tokens: {str(e)}")
     finally:
         session.close()
+        logger.info(f"Database pool after refresh_access_tokens: {pool_stats(engine)}")
 
 def update_user_profiles():
     """
-    Update user profile information for all active accounts
-    Runs every 12 hours
+    Update profile information for the stalest slice of active accounts
+    Runs every PROFILE_SYNC_INTERVAL_MINUTES; each run only covers accounts not
+    synced within PROFILE_SYNC_MAX_AGE_HOURS, so every account is still refreshed
+    about twice a day
     """
     session = Session()
     try:
-        accounts = session.query(TikTokAccount).filter(
-            TikTokAccount.is_active == True
-        ).all()
-        
-        logger.info(f"Updating profiles for {len(accounts)} accounts")
-        
-        for account in accounts:
-            try:
-                headers = {
-                    'Authorization': f'Bearer {account.access_token}',
-                }
-                
-                fields = 'display_name,avatar_url,follower_count,following_count,likes_count,video_count,is_verified,bio_description'
-                
-                response = requests.get(
-                    f'{TIKTOK_BASE_URL}/user/info/',
-                    headers=headers,
-                    params={'fields': fields}
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if 'data' in data and 'user' in data['data']:
-                        user_info = data['data']['user']
-                        
-                        # Update account info
-                        account.display_name = user_info.get('display_name')
-                        account.avatar_url = user_info.get('avatar_url')
-                        account.follower_count = user_info.get('follower_count', 0)
-                        account.following_count = user_info.get('following_count', 0)
-                        account.likes_count = user_info.get('likes_count', 0)
-                        account.video_count = user_info.get('video_count', 0)
-                        account.is_verified = user_info.get('is_verified', False)
-                        account.bio = user_info.get('bio_description', '')
-                        account.last_profile_update = datetime.utcnow()
-                        
-                        session.commit()
-                        logger.info(f"Updated profile for @{account.username}")
-                else:
-                    logger.error(f"Failed to update profile for @{account.username}: {response.status_code}")
-                    
-            except Exception as e:
-                logger.error(f"Error updating profile for @{account.username}: {str(e)}")
-                
+        return ProfileSync().run(session)
     except Exception as e:
         logger.error(f"Error in update_user_profiles: {str(e)}")
     finally:
         session.close()
+        logger.info(f"Database pool after update_user_profiles: {pool_stats(engine)}")
 
 # Removed refresh_video_metadata function as we now use PostedVideo model
 
@@ -162,11 +73,11 @@ def start_scheduler():
         replace_existing=True
     )
     
-    # Schedule profile updates every 12 hours
+    # Schedule incremental profile syncs (each run picks up the stalest accounts)
     scheduler.add_job(
         update_user_profiles,
         'interval',
-        hours=12,
+        minutes=PROFILE_SYNC_INTERVAL_MINUTES,
         id='update_profiles',
         replace_existing=True
     )
@@ -0,0 +1,272 @@
+"""
+Chunked FILE_UPLOAD Support
+Plans and performs chunked video uploads to a TikTok upload_url following
+TikTok's media transfer rules, with per-chunk retries and resume
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from tiktok_client import tiktok_client
+
+logger = logging.getLogger(__name__)
+
+# TikTok media transfer limits
+MIN_CHUNK_SIZE = 5 * 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+MAX_FINAL_CHUNK_SIZE = 128 * 1024 * 1024
+MAX_CHUNK_COUNT = 1000
+
+# Upload tuning (overridable per deployment)
+TIKTOK_UPLOAD_CHUNK_SIZE = int(os.environ.get('TIKTOK_UPLOAD_CHUNK_SIZE', 10 * 1024 * 1024))
+# TikTok documents chunks as uploaded in order, so parallelism is opt-in
+TIKTOK_UPLOAD_CHUNK_WORKERS = int(os.environ.get('TIKTOK_UPLOAD_CHUNK_WORKERS', 1))
+TIKTOK_UPLOAD_CHUNK_RETRIES = int(os.environ.get('TIKTOK_UPLOAD_CHUNK_RETRIES', 3))
+
+# Completed chunk indexes per upload_url, so a retried request resumes
+# instead of restarting the transfer
+_upload_progress = {}
+_upload_progress_lock = threading.Lock()
+UPLOAD_PROGRESS_TTL_SECONDS = 3600
+
+
+def plan_chunks(video_size, chunk_size=None):
+    """
+    Work out chunk_size and total_chunk_count for a FILE_UPLOAD.
+
+    Rules (TikTok media transfer guide):
+    - Videos under 5 MB are sent whole as a single chunk
+    - Otherwise chunks are 5-64 MB and total_chunk_count = floor(video_size / chunk_size);
+      the trailing bytes are merged into the final chunk (at most 128 MB)
+    - At most 1000 chunks
+
+    Returns:
+        dict: {'video_size', 'chunk_size', 'total_chunk_count'}
+    """
+    if video_size <= 0:
+        raise ValueError('video_size must be positive')
+
+    if video_size < MIN_CHUNK_SIZE:
+        return {'video_size': video_size, 'chunk_size': video_size, 'total_chunk_count': 1}
+
+    chunk_size = chunk_size or TIKTOK_UPLOAD_CHUNK_SIZE
+    chunk_size = max(MIN_CHUNK_SIZE, min(int(chunk_size), MAX_CHUNK_SIZE, video_size))
+
+    if video_size // chunk_size > MAX_CHUNK_COUNT:
+        chunk_size = -(-video_size // MAX_CHUNK_COUNT)
+        if chunk_size > MAX_CHUNK_SIZE:
+            raise ValueError(f'Video of {video_size} bytes exceeds TikTok upload limits')
+
+    total_chunk_count = video_size // chunk_size
+    return {'video_size': video_size, 'chunk_size': chunk_size, 'total_chunk_count': total_chunk_count}
+
+
+def build_source_info(video_size, chunk_size=None):
+    """source_info for /post/publish/video/init/ with source FILE_UPLOAD"""
+    plan = plan_chunks(video_size, chunk_size)
+    return {
+        'source': 'FILE_UPLOAD',
+        'video_size': plan['video_size'],
+        'chunk_size': plan['chunk_size'],
+        'total_chunk_count': plan['total_chunk_count']
+    }
+
+
+def chunk_ranges(plan):
+    """
+    Byte ranges for each chunk of a plan.
+
+    Returns:
+        list: (index, first_byte, last_byte) tuples, last_byte inclusive
+    """
+    ranges = []
+    for index in range(plan['total_chunk_count']):
+        first_byte = index * plan['chunk_size']
+        if index == plan['total_chunk_count'] - 1:
+            last_byte = plan['video_size'] - 1
+        else:
+            last_byte = first_byte + plan['chunk_size'] - 1
+        ranges.append((index, first_byte, last_byte))
+    return ranges
+
+
+class FileChunk:
+    """
+    Read-only view of one byte range of an open file.
+
+    Reads go through os.pread at explicit offsets, so several chunks can share
+    one file descriptor across threads and only a small buffer is ever held.
+    rewind() restarts the chunk for a retry.
+    """
+
+    READ_SIZE = 1024 * 1024
+
+    def __init__(self, fd, first_byte, last_byte):
+        self._fd = fd
+        self._first_byte = first_byte
+        self._length = last_byte - first_byte + 1
+        self._position = 0
+
+    def __len__(self):
+        return self._length
+
+    def rewind(self):
+        self._position = 0
+
+    def read(self, size=-1):
+        remaining = self._length - self._position
+        if remaining <= 0:
+            return b''
+        if size is None or size < 0:
+            size = self.READ_SIZE
+        data = os.pread(self._fd, min(size, remaining, self.READ_SIZE), self._first_byte + self._position)
+        if not data:
+            raise IOError('Video file is shorter than the planned upload')
+        self._position += len(data)
+        return data
+
+    def __iter__(self):
+        while True:
+            data = self.read(self.READ_SIZE)
+            if not data:
+                break
+            yield data
+
+
+def _get_progress(upload_url):
+    now = time.monotonic()
+    with _upload_progress_lock:
+        # Drop stale entries so the registry stays bounded
+        for url in [url for url, entry in _upload_progress.items()
+                    if now - entry['updated'] > UPLOAD_PROGRESS_TTL_SECONDS]:
+            _upload_progress.pop(url, None)
+
+        entry = _upload_progress.setdefault(upload_url, {'completed': set(), 'updated': now})
+        return set(entry['completed'])
+
+
+def _record_chunk(upload_url, index):
+    with _upload_progress_lock:
+        entry = _upload_progress.setdefault(upload_url, {'completed': set(), 'updated': time.monotonic()})
+        entry['completed'].add(index)
+        entry['updated'] = time.monotonic()
+
+
+def _forget_upload(upload_url):
+    with _upload_progress_lock:
+        _upload_progress.pop(upload_url, None)
+
+
+class ChunkedUploader:
+    """Uploads a local video file to a TikTok upload_url chunk by chunk"""
+
+    def __init__(self, upload_url, video_path, chunk_size=None,
+                 workers=TIKTOK_UPLOAD_CHUNK_WORKERS, max_retries=TIKTOK_UPLOAD_CHUNK_RETRIES):
+        self.upload_url = upload_url
+        self.video_path = video_path
+        self.plan = plan_chunks(os.path.getsize(video_path), chunk_size)
+        self.workers = max(1, workers)
+        self.max_retries = max(0, max_retries)
+
+    def _put_chunk(self, fd, index, first_byte, last_byte):
+        """
+        PUT one chunk, retrying transient failures.
+
+        Returns:
+            tuple: (index, success bool, status_code or None, error str or None)
+        """
+        chunk = FileChunk(fd, first_byte, last_byte)
+        headers = {
+            'Content-Type': 'video/mp4',
+            'Content-Length': str(len(chunk)),
+            'Content-Range': f"bytes {first_byte}-{last_byte}/{self.plan['video_size']}"
+        }
+
+        status_code, error = None, None
+        for attempt in range(self.max_retries + 1):
+            chunk.rewind()
+            try:
+                response = tiktok_client.request('PUT', self.upload_url, headers=headers,
+                                                 data=chunk, max_retries=0)
+                status_code = response.status_code
+                if status_code in (200, 201, 206):
+                    return index, True, status_code, None
+
+                error = f'HTTP {status_code}: {response.text[:200] if response.text else ""}'
+                # Client errors (other than throttling/timeouts) will not succeed on retry
+                if 400 <= status_code < 500 and status_code not in (408, 429):
+                    break
+            except requests.exceptions.RequestException as e:
+                status_code, error = None, str(e)
+
+            if attempt < self.max_retries:
+                wait_time = 2 ** attempt
+                logger.warning(f"Chunk {index + 1}/{self.plan['total_chunk_count']} failed ({error}). "
+                               f"Retrying in {wait_time} seconds...")
+                time.sleep(wait_time)
+
+        return index, False, status_code, error
+
+    def upload(self, completed_chunks=None):
+        """
+        Upload every chunk not yet completed.
+
+        Args:
+            completed_chunks: Chunk indexes the caller already knows were accepted
+
+        Returns:
+            dict: Upload summary including completed_chunks for resuming
+        """
+        completed = _get_progress(self.upload_url) | set(completed_chunks or [])
+        pending = [chunk for chunk in chunk_ranges(self.plan) if chunk[0] not in completed]
+
+        if completed:
+            logger.info(f"Resuming upload: {len(completed)}/{self.plan['total_chunk_count']} chunks already sent")
+
+        failure = None
+        last_status = None
+        fd = os.open(self.video_path, os.O_RDONLY)
+        try:
+            if self.workers == 1:
+                for chunk in pending:
+                    index, success, last_status, error = self._put_chunk(fd, *chunk)
+                    if not success:
+                        failure = (index, last_status, error)
+                        break
+                    completed.add(index)
+                    _record_chunk(self.upload_url, index)
+            else:
+                with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='chunk-upload') as executor:
+                    futures = [executor.submit(self._put_chunk, fd, *chunk) for chunk in pending]
+                    for future in as_completed(futures):
+                        index, success, last_status, error = future.result()
+                        if success:
+                            completed.add(index)
+                            _record_chunk(self.upload_url, index)
+                        elif failure is None:
+                            failure = (index, last_status, error)
+        finally:
+            os.close(fd)
+
+        result = {
+            'success': failure is None,
+            'video_size': self.plan['video_size'],
+            'chunk_size': self.plan['chunk_size'],
+            'total_chunk_count': self.plan['total_chunk_count'],
+            'completed_chunks': sorted(completed),
+            'status_code': last_status
+        }
+
+        if failure is None:
+            _forget_upload(self.upload_url)
+        else:
+            result['failed_chunk'] = failure[0]
+            result['error'] = failure[2]
+            result['resumable'] = True
+
+        return result
@@ -0,0 +1,135 @@
+"""
+Creator Info Cache
+Short-lived per-account cache for /post/publish/creator_info/query/ with
+single-flight deduplication of concurrent lookups
+"""
+
+import os
+import copy
+import time
+import logging
+import threading
+
+from tiktok_client import tiktok_client
+
+logger = logging.getLogger(__name__)
+
+# Cache settings (overridable per deployment)
+CREATOR_INFO_CACHE_TTL = float(os.environ.get('CREATOR_INFO_CACHE_TTL', 60))
+CREATOR_INFO_CACHE_MAX_ENTRIES = int(os.environ.get('CREATOR_INFO_CACHE_MAX_ENTRIES', 10000))
+
+
+class _Flight:
+    """One in-progress lookup that concurrent callers for the same account wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class CreatorInfoCache:
+    """
+    Caches successful creator_info responses per TikTok account.
+
+    Only 200 responses carrying 'data' are cached; errors are shared with the
+    callers waiting on the same lookup but never stored. Entries are dropped
+    after the TTL, after the account posts, or when TikTok reports
+    creator_cannot_post.
+    """
+
+    def __init__(self, ttl=CREATOR_INFO_CACHE_TTL, max_entries=CREATOR_INFO_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._flights = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, account_id, access_token, force_refresh=False):
+        """
+        Get creator info for an account, calling TikTok only on a cache miss.
+
+        Args:
+            account_id: TikTokAccount id the cache entry belongs to
+            access_token: Token to use if TikTok has to be called
+            force_refresh: Skip the cached value
+
+        Returns:
+            tuple: (status_code, response JSON dict) - a private copy the caller may modify
+
+        Raises:
+            requests.exceptions.RequestException: When the TikTok call failed
+        """
+        with self._lock:
+            entry = self._entries.get(account_id)
+            if entry and not force_refresh and entry[0] > time.monotonic():
+                return 200, copy.deepcopy(entry[1])
+
+            flight = self._flights.get(account_id)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[account_id] = flight
+                generation = self._generations.get(account_id, 0)
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            status_code, payload = flight.result
+            return status_code, copy.deepcopy(payload)
+
+        try:
+            flight.result = self._fetch(access_token)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(account_id, None)
+                status_code, payload = flight.result or (None, None)
+                # An invalidate() during the lookup means this result may be stale
+                if (status_code == 200 and 'data' in payload
+                        and self._generations.get(account_id, 0) == generation):
+                    self._store(account_id, payload)
+            flight.event.set()
+
+        status_code, payload = flight.result
+        return status_code, copy.deepcopy(payload)
+
+    @staticmethod
+    def _fetch(access_token):
+        response = tiktok_client.creator_info(access_token)
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {'error': {'code': 'invalid_response', 'message': response.text[:200]}}
+        return response.status_code, payload
+
+    def _store(self, account_id, payload):
+        """Save a response (caller holds the lock)"""
+        now = time.monotonic()
+        if len(self._entries) >= self.max_entries:
+            for key in [key for key, (expires, _) in self._entries.items() if expires <= now]:
+                self._entries.pop(key, None)
+            if len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)), None)
+        self._entries[account_id] = (now + self.ttl, payload)
+
+    def invalidate(self, account_id):
+        """Drop the cached creator info for an account (e.g. after it posts)"""
+        with self._lock:
+            self._entries.pop(account_id, None)
+            self._generations[account_id] = self._generations.get(account_id, 0) + 1
+
+    def invalidate_on_error(self, account_id, response_data):
+        """Invalidate when a TikTok error says the creator's posting state changed"""
+        error = response_data.get('error', {}) if isinstance(response_data, dict) else {}
+        if error.get('code') == 'creator_cannot_post':
+            logger.info(f"creator_cannot_post for account {account_id}, dropping cached creator info")
+            self.invalidate(account_id)
+
+
+# Shared cache - one per process
+creator_info_cache = CreatorInfoCache()
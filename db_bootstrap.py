@@ -0,0 +1,162 @@
+"""
+Database Bootstrap
+Schema migration as a release/startup phase (serialized across instances with a
+PostgreSQL advisory lock) and a cheap schema-version check for server boot
+"""
+
+import os
+import re
+import logging
+
+import click
+from sqlalchemy import text, inspect
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.environ.get('MIGRATIONS_DIR', 'migrations')
+# Arbitrary constant shared by every instance; only one may hold it at a time
+MIGRATION_LOCK_ID = int(os.environ.get('MIGRATION_LOCK_ID', 727274001))
+
+
+def init_migrate(app):
+    """
+    Register Flask-Migrate on the app if it is not already.
+
+    Flask-Migrate imports alembic, a large share of cold-start import time,
+    and the server itself never migrates, so this only runs for migration work.
+    """
+    if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate
+        Migrate(app, db, directory=MIGRATIONS_DIR)
+
+
+def register_migrate_command(app):
+    """Expose `flask db ...` without importing Flask-Migrate until the command is used"""
+
+    class LazyMigrateGroup(click.Group):
+        def _load(self):
+            # Migrate.init_app replaces this placeholder with the real `db` group
+            init_migrate(app)
+            return app.cli.commands['db']
+
+        def list_commands(self, ctx):
+            return self._load().list_commands(ctx)
+
+        def get_command(self, ctx, name):
+            return self._load().get_command(ctx, name)
+
+    app.cli.add_command(LazyMigrateGroup('db', help='Perform database migrations.'))
+
+
+_REVISION_RE = re.compile(r"^(down_revision|revision)\s*=\s*(.+)$", re.MULTILINE)
+
+
+def _script_heads():
+    """
+    Head revision(s) of the migration scripts on disk.
+
+    Reads the revision/down_revision assignments directly instead of loading
+    alembic's ScriptDirectory, so the boot-time check stays cheap.
+    """
+    versions_dir = os.path.join(MIGRATIONS_DIR, 'versions')
+    revisions, parents = set(), set()
+    for name in os.listdir(versions_dir):
+        if not name.endswith('.py'):
+            continue
+        with open(os.path.join(versions_dir, name)) as f:
+            assignments = dict(_REVISION_RE.findall(f.read()))
+        if 'revision' not in assignments:
+            continue
+        revisions.add(assignments['revision'].strip().strip('\'"'))
+        parents.update(re.findall(r"['\"]([0-9A-Za-z_]+)['\"]", assignments.get('down_revision', '')))
+    return revisions - parents
+
+
+def _database_revisions(connection):
+    """Revisions recorded in alembic_version, or None when the table does not exist"""
+    if not inspect(connection).has_table('alembic_version'):
+        return None
+    return {row[0] for row in connection.execute(text('SELECT version_num FROM alembic_version'))}
+
+
+def check_schema_version(app):
+    """
+    Compare the database's alembic_version with the migration head without migrating.
+
+    Meant for server boot: one small query, never raises.
+
+    Returns:
+        bool: True when the schema is at the head revision
+    """
+    if not os.path.exists(MIGRATIONS_DIR):
+        return True
+
+    try:
+        with app.app_context():
+            with db.engine.connect() as connection:
+                current = _database_revisions(connection)
+            heads = _script_heads()
+    except Exception as e:
+        logger.error(f"Could not check database schema version: {e}")
+        return False
+
+    if current != heads:
+        logger.warning(f"Database schema is at {sorted(current or [])}, migrations head is {sorted(heads)}; "
+                       f"run `flask --app app migrate-db`")
+        return False
+
+    logger.info(f"Database schema is current ({', '.join(sorted(heads))})")
+    return True
+
+
+def migrate_database(app):
+    """
+    Bring the schema to the migration head. Safe to run from many instances at once.
+
+    On PostgreSQL a session-level advisory lock is held for the duration, so
+    one instance migrates while the others wait and then find nothing to do.
+    A brand-new database gets create_all() and is stamped at head; a database
+    that is already versioned only gets upgrade(), so tables created by later
+    migrations are never pre-created by create_all().
+    """
+    from flask_migrate import upgrade, stamp
+
+    init_migrate(app)
+    with app.app_context():
+        logger.info(f"Attempting to connect to database: {app.config.get('SQLALCHEMY_DATABASE_URI', 'Not configured')[:50]}...")
+
+        with db.engine.connect() as lock_connection:
+            use_lock = lock_connection.dialect.name == 'postgresql'
+            if use_lock:
+                logger.info("Waiting for the migration lock...")
+                lock_connection.execute(text('SELECT pg_advisory_lock(:lock_id)'), {'lock_id': MIGRATION_LOCK_ID})
+                lock_connection.commit()
+
+            try:
+                if not os.path.exists(MIGRATIONS_DIR):
+                    db.create_all()
+                    logger.info("Migrations folder not found, database tables created/verified")
+                    return
+
+                with db.engine.connect() as connection:
+                    current = _database_revisions(connection)
+                    has_tables = bool(inspect(connection).get_table_names())
+
+                if current is None and not has_tables:
+                    db.create_all()
+                    stamp(directory=MIGRATIONS_DIR)
+                    logger.info("Created database tables and stamped them at the migrations head")
+                elif current is None:
+                    # Pre-Alembic database: add missing tables, then replay the migrations
+                    db.create_all()
+                    upgrade(directory=MIGRATIONS_DIR)
+                    logger.info("Database tables created/verified and migrations applied")
+                else:
+                    upgrade(directory=MIGRATIONS_DIR)
+                    logger.info("Database migrations applied successfully")
+            finally:
+                if use_lock:
+                    lock_connection.execute(text('SELECT pg_advisory_unlock(:lock_id)'), {'lock_id': MIGRATION_LOCK_ID})
+                    lock_connection.commit()
@@ -0,0 +1,186 @@
+"""
+Database Engine Factory
+One place for the database URL, connection pool settings and pool usage
+metrics, shared by the Flask app and the background job scheduler
+"""
+
+import os
+import time
+import logging
+import threading
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import NullPool
+
+logger = logging.getLogger(__name__)
+
+# Pool settings (overridable per deployment). Worst case per process is
+# DB_POOL_SIZE + DB_MAX_OVERFLOW connections, times the number of instances.
+# "null" opens a connection per checkout, for use behind PgBouncer.
+DB_POOL_MODE = os.environ.get('DB_POOL_MODE', 'queue')
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 4))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 4))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+# Recycle before Cloud SQL / load balancers drop idle connections
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+DB_CONNECT_TIMEOUT = int(os.environ.get('DB_CONNECT_TIMEOUT', 10))
+
+
+def get_database_url():
+    """
+    DATABASE_URL normalized for SQLAlchemy, or the development SQLite database.
+
+    Returns:
+        str: SQLAlchemy database URL
+    """
+    url = os.environ.get('DATABASE_URL')
+    if not url:
+        return 'sqlite:///app.db'
+    # Railway/Heroku style URLs (postgresql://) -> explicit psycopg2 driver
+    if url.startswith('postgresql://'):
+        url = url.replace('postgresql://', 'postgresql+psycopg2://', 1)
+    return url
+
+
+def engine_options(url=None, pool_mode=None, pool_size=None, max_overflow=None):
+    """
+    Keyword arguments for create_engine / SQLALCHEMY_ENGINE_OPTIONS.
+
+    Args:
+        url: Database URL the options are for (default: get_database_url())
+        pool_mode: "queue" or "null" (default: DB_POOL_MODE)
+        pool_size: Persistent connections kept per process (default: DB_POOL_SIZE)
+        max_overflow: Extra connections allowed under load (default: DB_MAX_OVERFLOW)
+
+    Returns:
+        dict: Engine options
+    """
+    url = url or get_database_url()
+    options = {'pool_pre_ping': DB_POOL_PRE_PING}
+
+    if url.startswith('sqlite'):
+        # SQLite picks its own pool; size/recycle settings don't apply
+        return options
+
+    if (pool_mode or DB_POOL_MODE) == 'null':
+        options['poolclass'] = NullPool
+    else:
+        options.update({
+            'pool_size': DB_POOL_SIZE if pool_size is None else pool_size,
+            'max_overflow': DB_MAX_OVERFLOW if max_overflow is None else max_overflow,
+            'pool_timeout': DB_POOL_TIMEOUT,
+            'pool_recycle': DB_POOL_RECYCLE,
+            # Reuse the most recent connection so idle extras age out via recycle
+            'pool_use_lifo': True
+        })
+
+    if url.startswith('postgresql'):
+        options['connect_args'] = {
+            'connect_timeout': DB_CONNECT_TIMEOUT,
+            # Detect connections silently dropped while an instance was idle
+            'keepalives': 1,
+            'keepalives_idle': 30,
+            'keepalives_interval': 10,
+            'keepalives_count': 3
+        }
+
+    return options
+
+
+def create_db_engine(url=None, **overrides):
+    """
+    Create an engine with the shared pool settings and metrics attached.
+
+    Args:
+        url: Database URL (default: get_database_url())
+        **overrides: pool_mode / pool_size / max_overflow for this engine
+
+    Returns:
+        Engine
+    """
+    url = url or get_database_url()
+    engine = create_engine(url, **engine_options(url, **overrides))
+    attach_pool_metrics(engine)
+    return engine
+
+
+class PoolMetrics:
+    """Checkout counters and checkout-hold times for one engine's pool"""
+
+    def __init__(self):
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.max_hold_ms = 0.0
+        self._lock = threading.Lock()
+
+    def on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checked_out_at'] = time.monotonic()
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        started = connection_record.info.pop('checked_out_at', None)
+        with self._lock:
+            if started is not None:
+                self.checked_out = max(0, self.checked_out - 1)
+                self.max_hold_ms = max(self.max_hold_ms, (time.monotonic() - started) * 1000)
+
+    def on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'invalidations': self.invalidations,
+                'checked_out': self.checked_out,
+                'peak_checked_out': self.peak_checked_out,
+                'max_hold_ms': round(self.max_hold_ms, 1)
+            }
+
+
+def attach_pool_metrics(engine):
+    """Start collecting pool metrics for engine (idempotent)"""
+    if getattr(engine, '_pool_metrics', None) is not None:
+        return engine._pool_metrics
+
+    metrics = PoolMetrics()
+    event.listen(engine, 'connect', metrics.on_connect)
+    event.listen(engine, 'checkout', metrics.on_checkout)
+    event.listen(engine, 'checkin', metrics.on_checkin)
+    event.listen(engine, 'invalidate', metrics.on_invalidate)
+    engine._pool_metrics = metrics
+    return metrics
+
+
+def pool_stats(engine):
+    """
+    Current pool usage for engine.
+
+    Returns:
+        dict: Pool class and configured size, live counts from the pool, and
+              the counters collected by attach_pool_metrics
+    """
+    pool = engine.pool
+    stats = {'pool': type(pool).__name__}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        method = getattr(pool, name, None)
+        if callable(method):
+            stats[name] = method()
+
+    metrics = getattr(engine, '_pool_metrics', None)
+    if metrics is not None:
+        stats.update(metrics.snapshot())
+    return stats
@@ -6,7 +6,8 @@ Handles user profile information and video listing/querying
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from models import db, TikTokAccount
-import requests
+from tiktok_client import tiktok_client
+from creator_info_cache import creator_info_cache
 import logging
 from datetime import datetime, timedelta
 import json
@@ -16,9 +17,6 @@ logger = logging.getLogger(__name__)
 # Create blueprint
 display_bp = Blueprint('display', __name__)
 
-# TikTok API configuration
-TIKTOK_BASE_URL = 'https://open.tiktokapis.com/v2'
-
 @display_bp.route('/api/user/profile/<int:account_id>', methods=['GET'])
 @login_required
 def get_user_profile(account_id):
@@ -58,20 +56,10 @@ def get_user_profile(account_id):
                 }), 401
         
         # Use creator_info/query endpoint which works with video.publish scope
-        headers = {
-            'Authorization': f'Bearer {account.access_token}',
-            'Content-Type': 'application/json; charset=UTF-8'
-        }
-        
-        # Make POST request to creator_info/query endpoint
-        response = requests.post(
-            f'{TIKTOK_BASE_URL}/post/publish/creator_info/query/',
-            headers=headers
-        )
+        # Served from the short-lived creator info cache when possible
+        status_code, data = creator_info_cache.get(account.id, account.access_token)
         
-        if response.status_code == 200:
-            data = response.json()
-            
+        if status_code == 200:
             if 'data' in data:
                 creator_info = data['data']
                 
@@ -116,11 +104,11 @@ def get_user_profile(account_id):
             else:
                 return jsonify({'error': 'Invalid response from TikTok API'}), 500
         else:
-            error_data = response.json()
+            error_data = data
             logger.error(f"Failed to fetch user profile: {error_data}")
             
             # Handle specific error types
-            if response.status_code == 401:
+            if status_code == 401:
                 # Token expired or invalid
                 error_code = error_data.get('error', {}).get('code', '')
                 if 'token' in error_code.lower() or 'unauthorized' in error_code.lower():
@@ -129,7 +117,7 @@ def get_user_profile(account_id):
                         'error_type': 'session_expired',
                         'requires_reauth': True
                     }), 401
-            elif response.status_code == 403:
+            elif status_code == 403:
                 # Forbidden - potentially refresh token expired
                 return jsonify({
                     'error': 'Access denied. Your TikTok session may have expired.',
@@ -141,7 +129,7 @@ def get_user_profile(account_id):
                 'error': 'Failed to fetch profile',
                 'details': error_data.get('error', {}).get('message'),
                 'error_code': error_data.get('error', {}).get('code')
-            }), response.status_code
+            }), status_code
             
     except Exception as e:
         logger.error(f"Error fetching user profile: {str(e)}")
@@ -171,18 +159,10 @@ def refresh_all_profiles():
         for account in accounts:
             try:
                 # Fetch profile for each account
-                headers = {
-                    'Authorization': f'Bearer {account.access_token}',
-                }
-                
                 # Only basic fields available with user.info.basic scope
                 fields = 'open_id,union_id,avatar_url,display_name'
                 
-                response = requests.get(
-                    f'{TIKTOK_BASE_URL}/user/info/',
-                    headers=headers,
-                    params={'fields': fields}
-                )
+                response = tiktok_client.user_info(account.access_token, fields)
                 
                 if response.status_code == 200:
                     data = response.json()
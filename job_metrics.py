@@ -0,0 +1,54 @@
+"""
+Background Job Metrics
+Per-run counters and latency percentiles for background jobs
+"""
+
+import time
+import threading
+
+
+class RunMetrics:
+    """Thread-safe counters and latency samples for one job run"""
+
+    def __init__(self, job_name):
+        self.job_name = job_name
+        self.started = time.monotonic()
+        self.counts = {}
+        self.latencies_ms = []
+        self._lock = threading.Lock()
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def observe(self, latency_ms):
+        with self._lock:
+            self.latencies_ms.append(latency_ms)
+
+    @staticmethod
+    def _percentile(sorted_values, percentile):
+        if not sorted_values:
+            return None
+        index = min(len(sorted_values) - 1, int(round(percentile / 100 * (len(sorted_values) - 1))))
+        return round(sorted_values[index], 1)
+
+    def summary(self):
+        """
+        Returns:
+            dict: Counts, run duration and p50/p95/p99 latency in milliseconds
+        """
+        with self._lock:
+            latencies = sorted(self.latencies_ms)
+            counts = dict(self.counts)
+
+        return {
+            'job': self.job_name,
+            **counts,
+            'duration_ms': round((time.monotonic() - self.started) * 1000),
+            'latency_ms': {
+                'p50': self._percentile(latencies, 50),
+                'p95': self._percentile(latencies, 95),
+                'p99': self._percentile(latencies, 99),
+                'max': round(latencies[-1], 1) if latencies else None
+            }
+        }
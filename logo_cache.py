@@ -0,0 +1,104 @@
+"""
+Logo Asset Cache
+Keeps watermark logos decoded and pre-scaled per target resolution so repeated
+renders skip image decoding and resampling
+"""
+
+import os
+import atexit
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+# Cache size (overridable per deployment)
+LOGO_CACHE_MAX_ENTRIES = int(os.environ.get('LOGO_CACHE_MAX_ENTRIES', 32))
+
+
+class ScaledLogo:
+    """A logo resized for one video width: RGBA pixels plus a PNG of the same image"""
+
+    def __init__(self, rgba, png_path):
+        self.rgba = rgba
+        self.png_path = png_path
+        self.height, self.width = rgba.shape[:2]
+
+
+class LogoCache:
+    """
+    LRU cache of pre-scaled logos keyed by (logo content hash, video width, scale).
+
+    The RGBA array feeds moviepy's ImageClip directly; the PNG is what the
+    ffmpeg engine overlays. PNGs live in a per-process directory, so render
+    worker processes never evict files another process is using.
+    """
+
+    def __init__(self, max_entries=LOGO_CACHE_MAX_ENTRIES):
+        self.max_entries = max(1, max_entries)
+        self._entries = OrderedDict()
+        self._hashes = {}
+        self._lock = threading.Lock()
+        self._asset_dir = None
+
+    def _get_asset_dir(self):
+        if self._asset_dir is None:
+            self._asset_dir = tempfile.mkdtemp(prefix='logo-cache-')
+            atexit.register(shutil.rmtree, self._asset_dir, True)
+        return self._asset_dir
+
+    def _logo_hash(self, logo_path):
+        """Content hash of the logo, recomputed only when the file changes"""
+        stat = os.stat(logo_path)
+        key = (os.path.abspath(logo_path), stat.st_mtime_ns, stat.st_size)
+        digest = self._hashes.get(key)
+        if digest is None:
+            with open(logo_path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            self._hashes[key] = digest
+        return digest
+
+    def get(self, logo_path, video_width, logo_scale):
+        """
+        Get the logo scaled to int(video_width * logo_scale) pixels wide.
+
+        Returns:
+            ScaledLogo
+        """
+        with self._lock:
+            key = (self._logo_hash(logo_path), video_width, logo_scale)
+            entry = self._entries.get(key)
+            if entry is not None and os.path.exists(entry.png_path):
+                self._entries.move_to_end(key)
+                return entry
+
+            logo_width = max(2, int(video_width * logo_scale))
+            with Image.open(logo_path) as image:
+                image = image.convert('RGBA')
+                logo_height = max(1, round(image.height * logo_width / image.width))
+                scaled = image.resize((logo_width, logo_height), Image.LANCZOS)
+
+            png_path = os.path.join(self._get_asset_dir(), f'{key[0][:16]}_{video_width}_{logo_scale}.png')
+            temp_path = f'{png_path}.tmp'
+            scaled.save(temp_path, format='PNG')
+            os.replace(temp_path, png_path)
+
+            entry = ScaledLogo(np.array(scaled), png_path)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                try:
+                    os.remove(evicted.png_path)
+                except OSError:
+                    pass
+
+            return entry
+
+
+# Shared cache - one per process
+logo_cache = LogoCache()
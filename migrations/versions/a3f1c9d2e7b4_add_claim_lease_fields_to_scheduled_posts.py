@@ -0,0 +1,32 @@
+"""Add claim/lease fields to scheduled_posts
+
+Revision ID: a3f1c9d2e7b4
+Revises: 4b9762cd77c9
+Create Date: 2026-10-18 10:12:41.302118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f1c9d2e7b4'
+down_revision = '4b9762cd77c9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('scheduled_posts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('claim_token', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('claimed_by', sa.String(length=200), nullable=True))
+        batch_op.add_column(sa.Column('lease_expires_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_scheduled_posts_claim_token', ['claim_token'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('scheduled_posts', schema=None) as batch_op:
+        batch_op.drop_index('ix_scheduled_posts_claim_token')
+        batch_op.drop_column('lease_expires_at')
+        batch_op.drop_column('claimed_by')
+        batch_op.drop_column('claim_token')
@@ -0,0 +1,37 @@
+"""Add uploaded_files table for content-hash upload deduplication
+
+Revision ID: b7e2d4f8a1c6
+Revises: a3f1c9d2e7b4
+Create Date: 2026-10-18 14:03:27.518904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d4f8a1c6'
+down_revision = 'a3f1c9d2e7b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('uploaded_files',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('file_name', sa.String(length=500), nullable=False),
+    sa.Column('file_url', sa.String(length=500), nullable=False),
+    sa.Column('size_bytes', sa.BigInteger(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('uploaded_files', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_uploaded_files_content_hash'), ['content_hash'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('uploaded_files', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_uploaded_files_content_hash'))
+
+    op.drop_table('uploaded_files')
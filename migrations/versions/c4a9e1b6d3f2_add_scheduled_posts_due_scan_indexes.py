@@ -0,0 +1,46 @@
+"""Add partial and composite indexes for the scheduled_posts due scan
+
+Revision ID: c4a9e1b6d3f2
+Revises: b7e2d4f8a1c6
+Create Date: 2026-10-18 15:21:09.774312
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a9e1b6d3f2'
+down_revision = 'b7e2d4f8a1c6'
+branch_labels = None
+depends_on = None
+
+# name -> (columns, partial index predicate or None)
+INDEXES = {
+    'ix_scheduled_posts_pending_due': (['scheduled_time', 'id'], "status = 'pending'"),
+    'ix_scheduled_posts_processing_lease': (['lease_expires_at', 'updated_at'], "status = 'processing'"),
+    'ix_scheduled_posts_account_schedule': (['tiktok_account_id', 'scheduled_time', 'id'], None),
+}
+
+
+def upgrade():
+    is_postgres = op.get_bind().dialect.name == 'postgresql'
+
+    # On PostgreSQL build the indexes CONCURRENTLY (outside the migration
+    # transaction) so a large scheduled_posts table stays writable meanwhile
+    with op.get_context().autocommit_block():
+        for name, (columns, where) in INDEXES.items():
+            op.create_index(
+                name, 'scheduled_posts', columns, unique=False,
+                postgresql_where=sa.text(where) if where else None,
+                sqlite_where=sa.text(where) if where else None,
+                postgresql_concurrently=is_postgres
+            )
+
+
+def downgrade():
+    is_postgres = op.get_bind().dialect.name == 'postgresql'
+
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.drop_index(name, table_name='scheduled_posts', postgresql_concurrently=is_postgres)
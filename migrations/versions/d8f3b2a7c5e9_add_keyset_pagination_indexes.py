@@ -0,0 +1,39 @@
+"""Add (owner, timestamp, id) indexes for keyset pagination of list endpoints
+
+Revision ID: d8f3b2a7c5e9
+Revises: c4a9e1b6d3f2
+Create Date: 2026-10-18 16:02:44.139857
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f3b2a7c5e9'
+down_revision = 'c4a9e1b6d3f2'
+branch_labels = None
+depends_on = None
+
+# name -> (table, columns)
+INDEXES = {
+    'ix_scheduled_posts_user_schedule': ('scheduled_posts', ['user_id', 'scheduled_time', 'id']),
+    'ix_posted_videos_account_posted': ('posted_videos', ['tiktok_account_id', 'posted_at', 'id']),
+}
+
+
+def upgrade():
+    is_postgres = op.get_bind().dialect.name == 'postgresql'
+
+    # CONCURRENTLY keeps both tables writable while the indexes build
+    with op.get_context().autocommit_block():
+        for name, (table, columns) in INDEXES.items():
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=is_postgres)
+
+
+def downgrade():
+    is_postgres = op.get_bind().dialect.name == 'postgresql'
+
+    with op.get_context().autocommit_block():
+        for name, (table, _) in INDEXES.items():
+            op.drop_index(name, table_name=table, postgresql_concurrently=is_postgres)
@@ -69,6 +69,18 @@ class TikTokAccount(db.Model):
 
 class ScheduledPost(db.Model):
     __tablename__ = 'scheduled_posts'
+    __table_args__ = (
+        # Due-post scan: pending rows in run order (partial, so finished rows never bloat it)
+        db.Index('ix_scheduled_posts_pending_due', 'scheduled_time', 'id',
+                 postgresql_where=db.text("status = 'pending'"), sqlite_where=db.text("status = 'pending'")),
+        # Reclaim scan: in-flight rows whose lease ran out
+        db.Index('ix_scheduled_posts_processing_lease', 'lease_expires_at', 'updated_at',
+                 postgresql_where=db.text("status = 'processing'"), sqlite_where=db.text("status = 'processing'")),
+        # Per-account listing in schedule order
+        db.Index('ix_scheduled_posts_account_schedule', 'tiktok_account_id', 'scheduled_time', 'id'),
+        # Per-user listing in schedule order (keyset pagination)
+        db.Index('ix_scheduled_posts_user_schedule', 'user_id', 'scheduled_time', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -87,6 +99,10 @@ class ScheduledPost(db.Model):
     error_message = db.Column(db.Text)
     posted_at = db.Column(db.DateTime)
     post_id = db.Column(db.String(100))
+    # Claim/lease fields so several executor instances can run in parallel
+    claim_token = db.Column(db.String(64), index=True)
+    claimed_by = db.Column(db.String(200))
+    lease_expires_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -96,6 +112,10 @@ class ScheduledPost(db.Model):
 
 class PostedVideo(db.Model):
     __tablename__ = 'posted_videos'
+    __table_args__ = (
+        # Per-account history, newest first (keyset pagination)
+        db.Index('ix_posted_videos_account_posted', 'tiktok_account_id', 'posted_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -117,4 +137,19 @@ class PostedVideo(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __repr__(self):
-        return f'<PostedVideo {self.id} - {self.title}>'
\ No newline at end of file
+        return f'<PostedVideo {self.id} - {self.title}>'
+
+
+class UploadedFile(db.Model):
+    """Video already stored on the external file API, keyed by its SHA-256"""
+    __tablename__ = 'uploaded_files'
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    file_name = db.Column(db.String(500), nullable=False)
+    file_url = db.Column(db.String(500), nullable=False)
+    size_bytes = db.Column(db.BigInteger)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<UploadedFile {self.content_hash[:12]} - {self.file_name}>'
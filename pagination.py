@@ -0,0 +1,149 @@
+"""
+Keyset Pagination
+Cursor-based paging on (timestamp, id) for list endpoints, with an optional
+time window, so each page is one index range scan regardless of history size
+"""
+
+import os
+import json
+import base64
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+# Page size limits (overridable per deployment)
+DEFAULT_PAGE_LIMIT = int(os.environ.get('DEFAULT_PAGE_LIMIT', 100))
+MAX_PAGE_LIMIT = int(os.environ.get('MAX_PAGE_LIMIT', 500))
+
+
+class PaginationError(ValueError):
+    """Raised for a malformed limit, cursor or time window"""
+
+
+def encode_cursor(sort_value, row_id):
+    """Opaque cursor pointing just past (sort_value, row_id); sort_value may be None"""
+    payload = json.dumps([sort_value.isoformat() if sort_value is not None else None, row_id],
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Returns:
+        tuple: (datetime or None, int)
+
+    Raises:
+        PaginationError: When the cursor was not produced by encode_cursor
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return (datetime.fromisoformat(sort_value) if sort_value is not None else None), int(row_id)
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+
+
+def _parse_time(value, name):
+    """Parse an ISO 8601 query parameter into a naive UTC datetime (the form stored in the database)"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise PaginationError(f'Invalid {name}, expected an ISO 8601 date or datetime')
+    if parsed.tzinfo is not None:
+        parsed = datetime.utcfromtimestamp(parsed.timestamp())
+    return parsed
+
+
+def parse_page_args(args):
+    """
+    Read limit, cursor, start and end from request query parameters.
+
+    Args:
+        args: request.args
+
+    Returns:
+        dict: {'limit', 'cursor', 'start', 'end'} (cursor/start/end None when absent)
+
+    Raises:
+        PaginationError: When a parameter is malformed
+    """
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_LIMIT))
+    except ValueError:
+        raise PaginationError('Invalid limit')
+    if limit < 1:
+        raise PaginationError('limit must be at least 1')
+
+    cursor = args.get('cursor')
+    start = args.get('start')
+    end = args.get('end')
+    return {
+        'limit': min(limit, MAX_PAGE_LIMIT),
+        'cursor': decode_cursor(cursor) if cursor else None,
+        'start': _parse_time(start, 'start') if start else None,
+        'end': _parse_time(end, 'end') if end else None
+    }
+
+
+def paginate(query, sort_column, id_column, page_args, descending=False):
+    """
+    Fetch one page of query ordered by (sort_column, id_column).
+
+    The window is [start, end) on sort_column. The next page continues
+    strictly after the last row returned, so rows inserted meanwhile never
+    cause duplicates or skips. Pair with an index on the filter columns
+    followed by (sort_column, id_column).
+
+    Rows whose sort_column is NULL come after all others (in id order) and
+    are only listed when no window is given. Each of the two segments is
+    its own keyset query, so both stay index range scans.
+
+    Args:
+        query: SQLAlchemy query already filtered to the rows being listed
+        sort_column: Timestamp column to order by
+        id_column: Primary key column used as tie-breaker
+        page_args: dict from parse_page_args
+        descending: Newest first when True
+
+    Returns:
+        tuple: (rows, next_cursor or None when this is the last page)
+    """
+    windowed = page_args['start'] is not None or page_args['end'] is not None
+    if page_args['start'] is not None:
+        query = query.filter(sort_column >= page_args['start'])
+    if page_args['end'] is not None:
+        query = query.filter(sort_column < page_args['end'])
+
+    limit = page_args['limit']
+    cursor = page_args['cursor']
+    rows = []
+
+    if cursor is None or cursor[0] is not None:
+        dated = query.filter(sort_column.isnot(None))
+        if cursor is not None:
+            position = tuple_(sort_column, id_column)
+            if descending:
+                dated = dated.filter(position < tuple_(*cursor))
+            else:
+                dated = dated.filter(position > tuple_(*cursor))
+
+        if descending:
+            dated = dated.order_by(sort_column.desc(), id_column.desc())
+        else:
+            dated = dated.order_by(sort_column.asc(), id_column.asc())
+        rows = dated.limit(limit + 1).all()
+
+    # A window excludes NULLs anyway (comparisons with NULL are never true)
+    if len(rows) <= limit and not windowed:
+        undated = query.filter(sort_column.is_(None))
+        if cursor is not None and cursor[0] is None:
+            undated = undated.filter(id_column < cursor[1] if descending else id_column > cursor[1])
+        undated = undated.order_by(id_column.desc() if descending else id_column.asc())
+        rows += undated.limit(limit + 1 - len(rows)).all()
+
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
@@ -0,0 +1,301 @@
+"""
+TikTok Profile Sync
+Incremental, rate-limited /user/info/ sync for TikTokAccount profile fields
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+
+from models import db, TikTokAccount
+from tiktok_client import tiktok_client
+from job_metrics import RunMetrics
+
+logger = logging.getLogger(__name__)
+
+# Sync settings (overridable per deployment)
+PROFILE_SYNC_MAX_AGE_HOURS = float(os.environ.get('PROFILE_SYNC_MAX_AGE_HOURS', 12))
+PROFILE_SYNC_BATCH_LIMIT = int(os.environ.get('PROFILE_SYNC_BATCH_LIMIT', 2000))
+PROFILE_SYNC_WORKERS = int(os.environ.get('PROFILE_SYNC_WORKERS', 8))
+PROFILE_SYNC_RATE_PER_SECOND = float(os.environ.get('PROFILE_SYNC_RATE_PER_SECOND', 10))
+# Read paths serve stored profiles and refresh them in the background once older than this
+PROFILE_REVALIDATE_AFTER_SECONDS = int(os.environ.get('PROFILE_REVALIDATE_AFTER_SECONDS', 900))
+PROFILE_REVALIDATE_WORKERS = int(os.environ.get('PROFILE_REVALIDATE_WORKERS', 2))
+
+PROFILE_FIELDS = 'display_name,avatar_url,follower_count,following_count,likes_count,video_count,is_verified,bio_description'
+
+# /user/info/ field -> (TikTokAccount attribute, default when TikTok omits it)
+PROFILE_FIELD_MAP = {
+    'username': ('username', None),
+    'display_name': ('display_name', None),
+    'avatar_url': ('avatar_url', None),
+    'follower_count': ('follower_count', 0),
+    'following_count': ('following_count', 0),
+    'likes_count': ('likes_count', 0),
+    'video_count': ('video_count', 0),
+    'is_verified': ('is_verified', False),
+    'bio_description': ('bio', ''),
+}
+
+
+class RateLimiter:
+    """
+    Shared request pacing for sync workers.
+
+    Requests are spaced 1/rate seconds apart; pause() holds every worker back
+    after TikTok signals rate limiting.
+    """
+
+    def __init__(self, rate_per_second):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+
+def fetch_profile(access_token, fields=PROFILE_FIELDS):
+    """
+    Call /user/info/ for one account. Does not touch the database.
+
+    Returns:
+        tuple: (status_code, user dict or None, error_code or None, latency_ms)
+    """
+    started = time.monotonic()
+    response = tiktok_client.user_info(access_token, fields)
+    latency_ms = (time.monotonic() - started) * 1000
+    try:
+        data = response.json()
+    except ValueError:
+        data = {}
+
+    user_info = data.get('data', {}).get('user')
+    error_code = data.get('error', {}).get('code')
+    if response.status_code == 200 and user_info is not None:
+        return response.status_code, user_info, None, latency_ms
+    return response.status_code, None, error_code, latency_ms
+
+
+def apply_profile(account, user_info, now=None):
+    """
+    Copy /user/info/ fields onto an account, touching only values that differ.
+
+    Returns:
+        bool: True when any profile field changed
+    """
+    changed = False
+    for api_field, (attribute, default) in PROFILE_FIELD_MAP.items():
+        if api_field not in user_info:
+            continue
+        value = user_info.get(api_field)
+        if value is None:
+            # Never blank out a stored name because TikTok returned null
+            if default is None:
+                continue
+            value = default
+        if getattr(account, attribute) != value:
+            setattr(account, attribute, value)
+            changed = True
+
+    if changed:
+        account.last_profile_update = now or datetime.utcnow()
+    return changed
+
+
+class ProfileSync:
+    """
+    Syncs the stalest slice of accounts each run.
+
+    Accounts whose last_profile_update is missing or older than the max age
+    are processed oldest first, at most batch_limit per run, so a large
+    account table is covered over several runs. Profiles that did not change
+    only get their last_profile_update bumped, in one bulk UPDATE. Failed
+    fetches (revoked tokens, 4xx) are bumped the same way, so they wait out
+    the max age like everyone else instead of staying at the head of every run.
+
+    That bump is deliberately written for every attempted account: the stale
+    query only selects accounts older than the max age, so there is no
+    subset whose timestamp is still fresh enough to skip, and any account
+    left unbumped would be fetched again on the very next run. The cost is
+    one UPDATE per run touching at most batch_limit rows, which is far
+    cheaper than the repeated /user/info/ calls it prevents.
+    """
+
+    def __init__(self, max_age_hours=PROFILE_SYNC_MAX_AGE_HOURS, batch_limit=PROFILE_SYNC_BATCH_LIMIT,
+                 max_workers=PROFILE_SYNC_WORKERS, rate_per_second=PROFILE_SYNC_RATE_PER_SECOND):
+        self.max_age = timedelta(hours=max_age_hours)
+        self.batch_limit = batch_limit
+        self.max_workers = max(1, max_workers)
+        self.rate_limiter = RateLimiter(rate_per_second)
+
+    def _fetch(self, access_token):
+        self.rate_limiter.acquire()
+        result = fetch_profile(access_token)
+        if result[0] == 429 or result[2] == 'rate_limit_exceeded':
+            # Back every worker off, not just this one
+            self.rate_limiter.pause(5)
+        return result
+
+    def run(self, session):
+        """
+        Sync one shard of stale accounts using the given SQLAlchemy session.
+
+        Returns:
+            dict: Run metrics (changed / unchanged / failed counts, latency percentiles)
+        """
+        metrics = RunMetrics('update_user_profiles')
+        now = datetime.utcnow()
+
+        accounts = session.query(TikTokAccount).filter(
+            TikTokAccount.is_active == True,
+            TikTokAccount.access_token.isnot(None),
+            or_(
+                TikTokAccount.last_profile_update.is_(None),
+                TikTokAccount.last_profile_update < now - self.max_age
+            )
+        ).order_by(
+            TikTokAccount.last_profile_update.is_(None).desc(),
+            TikTokAccount.last_profile_update.asc()
+        ).limit(self.batch_limit).all()
+
+        logger.info(f"Updating profiles for {len(accounts)} stale accounts")
+        metrics.incr('candidates', len(accounts))
+
+        # Accounts whose sync timestamp only needs moving forward: unchanged or failed
+        attempted_ids = []
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='profile-sync') as executor:
+            futures = {executor.submit(self._fetch, account.access_token): account for account in accounts}
+
+            for future in as_completed(futures):
+                account = futures[future]
+                try:
+                    status_code, user_info, error_code, latency_ms = future.result()
+                except Exception as e:
+                    attempted_ids.append(account.id)
+                    metrics.incr('failed')
+                    logger.error(f"Error updating profile for @{account.username}: {str(e)}")
+                    continue
+
+                metrics.observe(latency_ms)
+                if user_info is None:
+                    attempted_ids.append(account.id)
+                    metrics.incr('failed')
+                    logger.error(f"Failed to update profile for @{account.username}: {status_code} {error_code or ''}")
+                    continue
+
+                if apply_profile(account, user_info, now):
+                    metrics.incr('changed')
+                else:
+                    attempted_ids.append(account.id)
+                    metrics.incr('unchanged')
+
+        try:
+            # Unchanged and failed profiles only need their sync timestamp moved forward
+            if attempted_ids:
+                session.execute(
+                    update(TikTokAccount)
+                    .where(TikTokAccount.id.in_(attempted_ids))
+                    .values(last_profile_update=now)
+                    .execution_options(synchronize_session=False)
+                )
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            metrics.incr('commit_failed')
+            logger.error(f"Failed to save profile sync results: {str(e)}")
+
+        summary = metrics.summary()
+        logger.info(f"Profile sync run finished: {summary}")
+        return summary
+
+
+class ProfileRevalidator:
+    """
+    Background refresh for profiles served stale from the database.
+
+    schedule() returns immediately; at most one refresh per account is queued
+    or running at a time, on a small dedicated pool with its own app context.
+    """
+
+    FIELDS = 'open_id,union_id,avatar_url,display_name,username,follower_count,following_count,likes_count,video_count'
+
+    def __init__(self, app=None, max_workers=PROFILE_REVALIDATE_WORKERS,
+                 revalidate_after_seconds=PROFILE_REVALIDATE_AFTER_SECONDS):
+        self._app = app
+        self.revalidate_after = timedelta(seconds=revalidate_after_seconds)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='profile-revalidate')
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self._app = app
+
+    def is_stale(self, account):
+        return (account.last_profile_update is None
+                or account.last_profile_update < datetime.utcnow() - self.revalidate_after)
+
+    def schedule(self, account):
+        """
+        Queue a background refresh when the account's profile is stale.
+
+        Returns:
+            bool: True when a refresh was queued by this call
+        """
+        if self._app is None or not account.access_token or not self.is_stale(account):
+            return False
+
+        with self._lock:
+            if account.id in self._in_flight:
+                return False
+            self._in_flight.add(account.id)
+
+        self._executor.submit(self._refresh, account.id)
+        return True
+
+    def _refresh(self, account_id):
+        try:
+            with self._app.app_context():
+                try:
+                    account = db.session.get(TikTokAccount, account_id)
+                    if account is None or not account.access_token:
+                        return
+
+                    try:
+                        status_code, user_info, error_code, _ = fetch_profile(account.access_token, self.FIELDS)
+                    except Exception as e:
+                        status_code, user_info, error_code = None, None, str(e)
+
+                    if user_info is None:
+                        # Still move the timestamp forward, so a revoked token or a TikTok
+                        # outage is retried once per revalidation interval, not on every read
+                        logger.warning(f"Background profile refresh failed for account {account_id}: "
+                                       f"{status_code} {error_code or ''}")
+                        account.last_profile_update = datetime.utcnow()
+                    elif not apply_profile(account, user_info):
+                        account.last_profile_update = datetime.utcnow()
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Error refreshing profile for account {account_id}: {str(e)}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(account_id)
+
+
+# Shared revalidator for request handlers
+profile_revalidator = ProfileRevalidator()
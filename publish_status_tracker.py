@@ -0,0 +1,260 @@
+"""
+Publish Status Tracker
+Polls /post/publish/status/fetch/ server-side once per publish_id on a shared
+scheduler and fans the latest status out to any number of waiting browser requests
+"""
+
+import os
+import time
+import heapq
+import logging
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from models import db, PostedVideo
+from tiktok_client import tiktok_client
+from tiktok_compliance import TikTokPostStatusMonitor, TikTokAPIErrorHandler
+
+logger = logging.getLogger(__name__)
+
+# Tracker limits (overridable per deployment)
+STATUS_TRACKER_MAX_ACTIVE = int(os.environ.get('STATUS_TRACKER_MAX_ACTIVE', 500))
+STATUS_TRACKER_MAX_DURATION = int(os.environ.get('STATUS_TRACKER_MAX_DURATION', 30 * 60))
+# How long a finished status stays in memory for late readers
+STATUS_TRACKER_RETAIN_SECONDS = int(os.environ.get('STATUS_TRACKER_RETAIN_SECONDS', 10 * 60))
+# Longest a single long-poll request may wait for a change. Each waiting request
+# holds a gunicorn thread (1 worker x 8 threads), so keep this to a few seconds.
+STATUS_LONG_POLL_MAX_WAIT = int(os.environ.get('STATUS_LONG_POLL_MAX_WAIT', 4))
+# Requests allowed to long-poll at once per process; the rest answer immediately
+STATUS_LONG_POLL_MAX_WAITERS = int(os.environ.get('STATUS_LONG_POLL_MAX_WAITERS', 3))
+# Threads making status calls to TikTok, shared by every tracked publish_id
+STATUS_TRACKER_WORKERS = int(os.environ.get('STATUS_TRACKER_WORKERS', 4))
+
+
+class _TrackedPost:
+    """Latest known status of one publish_id plus the condition readers wait on"""
+
+    def __init__(self, publish_id, access_token, user_id):
+        self.publish_id = publish_id
+        self.access_token = access_token
+        self.user_id = user_id
+        self.snapshot = None
+        self.version = 0
+        self.done = False
+        self.finished_at = None
+        self.condition = threading.Condition()
+        # Poll state, only touched by the poll currently running for this post
+        self.started_at = time.monotonic()
+        self.attempt = 0
+        self.last_status = None
+
+    def publish(self, snapshot, done=False):
+        with self.condition:
+            self.snapshot = snapshot
+            self.version += 1
+            if done:
+                self.done = True
+                self.finished_at = time.monotonic()
+            self.condition.notify_all()
+
+    def state(self):
+        return {'version': self.version, 'done': self.done, 'snapshot': self.snapshot}
+
+
+class PublishStatusTracker:
+    """
+    Keeps exactly one TikTok status poll going per in-flight publish_id.
+
+    One scheduler thread keeps a heap of next-poll times and hands due polls
+    to a small shared worker pool, so the thread count stays fixed however
+    many posts are in flight. Polls back off using
+    TikTokPostStatusMonitor.get_poll_interval and stop once
+    should_continue_polling is false, writing the terminal state to the
+    matching PostedVideo row. Browser requests never call TikTok themselves;
+    they read the shared snapshot or briefly wait for the next version of it.
+    """
+
+    def __init__(self, app=None, workers=STATUS_TRACKER_WORKERS, max_waiters=STATUS_LONG_POLL_MAX_WAITERS):
+        self._app = app
+        self._posts = {}
+        self._lock = threading.Lock()
+        self._workers = max(1, workers)
+        self._waiters = threading.BoundedSemaphore(max(1, max_waiters))
+        # (due monotonic time, sequence, _TrackedPost)
+        self._schedule = []
+        self._schedule_changed = threading.Condition()
+        self._sequence = itertools.count()
+        self._executor = None
+        self._scheduler = None
+
+    def init_app(self, app):
+        self._app = app
+
+    def _prune(self):
+        """Forget finished posts that are past their retention window (caller holds the lock)"""
+        now = time.monotonic()
+        expired = [publish_id for publish_id, post in self._posts.items()
+                   if post.done and now - post.finished_at > STATUS_TRACKER_RETAIN_SECONDS]
+        for publish_id in expired:
+            self._posts.pop(publish_id, None)
+
+    def track(self, publish_id, access_token, user_id):
+        """
+        Start polling a publish_id if nobody is polling it yet.
+
+        Returns:
+            _TrackedPost or None: The shared entry, or None when it belongs to another user
+                                  or the tracker is at capacity
+        """
+        with self._lock:
+            self._prune()
+
+            post = self._posts.get(publish_id)
+            if post is not None:
+                return post if post.user_id == user_id else None
+
+            active = sum(1 for tracked in self._posts.values() if not tracked.done)
+            if active >= STATUS_TRACKER_MAX_ACTIVE:
+                logger.warning(f"Status tracker at capacity ({active} posts), not tracking {publish_id}")
+                return None
+
+            post = _TrackedPost(publish_id, access_token, user_id)
+            self._posts[publish_id] = post
+
+        self._schedule_poll(post, 0)
+        logger.info(f"Tracking publish status for {publish_id}")
+        return post
+
+    def _schedule_poll(self, post, delay):
+        with self._schedule_changed:
+            if self._scheduler is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._workers,
+                                                    thread_name_prefix='publish-status')
+                self._scheduler = threading.Thread(target=self._run_scheduler,
+                                                   name='publish-status-scheduler', daemon=True)
+                self._scheduler.start()
+            heapq.heappush(self._schedule, (time.monotonic() + delay, next(self._sequence), post))
+            self._schedule_changed.notify()
+
+    def _run_scheduler(self):
+        """Hand each post's poll to the worker pool when it falls due"""
+        while True:
+            with self._schedule_changed:
+                while not self._schedule or self._schedule[0][0] > time.monotonic():
+                    timeout = self._schedule[0][0] - time.monotonic() if self._schedule else None
+                    self._schedule_changed.wait(timeout)
+                _, _, post = heapq.heappop(self._schedule)
+            self._executor.submit(self._poll, post)
+
+    def wait(self, post, since_version=0, timeout=0):
+        """
+        Wait until the post has a snapshot newer than since_version, or it is done.
+
+        The wait is capped at STATUS_LONG_POLL_MAX_WAIT, and only
+        STATUS_LONG_POLL_MAX_WAITERS requests may wait at once; the others get
+        the current state immediately so request threads stay available.
+
+        Returns:
+            dict: {'version', 'done', 'snapshot'}
+        """
+        timeout = max(0, min(timeout, STATUS_LONG_POLL_MAX_WAIT))
+        if timeout and not self._waiters.acquire(blocking=False):
+            timeout = 0
+
+        try:
+            deadline = time.monotonic() + timeout
+            with post.condition:
+                while post.version <= since_version and not post.done:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    post.condition.wait(remaining)
+                return post.state()
+        finally:
+            if timeout:
+                self._waiters.release()
+
+    def _fetch(self, post):
+        """
+        One status call to TikTok.
+
+        Returns:
+            tuple: (snapshot dict, status str or None, retryable bool)
+        """
+        try:
+            response = tiktok_client.publish_status(post.access_token, post.publish_id)
+            try:
+                response_data = response.json()
+            except ValueError:
+                response_data = {'error': {'code': 'invalid_response', 'message': response.text[:200]}}
+        except requests.exceptions.RequestException as e:
+            return {'error': {'code': 'network_error', 'message': str(e)}}, None, True
+
+        if response.status_code == 200 and 'data' in response_data:
+            return response_data, response_data['data'].get('status'), True
+
+        error_code = response_data.get('error', {}).get('code')
+        retryable = response.status_code >= 500 or TikTokAPIErrorHandler.should_retry(error_code)
+        return response_data, None, retryable
+
+    def _poll(self, post):
+        """One status poll on a worker thread; schedules the next one unless the post is finished"""
+        try:
+            snapshot, fetched_status, retryable = self._fetch(post)
+        except Exception as e:
+            snapshot, fetched_status, retryable = {'error': {'code': 'internal', 'message': str(e)}}, None, True
+
+        post.last_status = fetched_status or post.last_status
+        timed_out = time.monotonic() - post.started_at > STATUS_TRACKER_MAX_DURATION
+
+        if fetched_status is not None:
+            finished = not TikTokPostStatusMonitor.should_continue_polling(fetched_status)
+        else:
+            finished = not retryable
+
+        if finished or timed_out:
+            post.publish(snapshot, done=True)
+            if fetched_status is not None and finished:
+                self._persist(post.publish_id, snapshot['data'])
+            logger.info(f"Stopped tracking {post.publish_id} after {post.attempt + 1} polls "
+                        f"(status: {post.last_status})")
+            return
+
+        post.publish(snapshot)
+        delay = TikTokPostStatusMonitor.get_poll_interval(post.last_status or '', post.attempt)
+        post.attempt += 1
+        self._schedule_poll(post, delay)
+
+    def _persist(self, publish_id, status_data):
+        """Write a terminal TikTok status to the PostedVideo row for this publish_id"""
+        if self._app is None:
+            return
+
+        status = status_data.get('status')
+        values = {'updated_at': datetime.utcnow()}
+        if status == 'PUBLISH_COMPLETE':
+            values['status'] = 'completed'
+            public_ids = status_data.get('publicaly_available_post_id') or []
+            if public_ids:
+                values['post_id'] = str(public_ids[0])
+        elif status == 'FAILED':
+            values['status'] = 'failed'
+            values['error_message'] = status_data.get('fail_reason')
+        else:
+            return
+
+        with self._app.app_context():
+            try:
+                PostedVideo.query.filter_by(publish_id=publish_id).update(values, synchronize_session=False)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Failed to save publish status for {publish_id}: {str(e)}")
+
+
+# Shared tracker - one set of poll loops per process
+status_tracker = PublishStatusTracker()
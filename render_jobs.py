@@ -0,0 +1,291 @@
+"""
+Watermark Render Jobs
+Runs video watermarking on a process pool so request threads only submit
+jobs and report their progress
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+# Render pool settings (overridable per deployment)
+RENDER_WORKERS = int(os.environ.get('RENDER_WORKERS', os.cpu_count() or 1))
+RENDER_JOB_DIR = os.environ.get('RENDER_JOB_DIR', os.path.join(os.getcwd(), 'temp', 'render_jobs'))
+# Finished jobs (and their files) are discarded after this long
+RENDER_JOB_TTL_SECONDS = int(os.environ.get('RENDER_JOB_TTL_SECONDS', 3600))
+# Upper bound on disk used by all job workspaces, and free space to always leave
+RENDER_DISK_QUOTA_BYTES = int(os.environ.get('RENDER_DISK_QUOTA_BYTES', 10 * 1024 * 1024 * 1024))
+RENDER_MIN_FREE_BYTES = int(os.environ.get('RENDER_MIN_FREE_BYTES', 512 * 1024 * 1024))
+# A render needs room for the input, the output and intermediate files
+RENDER_SPACE_FACTOR = 3
+
+WORKSPACE_PREFIX = 'job-'
+
+
+class RenderCapacityError(Exception):
+    """Raised when there is not enough disk space to accept another render"""
+
+# Watermark settings used for dashboard uploads
+DEFAULT_WATERMARK_OPTIONS = {
+    'logo_path': 'images/logo.png',
+    'fade_duration': 1.0,
+    'logo_scale': 0.35,
+    'position': 'bottom_center',
+    'margin': 260
+}
+
+
+def _write_progress(progress_path, progress):
+    """Atomically record progress so readers never see a partial file"""
+    temp_path = f'{progress_path}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({'progress': round(progress, 3)}, f)
+    os.replace(temp_path, progress_path)
+
+
+def _render(input_path, output_path, progress_path, workspace, options):
+    """
+    Render one watermark job inside its own workspace. Runs in a pool process.
+
+    Returns:
+        str: Path of the rendered video
+    """
+    from video_watermark import add_watermark
+
+    last_reported = [0.0]
+
+    def report(progress):
+        # Throttle file writes to whole-percent steps
+        if progress - last_reported[0] >= 0.01 or progress >= 1.0:
+            last_reported[0] = progress
+            _write_progress(progress_path, progress)
+
+    _write_progress(progress_path, 0.0)
+    result = add_watermark(video_path=input_path, output_path=output_path, temp_dir=workspace,
+                           progress_callback=report, **options)
+    _write_progress(progress_path, 1.0)
+    return result
+
+
+class RenderJobQueue:
+    """
+    In-process registry of watermark jobs backed by a process pool.
+
+    The pool uses the spawn start method so workers never inherit the web
+    server's threads or open connections. Job state lives in this process;
+    progress is read from a small file each worker updates.
+
+    A job is therefore tied to the instance that accepted it: status and
+    download requests for it must reach the same instance, and the render
+    keeps running after the 202 response has been sent. On Cloud Run the
+    service is deployed with --session-affinity and --no-cpu-throttling for
+    this. Affinity is best effort, so a client routed to another instance
+    (or arriving after a scale-in) gets a 404 for the job and has to
+    resubmit it.
+
+    Every job gets its own mkdtemp workspace holding its input, output,
+    progress file and encoder temp files; discarding a job removes the whole
+    directory, and workspaces left behind by a previous process are reaped.
+    """
+
+    def __init__(self, max_workers=RENDER_WORKERS, job_dir=RENDER_JOB_DIR, ttl_seconds=RENDER_JOB_TTL_SECONDS):
+        self.max_workers = max(1, max_workers)
+        self.job_dir = job_dir
+        self.ttl_seconds = ttl_seconds
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    @staticmethod
+    def _directory_size(path):
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def _check_capacity(self, expected_bytes):
+        """Raise RenderCapacityError unless a render of this size fits on disk"""
+        needed = max(0, expected_bytes or 0) * RENDER_SPACE_FACTOR
+        free = shutil.disk_usage(self.job_dir).free
+        if free - needed < RENDER_MIN_FREE_BYTES:
+            raise RenderCapacityError('Not enough free disk space to render this video right now')
+        if self._directory_size(self.job_dir) + needed > RENDER_DISK_QUOTA_BYTES:
+            raise RenderCapacityError('Render disk quota reached, please try again shortly')
+
+    def create_workspace(self, filename, expected_bytes=None):
+        """
+        Create an isolated workspace for a new job and reserve its input path.
+
+        Args:
+            filename: Sanitized name of the uploaded file
+            expected_bytes: Upload size if known, checked against the disk quota
+
+        Returns:
+            tuple: (job_id, input_path)
+
+        Raises:
+            RenderCapacityError: When the disk quota or free-space floor would be exceeded
+        """
+        os.makedirs(self.job_dir, exist_ok=True)
+        self._reap()
+        self._check_capacity(expected_bytes)
+
+        workspace = tempfile.mkdtemp(prefix=WORKSPACE_PREFIX, dir=self.job_dir)
+        job_id = os.path.basename(workspace)[len(WORKSPACE_PREFIX):]
+        return job_id, os.path.join(workspace, f'input_{filename}')
+
+    def submit(self, job_id, user_id, input_path, filename, options=None):
+        """
+        Queue a watermark render for an upload saved in the job's workspace.
+
+        Returns:
+            dict: Public job state
+        """
+        workspace = os.path.dirname(input_path)
+        job = {
+            'id': job_id,
+            'user_id': user_id,
+            'filename': filename,
+            'status': 'queued',
+            'error': None,
+            'created_at': time.time(),
+            'finished_at': None,
+            'workspace': workspace,
+            'input_path': input_path,
+            'output_path': os.path.join(workspace, 'watermarked.mp4'),
+            'progress_path': os.path.join(workspace, 'progress.json')
+        }
+
+        render_args = (_render, input_path, job['output_path'], job['progress_path'], workspace,
+                       dict(DEFAULT_WATERMARK_OPTIONS, **(options or {})))
+        with self._lock:
+            try:
+                future = self._get_executor().submit(*render_args)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); start a fresh pool
+                logger.warning("Render pool was broken, recreating it")
+                self._executor = None
+                future = self._get_executor().submit(*render_args)
+            job['future'] = future
+            self._jobs[job_id] = job
+
+        future.add_done_callback(lambda f, job=job: self._finish(job, f))
+        logger.info(f"Queued watermark job {job_id} for {filename}")
+        return self._public(job)
+
+    def _finish(self, job, future):
+        job['finished_at'] = time.time()
+        try:
+            future.result()
+            job['status'] = 'completed'
+            logger.info(f"Watermark job {job['id']} completed")
+        except Exception as e:
+            job['status'] = 'failed'
+            job['error'] = str(e) or type(e).__name__
+            logger.error(f"Watermark job {job['id']} failed: {job['error']}")
+
+        # Only the output is needed from here on
+        for path in (job['input_path'], job['progress_path']):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if job['status'] == 'failed':
+            self.remove_workspace(job['workspace'])
+
+    @staticmethod
+    def remove_workspace(workspace):
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    @staticmethod
+    def _read_progress(job):
+        if job['status'] == 'completed':
+            return 1.0
+        try:
+            with open(job['progress_path']) as f:
+                return json.load(f).get('progress', 0.0)
+        except (OSError, ValueError):
+            return 0.0
+
+    def _public(self, job):
+        status = job['status']
+        if status == 'queued' and job['future'].running():
+            status = 'running'
+        return {
+            'job_id': job['id'],
+            'status': status,
+            'progress': self._read_progress(job),
+            'error': job['error'],
+            'filename': job['filename']
+        }
+
+    def get(self, job_id, user_id):
+        """
+        Look up a job owned by user_id.
+
+        Returns:
+            tuple: (public job state dict or None, output_path or None)
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job['user_id'] != user_id:
+            return None, None
+        output_path = job['output_path'] if job['status'] == 'completed' else None
+        return self._public(job), output_path
+
+    def discard(self, job_id):
+        """Forget a job and delete its workspace"""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is not None:
+            self.remove_workspace(job['workspace'])
+
+    def _reap(self):
+        """Discard finished jobs older than the TTL and workspaces no job owns"""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job['finished_at'] and job['finished_at'] < cutoff]
+            known = {job['workspace'] for job in self._jobs.values()}
+        for job_id in expired:
+            self.discard(job_id)
+
+        # Workspaces left by a crashed or restarted process
+        try:
+            entries = os.listdir(self.job_dir)
+        except OSError:
+            return
+        for name in entries:
+            path = os.path.join(self.job_dir, name)
+            if not name.startswith(WORKSPACE_PREFIX) or path in known:
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    self.remove_workspace(path)
+            except OSError:
+                pass
+
+
+# Shared queue - one render pool per process
+render_queue = RenderJobQueue()
@@ -0,0 +1,450 @@
+"""
+Scheduled Post Dispatcher
+Publishes due scheduled posts for all users through a bounded worker pool
+"""
+
+import os
+import time
+import logging
+import socket
+import threading
+import uuid
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+
+import requests
+from sqlalchemy import select, update, or_, and_
+
+from models import db, TikTokAccount, ScheduledPost
+from tiktok_client import tiktok_client
+from creator_info_cache import creator_info_cache
+
+logger = logging.getLogger(__name__)
+
+# Dispatcher limits (overridable per deployment)
+DISPATCH_MAX_WORKERS = int(os.environ.get('DISPATCH_MAX_WORKERS', 16))
+DISPATCH_PER_ACCOUNT_CONCURRENCY = int(os.environ.get('DISPATCH_PER_ACCOUNT_CONCURRENCY', 2))
+DISPATCH_BATCH_SIZE = int(os.environ.get('DISPATCH_BATCH_SIZE', 500))
+DISPATCH_REQUEST_TIMEOUT = float(os.environ.get('DISPATCH_REQUEST_TIMEOUT', 30))
+# How long a claimed post stays owned by one instance before others may reclaim it.
+# The lease is renewed right before each post's publish call, so it only has to
+# outlast one call (connect + read timeout, plus connect-error retries).
+DISPATCH_LEASE_SECONDS = int(os.environ.get('DISPATCH_LEASE_SECONDS', 300))
+
+# Identifies this instance in claimed_by for debugging stuck rows
+WORKER_ID = f"{os.environ.get('K_REVISION', 'local')}:{socket.gethostname()}:{os.getpid()}"
+
+# What dispatch() needs from a claimed row, read once before anything is committed
+ClaimedPost = namedtuple('ClaimedPost', 'id claim_token user_id tiktok_account_id video_url request_body')
+
+
+class ScheduledPostDispatcher:
+    """
+    Sends publish-init requests for scheduled posts concurrently.
+
+    Worker threads only perform the HTTP call to TikTok; every database read
+    and write stays on the calling thread so the Flask-SQLAlchemy session is
+    never shared between threads.
+
+    The per-account limit is enforced before submitting: posts wait in
+    per-account queues on the calling thread and are only handed to the pool
+    while their account has a free slot, so a busy account never ties up
+    workers that other accounts' posts could use.
+    """
+
+    def __init__(self, max_workers=DISPATCH_MAX_WORKERS,
+                 per_account_limit=DISPATCH_PER_ACCOUNT_CONCURRENCY,
+                 request_timeout=DISPATCH_REQUEST_TIMEOUT,
+                 lease_seconds=DISPATCH_LEASE_SECONDS):
+        self.max_workers = max(1, max_workers)
+        self.per_account_limit = max(1, per_account_limit)
+        self.request_timeout = request_timeout
+        self.lease_seconds = lease_seconds
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='publish-dispatch'
+        )
+        # account_id -> publishes in flight, across concurrent dispatch() calls.
+        # Accounts with nothing in flight are removed, so this stays small.
+        self._account_in_flight = {}
+        self._account_slots_changed = threading.Condition()
+
+    def _acquire_account_slot(self, account_id):
+        """Take one of the account's publish slots if one is free (never blocks)"""
+        with self._account_slots_changed:
+            in_flight = self._account_in_flight.get(account_id, 0)
+            if in_flight >= self.per_account_limit:
+                return False
+            self._account_in_flight[account_id] = in_flight + 1
+            return True
+
+    def _release_account_slot(self, account_id):
+        with self._account_slots_changed:
+            in_flight = self._account_in_flight.get(account_id, 0) - 1
+            if in_flight > 0:
+                self._account_in_flight[account_id] = in_flight
+            else:
+                self._account_in_flight.pop(account_id, None)
+            self._account_slots_changed.notify_all()
+
+    def _publish(self, access_token, request_body):
+        """
+        Call /post/publish/video/init/ for one post.
+        Runs on a worker thread (the account slot is already held) - must not touch the database.
+
+        Returns:
+            tuple: (status_code or None, response_data dict, error str or None, latency_ms)
+        """
+        started = time.monotonic()
+        try:
+            response = tiktok_client.publish_video_init(
+                access_token,
+                request_body,
+                timeout=self.request_timeout
+            )
+            try:
+                response_data = response.json()
+            except ValueError:
+                response_data = {}
+            return response.status_code, response_data, None, (time.monotonic() - started) * 1000
+        except requests.exceptions.RequestException as e:
+            return None, {}, str(e), (time.monotonic() - started) * 1000
+
+    @staticmethod
+    def _build_request_body(scheduled_post):
+        return {
+            'post_info': {
+                'title': scheduled_post.title,
+                'privacy_level': scheduled_post.privacy_level,
+                'disable_duet': scheduled_post.disable_duet,
+                'disable_comment': scheduled_post.disable_comment,
+                'disable_stitch': scheduled_post.disable_stitch,
+                'video_cover_timestamp_ms': scheduled_post.video_cover_timestamp_ms
+            },
+            'source_info': {
+                'source': 'PULL_FROM_URL',
+                'video_url': scheduled_post.video_url
+            }
+        }
+
+    def _load_accounts(self, claims, refresh_token):
+        """
+        Load the TikTok accounts for a batch in one query and refresh each
+        expired token at most once.
+
+        Returns:
+            dict: account_id -> ((user_id, access_token) or None, error str or None)
+        """
+        account_ids = {claim.tiktok_account_id for claim in claims}
+        accounts = TikTokAccount.query.filter(
+            TikTokAccount.id.in_(account_ids),
+            TikTokAccount.is_active == True
+        ).all()
+
+        resolved = {account_id: (None, 'TikTok account not found or access token missing')
+                    for account_id in account_ids}
+
+        for account in accounts:
+            if not account.access_token:
+                continue
+
+            if account.token_expires_at and account.token_expires_at < datetime.utcnow():
+                logger.info(f"Token expired for account {account.username}, attempting refresh...")
+                if refresh_token is None or not refresh_token(account):
+                    resolved[account.id] = (None, 'Access token expired and refresh failed')
+                    continue
+
+            resolved[account.id] = ((account.user_id, account.access_token), None)
+
+        return resolved
+
+    def _renew_lease(self, claim):
+        """
+        Extend our lease on a claimed post just before publishing it.
+
+        Posts can wait a long time in a large batch; if the lease ran out and
+        another instance reclaimed the row meanwhile, the claim token no longer
+        matches and we must not publish it a second time.
+
+        Returns:
+            bool: True when we still own the post
+        """
+        now = datetime.utcnow()
+        renewed = ScheduledPost.query.filter_by(
+            id=claim.id,
+            claim_token=claim.claim_token,
+            status='processing'
+        ).update({
+            'lease_expires_at': now + timedelta(seconds=self.lease_seconds),
+            'updated_at': now
+        }, synchronize_session=False)
+        db.session.commit()
+        return bool(renewed)
+
+    @staticmethod
+    def _finish(claim, post_result, status, error_message=None, publish_id=None):
+        """
+        Record the outcome of one claimed post.
+
+        The write is fenced on the claim token: if our lease expired and another
+        instance reclaimed the row, the update matches nothing and is dropped.
+        It is committed right away so a publish_id is durable as soon as TikTok
+        returns it, rather than when the whole batch is done.
+        """
+        values = {
+            'status': status,
+            'error_message': error_message,
+            'claim_token': None,
+            'lease_expires_at': None,
+            'updated_at': datetime.utcnow()
+        }
+        if status == 'completed':
+            values['posted_at'] = datetime.utcnow()
+            values['post_id'] = publish_id
+
+        updated = ScheduledPost.query.filter_by(
+            id=claim.id,
+            claim_token=claim.claim_token
+        ).update(values, synchronize_session=False)
+        db.session.commit()
+
+        # Another instance owns the row now, so this outcome is not the recorded one
+        post_result['status'] = status if updated else 'lease_lost'
+        if error_message:
+            post_result['error'] = error_message
+        if publish_id:
+            post_result['publish_id'] = publish_id
+        if not updated:
+            post_result['lease_lost'] = True
+            logger.warning(f"Lease lost for scheduled post {claim.id}, {status} result not recorded")
+
+    def _record_result(self, claim, post_result, future):
+        """Turn a finished publish future into the post's final status"""
+        try:
+            status_code, response_data, request_error, latency_ms = future.result()
+        except Exception as e:
+            status_code, response_data, request_error, latency_ms = None, {}, str(e), None
+
+        post_result['latency_ms'] = round(latency_ms) if latency_ms is not None else None
+
+        if status_code == 200 and 'data' in response_data:
+            creator_info_cache.invalidate(claim.tiktok_account_id)
+            self._finish(claim, post_result, 'completed',
+                         publish_id=response_data['data'].get('publish_id'))
+            logger.info(f"Successfully posted scheduled post {claim.id}")
+        else:
+            creator_info_cache.invalidate_on_error(claim.tiktok_account_id, response_data)
+            error_message = request_error or response_data.get('error', {}).get('message', 'Unknown error')
+            self._finish(claim, post_result, 'failed', error_message)
+            logger.error(f"Failed to post scheduled post {claim.id}: {error_message}")
+
+    def dispatch(self, scheduled_posts, refresh_token=None):
+        """
+        Publish a batch of claimed scheduled posts.
+
+        Each post's lease is renewed right before its publish call and each
+        outcome is committed as soon as it is known.
+
+        Args:
+            scheduled_posts: ScheduledPost rows returned by claim_due_posts
+            refresh_token: Callable taking a TikTokAccount and returning True when
+                           its access token was refreshed
+
+        Returns:
+            dict: Summary with per-post results, in the order the posts were given
+        """
+        started = time.monotonic()
+        results = {}
+        futures = {}
+        # account_id -> deque of (claim, access_token), in schedule order
+        account_queues = OrderedDict()
+
+        # Read everything up front: a commit expires the rows, and a reloaded
+        # claim_token would be the new owner's, which would defeat the fencing
+        claims = []
+        for scheduled_post in scheduled_posts:
+            claims.append(ClaimedPost(
+                scheduled_post.id, scheduled_post.claim_token, scheduled_post.user_id,
+                scheduled_post.tiktok_account_id, scheduled_post.video_url,
+                self._build_request_body(scheduled_post)
+            ))
+            results[scheduled_post.id] = {
+                'post_id': scheduled_post.id,
+                'user_id': scheduled_post.user_id,
+                'tiktok_account_id': scheduled_post.tiktok_account_id,
+                'title': scheduled_post.title,
+                'scheduled_time': scheduled_post.scheduled_time.isoformat()
+            }
+
+        accounts = self._load_accounts(claims, refresh_token)
+
+        for claim in claims:
+            post_result = results[claim.id]
+
+            account, error_message = accounts.get(claim.tiktok_account_id, (None, None))
+            if account is not None and account[0] != claim.user_id:
+                account, error_message = None, 'TikTok account not found or access token missing'
+
+            if account is None:
+                self._finish(claim, post_result, 'failed', error_message)
+                continue
+
+            if not claim.video_url:
+                self._finish(claim, post_result, 'failed', 'No video URL found')
+                continue
+
+            account_queues.setdefault(claim.tiktok_account_id, deque()).append((claim, account[1]))
+
+        while account_queues or futures:
+            # Hand the pool only posts whose account has a free slot
+            for account_id in list(account_queues):
+                queue = account_queues[account_id]
+                while queue and self._acquire_account_slot(account_id):
+                    claim, access_token = queue.popleft()
+                    if not self._renew_lease(claim):
+                        self._release_account_slot(account_id)
+                        post_result = results[claim.id]
+                        post_result['status'] = 'lease_lost'
+                        post_result['lease_lost'] = True
+                        logger.warning(f"Lease lost for scheduled post {claim.id} before publishing, skipped")
+                        continue
+                    logger.info(f"Posting to TikTok for scheduled post {claim.id}")
+                    future = self._executor.submit(self._publish, access_token, claim.request_body)
+                    # Released as soon as the call returns, even if this loop is abandoned
+                    future.add_done_callback(
+                        lambda _, account_id=account_id: self._release_account_slot(account_id)
+                    )
+                    futures[future] = claim
+                if not queue:
+                    del account_queues[account_id]
+
+            if not futures:
+                # Every remaining account is at its limit through another dispatch() call
+                with self._account_slots_changed:
+                    if not any(self._account_in_flight.get(account_id, 0) < self.per_account_limit
+                               for account_id in account_queues):
+                        self._account_slots_changed.wait(timeout=1.0)
+                continue
+
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                claim = futures.pop(future)
+                self._record_result(claim, results[claim.id], future)
+
+        ordered_results = [results[claim.id] for claim in claims]
+        successful = sum(1 for result in ordered_results if result.get('status') == 'completed')
+        lease_lost = sum(1 for result in ordered_results if result.get('status') == 'lease_lost')
+
+        return {
+            'posts_processed': len(ordered_results),
+            'successful': successful,
+            'failed': len(ordered_results) - successful - lease_lost,
+            'lease_lost': lease_lost,
+            'duration_ms': round((time.monotonic() - started) * 1000),
+            'results': ordered_results
+        }
+
+
+def _pending_due(now):
+    """Pending posts whose time has come (served by ix_scheduled_posts_pending_due)"""
+    return and_(ScheduledPost.status == 'pending', ScheduledPost.scheduled_time <= now)
+
+
+def _lease_expired(now):
+    """Processing posts whose owner's lease ran out (served by ix_scheduled_posts_processing_lease)"""
+    return and_(
+        ScheduledPost.status == 'processing',
+        or_(
+            ScheduledPost.lease_expires_at < now,
+            and_(
+                ScheduledPost.lease_expires_at.is_(None),
+                ScheduledPost.updated_at < now - timedelta(seconds=DISPATCH_LEASE_SECONDS)
+            )
+        )
+    )
+
+
+def _due_filter(now):
+    """Rows that are ready to run: pending and due, or processing with an expired lease"""
+    return or_(_pending_due(now), _lease_expired(now))
+
+
+def claim_due_posts(batch_size=DISPATCH_BATCH_SIZE, lease_seconds=DISPATCH_LEASE_SECONDS):
+    """
+    Atomically claim up to batch_size due posts for this instance.
+
+    On PostgreSQL candidate rows are locked with SELECT ... FOR UPDATE SKIP LOCKED,
+    so concurrent executors pick disjoint batches instead of waiting on each other.
+    SQLite ignores FOR UPDATE; there the conditional UPDATE (which re-checks the
+    due predicate under SQLite's single-writer lock) is what makes the claim atomic.
+    Either way only rows stamped with our claim token are returned.
+
+    Returns:
+        list: Claimed ScheduledPost rows, status 'processing' with a fresh lease
+    """
+    now = datetime.utcnow()
+    claim_token = uuid.uuid4().hex
+
+    try:
+        # Two single-status scans instead of one OR'd predicate, so each one walks
+        # its own partial index. Expired leases are few and go first.
+        candidate_ids = db.session.execute(
+            select(ScheduledPost.id)
+            .where(_lease_expired(now))
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+
+        if len(candidate_ids) < batch_size:
+            candidate_ids += db.session.execute(
+                select(ScheduledPost.id)
+                .where(_pending_due(now))
+                .order_by(ScheduledPost.scheduled_time.asc(), ScheduledPost.id.asc())
+                .limit(batch_size - len(candidate_ids))
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+
+        if not candidate_ids:
+            db.session.commit()
+            return []
+
+        db.session.execute(
+            update(ScheduledPost)
+            .where(ScheduledPost.id.in_(candidate_ids), _due_filter(now))
+            .values(
+                status='processing',
+                claim_token=claim_token,
+                claimed_by=WORKER_ID,
+                lease_expires_at=now + timedelta(seconds=lease_seconds),
+                updated_at=now
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    claimed = ScheduledPost.query.filter_by(claim_token=claim_token).order_by(
+        ScheduledPost.scheduled_time.asc()
+    ).all()
+
+    if len(claimed) < len(candidate_ids):
+        logger.info(f"Claimed {len(claimed)} of {len(candidate_ids)} candidate posts (others taken by another instance)")
+
+    return claimed
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """Get the process-wide dispatcher (its pool is the global concurrency limit)"""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = ScheduledPostDispatcher()
+    return _dispatcher
@@ -0,0 +1,90 @@
+"""
+List Serializers
+Column-projected serialization for list endpoints: only the requested columns
+are selected, and rows are turned into dicts without hydrating ORM objects
+"""
+
+from models import ScheduledPost, PostedVideo
+
+
+class FieldSelectionError(ValueError):
+    """Raised when fields= names a field the endpoint does not expose"""
+
+
+def iso_timestamp(value):
+    """ISO 8601 string for a datetime, or None when it is unset"""
+    return value.isoformat() if value else None
+
+
+class ListSerializer:
+    """
+    Serializer for one model's list responses.
+
+    Each field maps to a column and an optional formatter. select() narrows a
+    query to just the requested columns (plus the paging keys) with
+    with_entities, so rows come back as lightweight tuples; dump() formats them.
+    """
+
+    def __init__(self, model, fields, formatters=None, always_select=('id',)):
+        self.model = model
+        self.fields = tuple(fields)
+        self.formatters = formatters or {}
+        self.always_select = tuple(always_select)
+
+    def parse_fields(self, value, default=None):
+        """
+        Resolve a comma-separated fields= parameter.
+
+        Args:
+            value: Raw parameter value, None/empty for the default field set
+            default: Field names returned when value is empty (default: all fields)
+
+        Returns:
+            tuple: Field names, in the serializer's order
+
+        Raises:
+            FieldSelectionError: When a field name is unknown
+        """
+        if not value:
+            return tuple(default or self.fields)
+
+        requested = {name.strip() for name in value.split(',') if name.strip()}
+        unknown = requested - set(self.fields)
+        if unknown:
+            raise FieldSelectionError(f"Unknown fields: {', '.join(sorted(unknown))}. "
+                                      f"Available: {', '.join(self.fields)}")
+        return tuple(name for name in self.fields if name in requested)
+
+    def select(self, query, fields):
+        """Restrict query to the columns needed for fields and for paging"""
+        names = dict.fromkeys(self.always_select + tuple(fields))
+        return query.with_entities(*(getattr(self.model, name) for name in names))
+
+    def dump(self, rows, fields):
+        """
+        Returns:
+            list: One dict per row with exactly the requested fields
+        """
+        formatters = [(name, self.formatters.get(name)) for name in fields]
+        return [
+            {name: formatter(getattr(row, name)) if formatter else getattr(row, name)
+             for name, formatter in formatters}
+            for row in rows
+        ]
+
+
+scheduled_post_serializer = ListSerializer(
+    ScheduledPost,
+    fields=('id', 'title', 'description', 'video_url', 'privacy_level', 'scheduled_time', 'status',
+            'error_message', 'posted_at', 'created_at', 'tiktok_account_id'),
+    formatters={'scheduled_time': iso_timestamp, 'posted_at': iso_timestamp, 'created_at': iso_timestamp},
+    always_select=('id', 'scheduled_time')
+)
+
+posted_video_serializer = ListSerializer(
+    PostedVideo,
+    fields=('id', 'title', 'description', 'video_url', 'privacy_level', 'post_id', 'publish_id', 'status',
+            'error_message', 'posted_at', 'created_at', 'tiktok_account_id'),
+    formatters={'posted_at': iso_timestamp, 'created_at': iso_timestamp},
+    always_select=('id', 'posted_at')
+)
@@ -0,0 +1,231 @@
+"""
+Startup Profiling
+Optional cold-start instrumentation: per-import and per-phase timings plus
+time to first request, written as a JSON report (STARTUP_PROFILE=1)
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Profiling settings (overridable per deployment)
+STARTUP_PROFILE = os.environ.get('STARTUP_PROFILE', '0') == '1'
+STARTUP_PROFILE_PATH = os.environ.get('STARTUP_PROFILE_PATH', os.path.join(os.getcwd(), 'temp', 'startup_profile.json'))
+# Cold-start budget from process start to the first response
+STARTUP_TARGET_MS = float(os.environ.get('STARTUP_TARGET_MS', 1500))
+# Slowest imports kept in the report
+STARTUP_PROFILE_TOP_IMPORTS = int(os.environ.get('STARTUP_PROFILE_TOP_IMPORTS', 30))
+# Defer modules the web server does not need at boot (e.g. Flask-Migrate/alembic) until first use
+STARTUP_LAZY_IMPORTS = os.environ.get('STARTUP_LAZY_IMPORTS', '1') == '1'
+
+# Taken as early as possible; app.py imports this module first
+MODULE_LOADED_AT = time.time()
+
+
+def process_started_at():
+    """Wall-clock process start time from /proc, falling back to when this module loaded"""
+    try:
+        with open('/proc/self/stat') as f:
+            # Field 22 (starttime) is in clock ticks since boot; fields after the ')' of comm
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/stat') as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith('btime'))
+        return boot_time + start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, StopIteration):
+        return MODULE_LOADED_AT
+
+
+class _TimedLoader:
+    """Wraps a module loader so exec_module is timed"""
+
+    def __init__(self, loader, profiler):
+        self._loader = loader
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        with self._profiler.timed_import(module.__name__):
+            self._loader.exec_module(module)
+
+
+class _ImportTimer:
+    """meta_path finder that delegates to the real finders and times each module's execution"""
+
+    def __init__(self, profiler):
+        self._profiler = profiler
+        self._local = threading.local()
+
+    def find_spec(self, fullname, path=None, target=None):
+        if getattr(self._local, 'busy', False):
+            return None
+        self._local.busy = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                        spec.loader = _TimedLoader(spec.loader, self._profiler)
+                    return spec
+            return None
+        finally:
+            self._local.busy = False
+
+
+class StartupProfiler:
+    """
+    Collects cold-start timings for one process.
+
+    Imports are timed like `python -X importtime` (self and cumulative
+    milliseconds). Phases are the spans between named checkpoints in app
+    setup. The report is written once the first request has been answered.
+    """
+
+    def __init__(self, report_path=STARTUP_PROFILE_PATH, target_ms=STARTUP_TARGET_MS):
+        self.report_path = report_path
+        self.target_ms = target_ms
+        self.process_started = process_started_at()
+        self.phases = {}
+        self.imports = {}
+        self.app_ready_at = None
+        # Interpreter start-up and anything imported before this module
+        self.phases['interpreter'] = round((MODULE_LOADED_AT - self.process_started) * 1000, 2)
+        self._last_checkpoint = MODULE_LOADED_AT
+        self._import_stack = []
+        self._finder = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Begin timing imports"""
+        if self._finder is None:
+            self._finder = _ImportTimer(self)
+            sys.meta_path.insert(0, self._finder)
+        return self
+
+    def stop_import_timing(self):
+        if self._finder is not None and self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+        self._finder = None
+
+    @contextmanager
+    def timed_import(self, name):
+        started = time.perf_counter()
+        self._import_stack.append(0.0)
+        try:
+            yield
+        finally:
+            children = self._import_stack.pop()
+            elapsed = (time.perf_counter() - started) * 1000
+            if self._import_stack:
+                self._import_stack[-1] += elapsed
+            self.imports[name] = {'self_ms': round(elapsed - children, 2), 'cumulative_ms': round(elapsed, 2)}
+
+    def checkpoint(self, name):
+        """Record the time since the previous checkpoint as phase `name`"""
+        now = time.time()
+        self.phases[name] = round((now - self._last_checkpoint) * 1000, 2)
+        self._last_checkpoint = now
+
+    def mark_app_ready(self):
+        self.app_ready_at = time.time()
+        self.stop_import_timing()
+
+    def instrument(self, app):
+        """Time the first request through app; later requests go straight to the original WSGI app"""
+        original_wsgi_app = app.wsgi_app
+
+        def first_request(environ, start_response):
+            with self._lock:
+                if app.wsgi_app is first_request:
+                    app.wsgi_app = original_wsgi_app
+                    is_first = True
+                else:
+                    is_first = False
+
+            if not is_first:
+                return original_wsgi_app(environ, start_response)
+
+            started = time.time()
+            try:
+                return original_wsgi_app(environ, start_response)
+            finally:
+                self.write_report(environ.get('PATH_INFO'), started, time.time())
+
+        app.wsgi_app = first_request
+
+    def report(self, first_request_path=None, first_request_started=None, first_request_finished=None):
+        """
+        Returns:
+            dict: Phase and import timings, time to app ready / first response and the target verdict
+        """
+        def since_start(timestamp):
+            return round((timestamp - self.process_started) * 1000, 1) if timestamp else None
+
+        slowest = sorted(self.imports.items(), key=lambda item: item[1]['cumulative_ms'], reverse=True)
+        top_level = [name for name in self.imports if '.' not in name]
+        time_to_first_response = since_start(first_request_finished)
+
+        return {
+            'pid': os.getpid(),
+            'phases_ms': self.phases,
+            'imports': {
+                'count': len(self.imports),
+                'total_ms': round(sum(timing['self_ms'] for timing in self.imports.values()), 1),
+                'top_level': sorted(top_level, key=lambda name: self.imports[name]['cumulative_ms'], reverse=True)[:10],
+                'slowest': dict(slowest[:STARTUP_PROFILE_TOP_IMPORTS])
+            },
+            'time_to_app_ready_ms': since_start(self.app_ready_at),
+            'first_request': {
+                'path': first_request_path,
+                'arrived_at_ms': since_start(first_request_started),
+                'duration_ms': round((first_request_finished - first_request_started) * 1000, 1)
+                if first_request_finished and first_request_started else None
+            },
+            'time_to_first_response_ms': time_to_first_response,
+            'target_ms': self.target_ms,
+            'target_met': time_to_first_response <= self.target_ms if time_to_first_response is not None else None
+        }
+
+    def write_report(self, first_request_path=None, first_request_started=None, first_request_finished=None):
+        report = self.report(first_request_path, first_request_started, first_request_finished)
+        try:
+            os.makedirs(os.path.dirname(self.report_path), exist_ok=True)
+            with open(self.report_path, 'w') as f:
+                json.dump(report, f, indent=2)
+        except OSError as e:
+            logger.error(f"Could not write startup profile: {e}")
+
+        logger.info(f"Startup profile: app ready in {report['time_to_app_ready_ms']}ms, "
+                    f"first response at {report['time_to_first_response_ms']}ms "
+                    f"(target {self.target_ms:.0f}ms, met={report['target_met']}), "
+                    f"slowest imports {report['imports']['top_level'][:5]}")
+        return report
+
+
+class _NullProfiler:
+    """Stand-in used when profiling is off, so call sites need no conditionals"""
+
+    def checkpoint(self, name):
+        pass
+
+    def mark_app_ready(self):
+        pass
+
+    def instrument(self, app):
+        pass
+
+
+# Process-wide profiler, importing modules from here on is timed when enabled
+startup_profiler = StartupProfiler().start() if STARTUP_PROFILE else _NullProfiler()
@@ -0,0 +1,138 @@
+"""
+Streaming Upload Helpers
+Builds multipart/form-data request bodies that read the uploaded file from
+disk in fixed-size chunks instead of buffering the whole video in memory, and
+hashes incoming uploads while they are received
+"""
+
+import os
+import uuid
+import hashlib
+import tempfile
+
+from flask import Request
+
+# Bytes read from the source file per read() call
+UPLOAD_STREAM_CHUNK_SIZE = int(os.environ.get('UPLOAD_STREAM_CHUNK_SIZE', 1024 * 1024))
+# Uploads larger than this are spooled to disk (same threshold as Werkzeug)
+UPLOAD_SPOOL_MAX_SIZE = 500 * 1024
+
+
+class HashingSpooledFile(tempfile.SpooledTemporaryFile):
+    """
+    Spooled temp file that computes the SHA-256 of everything written to it.
+
+    The form parser writes each upload sequentially, so once parsing is done
+    hexdigest() is the content hash with no second pass over the file.
+    """
+
+    def __init__(self, max_size=UPLOAD_SPOOL_MAX_SIZE):
+        super().__init__(max_size=max_size, mode='rb+')
+        self._sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self._sha256.update(data)
+        return super().write(data)
+
+    def hexdigest(self):
+        return self._sha256.hexdigest()
+
+
+class HashingRequest(Request):
+    """Request class whose file uploads are received into HashingSpooledFile"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpooledFile()
+
+
+def file_sha256(fileobj, chunk_size=UPLOAD_STREAM_CHUNK_SIZE):
+    """
+    SHA-256 of an uploaded file's stream, rewound to the start afterwards.
+
+    Uses the digest computed during receipt when the stream is a
+    HashingSpooledFile, otherwise reads the stream once in chunks.
+
+    Returns:
+        str: Hex digest
+    """
+    if isinstance(fileobj, HashingSpooledFile):
+        return fileobj.hexdigest()
+
+    sha256 = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+        sha256.update(chunk)
+    fileobj.seek(0)
+    return sha256.hexdigest()
+
+
+class MultipartFileStream:
+    """
+    File-like multipart/form-data body with a single file field.
+
+    The part headers and closing boundary are small byte strings; the file
+    itself is read lazily from the underlying seekable stream (Werkzeug's
+    spooled temp file for uploads), so memory stays at one chunk regardless
+    of video size. rewind() restarts the body for a retry without copying.
+    """
+
+    def __init__(self, fileobj, filename, content_type=None, field_name='file',
+                 chunk_size=UPLOAD_STREAM_CHUNK_SIZE):
+        self._fileobj = fileobj
+        self._chunk_size = chunk_size
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={self.boundary}'
+
+        safe_filename = filename.replace('"', '%22')
+        self._preamble = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{safe_filename}"\r\n'
+            f'Content-Type: {content_type or "application/octet-stream"}\r\n\r\n'
+        ).encode('utf-8')
+        self._epilogue = f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+
+        self._fileobj.seek(0, os.SEEK_END)
+        self._file_size = self._fileobj.tell()
+        self.rewind()
+
+    def __len__(self):
+        return len(self._preamble) + self._file_size + len(self._epilogue)
+
+    def rewind(self):
+        """Reset to the start of the body so the upload can be retried"""
+        self._fileobj.seek(0)
+        self._position = 0
+
+    def read(self, size=-1):
+        """
+        Read up to size bytes, never more than one chunk at a time.
+
+        size < 0 reads the rest of the body like a regular file. That
+        buffers whatever is left, so streaming consumers should pass a size.
+        """
+        if size is None or size < 0:
+            return b''.join(iter(lambda: self.read(self._chunk_size), b''))
+        size = min(size, self._chunk_size)
+
+        preamble_len = len(self._preamble)
+        file_end = preamble_len + self._file_size
+
+        if self._position < preamble_len:
+            data = self._preamble[self._position:self._position + size]
+        elif self._position < file_end:
+            data = self._fileobj.read(min(size, file_end - self._position))
+            if not data:
+                raise IOError('Upload stream ended before the expected file size')
+        else:
+            offset = self._position - file_end
+            data = self._epilogue[offset:offset + size]
+
+        self._position += len(data)
+        return data
+
+    def __iter__(self):
+        while True:
+            data = self.read(self._chunk_size)
+            if not data:
+                break
+            yield data
@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+from flask import Flask
+
+# Modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db, User, TikTokAccount  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Minimal app with the real models on a throwaway SQLite database"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def user(app):
+    user = User(email='owner@example.com')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def make_account(user):
+    def make_account(username='creator', **values):
+        account = TikTokAccount(user_id=user.id, tiktok_user_id=f'open-{username}', username=username,
+                                access_token=f'token-{username}', **values)
+        db.session.add(account)
+        db.session.commit()
+        return account
+    return make_account
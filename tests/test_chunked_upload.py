@@ -0,0 +1,118 @@
+"""Tests for FILE_UPLOAD chunk planning against TikTok's media transfer limits"""
+
+import pytest
+
+from chunked_upload import (
+    MAX_CHUNK_COUNT,
+    MAX_CHUNK_SIZE,
+    MAX_FINAL_CHUNK_SIZE,
+    MIN_CHUNK_SIZE,
+    build_source_info,
+    chunk_ranges,
+    plan_chunks,
+)
+
+MB = 1024 * 1024
+
+
+def _check_plan(plan):
+    """Assert a plan follows every TikTok rule and its ranges cover the file exactly"""
+    ranges = chunk_ranges(plan)
+    sizes = [last_byte - first_byte + 1 for _, first_byte, last_byte in ranges]
+
+    assert len(ranges) == plan['total_chunk_count'] <= MAX_CHUNK_COUNT
+    assert ranges[0][1] == 0
+    assert ranges[-1][2] == plan['video_size'] - 1
+    assert all(ranges[i][2] + 1 == ranges[i + 1][1] for i in range(len(ranges) - 1))
+    assert sum(sizes) == plan['video_size']
+    if plan['video_size'] >= MIN_CHUNK_SIZE:
+        assert MIN_CHUNK_SIZE <= plan['chunk_size'] <= MAX_CHUNK_SIZE
+        assert all(size == plan['chunk_size'] for size in sizes[:-1])
+        assert plan['chunk_size'] <= sizes[-1] <= MAX_FINAL_CHUNK_SIZE
+    return sizes
+
+
+@pytest.mark.parametrize('video_size', [1, MB, MIN_CHUNK_SIZE - 1])
+def test_video_under_minimum_is_one_whole_chunk(video_size):
+    plan = plan_chunks(video_size)
+
+    assert plan == {'video_size': video_size, 'chunk_size': video_size, 'total_chunk_count': 1}
+    assert _check_plan(plan) == [video_size]
+
+
+def test_video_at_minimum_is_chunked():
+    plan = plan_chunks(MIN_CHUNK_SIZE)
+
+    assert plan['chunk_size'] == MIN_CHUNK_SIZE
+    assert plan['total_chunk_count'] == 1
+
+
+@pytest.mark.parametrize('requested, expected', [
+    (1, MIN_CHUNK_SIZE),
+    (MIN_CHUNK_SIZE - 1, MIN_CHUNK_SIZE),
+    (10 * MB, 10 * MB),
+    (MAX_CHUNK_SIZE, MAX_CHUNK_SIZE),
+    (MAX_CHUNK_SIZE + 1, MAX_CHUNK_SIZE),
+    (512 * MB, MAX_CHUNK_SIZE),
+])
+def test_requested_chunk_size_is_clamped(requested, expected):
+    plan = plan_chunks(1024 * MB, chunk_size=requested)
+
+    assert plan['chunk_size'] == expected
+    _check_plan(plan)
+
+
+def test_chunk_size_never_exceeds_video_size():
+    plan = plan_chunks(6 * MB, chunk_size=MAX_CHUNK_SIZE)
+
+    assert plan['chunk_size'] == 6 * MB
+    assert _check_plan(plan) == [6 * MB]
+
+
+def test_trailing_bytes_merge_into_final_chunk():
+    plan = plan_chunks(2 * MAX_CHUNK_SIZE - 1, chunk_size=MAX_CHUNK_SIZE)
+
+    assert plan['total_chunk_count'] == 1
+    assert _check_plan(plan) == [2 * MAX_CHUNK_SIZE - 1]
+
+
+def test_final_chunk_stays_within_limit_at_maximum_chunk_size():
+    plan = plan_chunks(3 * MAX_CHUNK_SIZE - 1, chunk_size=MAX_CHUNK_SIZE)
+
+    sizes = _check_plan(plan)
+    assert sizes == [MAX_CHUNK_SIZE, 2 * MAX_CHUNK_SIZE - 1]
+    assert sizes[-1] < MAX_FINAL_CHUNK_SIZE
+
+
+def test_chunk_size_grows_to_stay_under_chunk_count_cap():
+    video_size = MAX_CHUNK_COUNT * 10 * MB + 12345
+    plan = plan_chunks(video_size, chunk_size=5 * MB)
+
+    assert plan['total_chunk_count'] <= MAX_CHUNK_COUNT
+    assert plan['chunk_size'] > 5 * MB
+    _check_plan(plan)
+
+
+def test_largest_uploadable_video():
+    plan = plan_chunks(MAX_CHUNK_COUNT * MAX_CHUNK_SIZE, chunk_size=5 * MB)
+
+    assert plan['chunk_size'] == MAX_CHUNK_SIZE
+    assert plan['total_chunk_count'] == MAX_CHUNK_COUNT
+    _check_plan(plan)
+
+
+def test_video_beyond_limits_is_rejected():
+    with pytest.raises(ValueError):
+        plan_chunks(MAX_CHUNK_COUNT * MAX_CHUNK_SIZE + 1)
+
+
+@pytest.mark.parametrize('video_size', [0, -1])
+def test_empty_video_is_rejected(video_size):
+    with pytest.raises(ValueError):
+        plan_chunks(video_size)
+
+
+def test_source_info_matches_plan():
+    plan = plan_chunks(100 * MB, chunk_size=10 * MB)
+
+    assert build_source_info(100 * MB, chunk_size=10 * MB) == {'source': 'FILE_UPLOAD', **plan}
@@ -0,0 +1,171 @@
+"""Tests for keyset pagination and the list endpoints built on it"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from models import db, PostedVideo, User
+from pagination import PaginationError, decode_cursor, encode_cursor, paginate, parse_page_args
+
+BASE_TIME = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def _add_videos(user, account, posted_at_values):
+    videos = [
+        PostedVideo(user_id=user.id, tiktok_account_id=account.id, title=f'video{index}', posted_at=posted_at)
+        for index, posted_at in enumerate(posted_at_values)
+    ]
+    db.session.add_all(videos)
+    db.session.commit()
+    # posted_at has a column default, so NULLs have to be written explicitly
+    undated_ids = [video.id for video, posted_at in zip(videos, posted_at_values) if posted_at is None]
+    if undated_ids:
+        db.session.execute(update(PostedVideo).where(PostedVideo.id.in_(undated_ids)).values(posted_at=None))
+        db.session.commit()
+    return [video.id for video in videos]
+
+
+def _all_pages(query, limit, descending=False, **window):
+    """Follow next_cursor to the end, returning each page's ids"""
+    pages, cursor = [], None
+    while True:
+        args = {'limit': str(limit), **window}
+        if cursor:
+            args['cursor'] = cursor
+        rows, cursor = paginate(query, PostedVideo.posted_at, PostedVideo.id, parse_page_args(args), descending)
+        pages.append([row.id for row in rows])
+        if cursor is None:
+            return pages
+
+
+@pytest.fixture
+def videos(user, make_account):
+    """Two videos sharing a timestamp, two later ones and two never stamped"""
+    account = make_account()
+    ids = _add_videos(user, account, [
+        None,
+        BASE_TIME + timedelta(minutes=2),
+        BASE_TIME,
+        None,
+        BASE_TIME,
+        BASE_TIME + timedelta(minutes=1),
+    ])
+    return ids, PostedVideo.query.filter_by(tiktok_account_id=account.id)
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(BASE_TIME, 42)) == (BASE_TIME, 42)
+    assert decode_cursor(encode_cursor(None, 7)) == (None, 7)
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', 'W10', encode_cursor(BASE_TIME, 1)[:-3] + '!!!'])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(PaginationError):
+        parse_page_args({'cursor': cursor})
+
+
+@pytest.mark.parametrize('args', [{'limit': 'ten'}, {'limit': '0'}, {'start': 'yesterday'}])
+def test_malformed_page_args_are_rejected(args):
+    with pytest.raises(PaginationError):
+        parse_page_args(args)
+
+
+def test_ascending_pages_list_null_timestamps_last(videos):
+    ids, query = videos
+
+    pages = _all_pages(query, limit=2)
+
+    assert pages == [[ids[2], ids[4]], [ids[5], ids[1]], [ids[0], ids[3]]]
+
+
+def test_descending_pages_list_null_timestamps_last(videos):
+    ids, query = videos
+
+    pages = _all_pages(query, limit=2, descending=True)
+
+    assert pages == [[ids[1], ids[5]], [ids[4], ids[2]], [ids[3], ids[0]]]
+
+
+@pytest.mark.parametrize('limit', [1, 3, 4, 5, 6, 10])
+@pytest.mark.parametrize('descending', [False, True])
+def test_every_row_is_listed_exactly_once(videos, limit, descending):
+    ids, query = videos
+
+    pages = _all_pages(query, limit=limit, descending=descending)
+    listed = [row_id for page in pages for row_id in page]
+
+    assert sorted(listed) == sorted(ids)
+    assert all(len(page) <= limit for page in pages)
+
+
+def test_page_boundary_inside_null_segment(videos):
+    ids, query = videos
+
+    rows, cursor = paginate(query, PostedVideo.posted_at, PostedVideo.id, parse_page_args({'limit': '5'}))
+
+    assert [row.id for row in rows] == [ids[2], ids[4], ids[5], ids[1], ids[0]]
+    assert decode_cursor(cursor) == (None, ids[0])
+
+
+def test_window_excludes_null_timestamps(videos):
+    ids, query = videos
+
+    pages = _all_pages(query, limit=2, start=BASE_TIME.isoformat(),
+                       end=(BASE_TIME + timedelta(minutes=2)).isoformat())
+
+    assert pages == [[ids[2], ids[4]], [ids[5]]]
+
+
+@pytest.fixture(scope='module')
+def web_app(tmp_path_factory):
+    """The real Flask app on its own SQLite database"""
+    database_url = f"sqlite:///{tmp_path_factory.mktemp('web') / 'app.db'}"
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv('DATABASE_URL', database_url)
+        import app as app_module
+    assert app_module.app.config['SQLALCHEMY_DATABASE_URI'] == database_url
+
+    with app_module.app.app_context():
+        db.create_all()
+    return app_module.app
+
+
+@pytest.fixture
+def client(web_app):
+    with web_app.app_context():
+        user = User.query.filter_by(email='lister@example.com').first()
+        if user is None:
+            user = User(email='lister@example.com')
+            user.set_password('password123')
+            db.session.add(user)
+            db.session.commit()
+        user_id = user.id
+
+    client = web_app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+@pytest.mark.parametrize('url', [
+    '/api/scheduled/list?cursor=not-a-cursor',
+    '/api/scheduled/list?limit=zero',
+    '/api/scheduled/list?fields=title,password_hash',
+    '/api/scheduled/list/1?cursor=not-a-cursor',
+    '/api/posted/list/1?fields=nope',
+    '/api/posted/list/1?start=not-a-date',
+])
+def test_list_endpoints_reject_bad_arguments(client, url):
+    response = client.get(url)
+
+    assert response.status_code == 400
+    assert response.get_json()['error']
+
+
+def test_list_endpoint_accepts_its_own_cursor(client):
+    response = client.get(f"/api/scheduled/list?cursor={encode_cursor(BASE_TIME, 1)}&fields=title")
+
+    assert response.status_code == 200
+    assert response.get_json() == {'scheduled_posts': [], 'next_cursor': None}
@@ -0,0 +1,49 @@
+"""Tests for background profile revalidation"""
+
+import pytest
+import requests
+
+import profile_sync
+from models import db, TikTokAccount
+from profile_sync import ProfileRevalidator
+
+
+class _Response:
+
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+def _fail_with_401(access_token, fields):
+    return _Response(401, {'error': {'code': 'access_token_invalid'}})
+
+
+def _fail_with_timeout(access_token, fields):
+    raise requests.Timeout('read timed out')
+
+
+@pytest.mark.parametrize('user_info', [_fail_with_401, _fail_with_timeout])
+def test_failed_refresh_waits_out_revalidation_interval(app, make_account, monkeypatch, user_info):
+    account = make_account()
+    calls = []
+
+    def counting_user_info(access_token, fields):
+        calls.append(access_token)
+        return user_info(access_token, fields)
+
+    monkeypatch.setattr(profile_sync.tiktok_client, 'user_info', counting_user_info)
+    revalidator = ProfileRevalidator(app)
+    assert revalidator.is_stale(account)
+
+    revalidator._refresh(account.id)
+
+    db.session.expire_all()
+    account = db.session.get(TikTokAccount, account.id)
+    assert account.last_profile_update is not None
+    assert not revalidator.is_stale(account)
+    assert revalidator.schedule(account) is False
+    assert len(calls) == 1
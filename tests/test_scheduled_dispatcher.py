@@ -0,0 +1,167 @@
+"""Tests for claiming, lease fencing and per-account throttling of scheduled posts"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+import scheduled_dispatcher
+from models import db, ScheduledPost
+from scheduled_dispatcher import ScheduledPostDispatcher, claim_due_posts
+
+
+class _Response:
+    status_code = 200
+
+    def __init__(self, publish_id):
+        self._publish_id = publish_id
+
+    def json(self):
+        return {'data': {'publish_id': self._publish_id}}
+
+
+@pytest.fixture
+def published(monkeypatch):
+    """Record publish calls instead of sending them to TikTok"""
+    calls = []
+    hooks = {'before': None, 'delay': 0}
+
+    def publish_video_init(access_token, request_body, timeout=None):
+        title = request_body['post_info']['title']
+        calls.append(title)
+        if hooks['before']:
+            hooks['before'](title)
+        time.sleep(hooks['delay'])
+        return _Response(f'publish-{title}')
+
+    monkeypatch.setattr(scheduled_dispatcher.tiktok_client, 'publish_video_init', publish_video_init)
+    published = type('Published', (), {})()
+    published.calls = calls
+    published.hooks = hooks
+    return published
+
+
+def _add_posts(user, account, count, minutes_ago=5, prefix='post'):
+    now = datetime.utcnow()
+    for index in range(count):
+        db.session.add(ScheduledPost(
+            user_id=user.id, tiktok_account_id=account.id, title=f'{prefix}{index}',
+            video_url='https://example.com/video.mp4',
+            scheduled_time=now - timedelta(minutes=minutes_ago) + timedelta(seconds=index)
+        ))
+    db.session.commit()
+
+
+def _steal(title, engine):
+    """Simulate another instance reclaiming a post"""
+    with engine.begin() as connection:
+        connection.execute(update(ScheduledPost).where(ScheduledPost.title == title).values(claim_token='other'))
+
+
+def test_claim_takes_due_posts_once(user, make_account):
+    account = make_account()
+    _add_posts(user, account, 3)
+    db.session.add(ScheduledPost(user_id=user.id, tiktok_account_id=account.id, title='future',
+                                 video_url='https://example.com/v.mp4',
+                                 scheduled_time=datetime.utcnow() + timedelta(hours=1)))
+    db.session.commit()
+
+    claimed = claim_due_posts()
+
+    assert [post.title for post in claimed] == ['post0', 'post1', 'post2']
+    assert {post.status for post in claimed} == {'processing'}
+    assert len({post.claim_token for post in claimed}) == 1
+    assert all(post.lease_expires_at > datetime.utcnow() for post in claimed)
+    assert claim_due_posts() == []
+
+
+def test_only_expired_leases_are_reclaimed(user, make_account):
+    account = make_account()
+    _add_posts(user, account, 2)
+    first_token = claim_due_posts()[0].claim_token
+    db.session.execute(update(ScheduledPost).where(ScheduledPost.title == 'post0')
+                       .values(lease_expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.session.commit()
+
+    reclaimed = claim_due_posts()
+
+    assert [post.title for post in reclaimed] == ['post0']
+    assert reclaimed[0].claim_token != first_token
+
+
+def test_dispatch_publishes_and_records_results(user, make_account, published):
+    account = make_account()
+    _add_posts(user, account, 3)
+
+    summary = ScheduledPostDispatcher(max_workers=2).dispatch(claim_due_posts())
+
+    assert summary['successful'] == 3
+    assert summary['failed'] == 0
+    assert sorted(published.calls) == ['post0', 'post1', 'post2']
+    rows = ScheduledPost.query.order_by(ScheduledPost.id).all()
+    assert [(row.status, row.post_id, row.claim_token) for row in rows] == [
+        ('completed', 'publish-post0', None),
+        ('completed', 'publish-post1', None),
+        ('completed', 'publish-post2', None),
+    ]
+
+
+def test_post_reclaimed_while_queued_is_not_published(user, make_account, published):
+    account = make_account()
+    _add_posts(user, account, 3)
+    engine = db.engine
+    published.hooks['before'] = lambda title: title == 'post0' and _steal('post2', engine)
+
+    summary = ScheduledPostDispatcher(max_workers=2, per_account_limit=1).dispatch(claim_due_posts())
+
+    assert 'post2' not in published.calls
+    assert summary['successful'] == 2
+    assert summary['lease_lost'] == 1
+    assert summary['failed'] == 0
+    stolen = ScheduledPost.query.filter_by(title='post2').one()
+    assert (stolen.status, stolen.claim_token) == ('processing', 'other')
+
+
+def test_result_is_fenced_when_lease_is_lost_during_publish(user, make_account, published):
+    account = make_account()
+    _add_posts(user, account, 1)
+    engine = db.engine
+    published.hooks['before'] = lambda title: _steal(title, engine)
+
+    summary = ScheduledPostDispatcher(max_workers=1).dispatch(claim_due_posts())
+
+    assert summary['successful'] == 0
+    assert summary['lease_lost'] == 1
+    assert summary['results'][0]['status'] == 'lease_lost'
+    row = ScheduledPost.query.one()
+    assert (row.status, row.claim_token, row.post_id) == ('processing', 'other', None)
+
+
+def test_busy_account_does_not_hold_up_other_accounts(user, make_account, published):
+    busy = make_account('busy')
+    _add_posts(user, busy, 8, minutes_ago=10, prefix='busy')
+    for name in ('a', 'b', 'c'):
+        _add_posts(user, make_account(name), 1, minutes_ago=1, prefix=name)
+
+    in_flight, peak = {}, {}
+    lock = threading.Lock()
+
+    def track(title):
+        account = title.rstrip('0123456789')
+        with lock:
+            in_flight[account] = in_flight.get(account, 0) + 1
+            peak[account] = max(peak.get(account, 0), in_flight[account])
+        time.sleep(0.05)
+        with lock:
+            in_flight[account] -= 1
+
+    published.hooks['before'] = track
+    dispatcher = ScheduledPostDispatcher(max_workers=4, per_account_limit=1)
+    dispatcher.dispatch(claim_due_posts())
+
+    assert peak['busy'] == 1
+    # The other accounts' posts were not queued behind all eight busy posts
+    assert max(published.calls.index(name + '0') for name in ('a', 'b', 'c')) < 4
+    assert dispatcher._account_in_flight == {}
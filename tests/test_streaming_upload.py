@@ -0,0 +1,105 @@
+"""Tests for the streaming multipart upload body"""
+
+import io
+import resource
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from streaming_upload import MultipartFileStream
+
+MB = 1024 * 1024
+
+
+class _DiscardingHandler(BaseHTTPRequestHandler):
+    """Reads the request body in small pieces and keeps only its length"""
+
+    def do_POST(self):
+        remaining = int(self.headers['Content-Length'])
+        received = 0
+        while remaining:
+            data = self.rfile.read(min(remaining, 64 * 1024))
+            if not data:
+                break
+            received += len(data)
+            remaining -= len(data)
+        body = str(received).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def upload_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _DiscardingHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/upload'
+    server.shutdown()
+    server.server_close()
+
+
+def _write_file(path, size):
+    block = b'\0' * MB
+    with open(path, 'wb') as f:
+        for _ in range(size // MB):
+            f.write(block)
+    return path
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def test_peak_rss_does_not_grow_with_file_size(upload_server, tmp_path):
+    growth = {}
+    for size_mb in (50, 400):
+        path = _write_file(tmp_path / f'video_{size_mb}.mp4', size_mb * MB)
+        with open(path, 'rb') as f:
+            body = MultipartFileStream(f, path.name, 'video/mp4')
+            before = _peak_rss_mb()
+            response = requests.post(upload_server, data=body, headers={'Content-Type': body.content_type})
+            growth[size_mb] = _peak_rss_mb() - before
+
+        assert response.status_code == 200
+        assert int(response.text) == len(body)
+        path.unlink()
+
+    # A buffering implementation would add roughly the file size to peak RSS
+    assert growth[50] < 32, growth
+    assert growth[400] < 32, growth
+
+
+def test_body_matches_multipart_layout():
+    body = MultipartFileStream(io.BytesIO(b'x' * 10), 'a"b.mp4', 'video/mp4', chunk_size=4)
+    data = b''.join(body)
+
+    assert len(data) == len(body)
+    assert data.startswith(f'--{body.boundary}\r\n'.encode())
+    assert b'filename="a%22b.mp4"' in data
+    assert data.endswith(f'\r\n{"x" * 10}\r\n--{body.boundary}--\r\n'.encode())
+
+
+def test_read_without_size_returns_rest_of_body():
+    body = MultipartFileStream(io.BytesIO(b'y' * 100), 'v.mp4', chunk_size=8)
+    first = body.read(8)
+    rest = body.read()
+
+    assert len(first) == 8
+    assert len(first) + len(rest) == len(body)
+    assert body.read() == b''
+
+
+def test_rewind_replays_the_same_body():
+    body = MultipartFileStream(io.BytesIO(b'z' * 50), 'v.mp4', chunk_size=16)
+    first = body.read()
+    body.rewind()
+
+    assert body.read() == first
@@ -0,0 +1,50 @@
+"""Tests for the bulk token refresh engine"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import token_refresh
+from models import db, TikTokAccount
+from token_refresh import TokenRefreshEngine
+
+
+class _Response:
+    status_code = 200
+
+    def __init__(self, refresh_token):
+        self._refresh_token = refresh_token
+
+    def json(self):
+        return {'access_token': f'new-{self._refresh_token}', 'refresh_token': f'rotated-{self._refresh_token}',
+                'expires_in': 86400}
+
+
+def test_per_account_commits_do_not_reload_accounts(make_account, monkeypatch):
+    expires_at = datetime.utcnow() + timedelta(hours=1)
+    for index in range(5):
+        make_account(f'creator{index}', refresh_token=f'refresh{index}', token_expires_at=expires_at)
+    monkeypatch.setattr(token_refresh.tiktok_client, 'request_token',
+                        lambda params: _Response(params['refresh_token']))
+
+    selects = []
+
+    def count_selects(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            selects.append(statement)
+
+    session = Session(db.engine)
+    event.listen(db.engine, 'before_cursor_execute', count_selects)
+    try:
+        summary = TokenRefreshEngine(max_workers=2, spread_seconds=0).run(session)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_selects)
+
+    assert summary['refreshed'] == 5
+    assert len(selects) == 1
+    assert session.expire_on_commit is True
+    session.close()
+
+    tokens = db.session.query(TikTokAccount.access_token, TikTokAccount.refresh_token).order_by(TikTokAccount.id).all()
+    assert tokens == [(f'new-refresh{index}', f'rotated-refresh{index}') for index in range(5)]
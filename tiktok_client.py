@@ -0,0 +1,231 @@
+"""
+TikTok Open API Client
+Shared pooled HTTP session for all TikTok API calls, with per-endpoint
+timeouts and retry/backoff for transient failures
+"""
+
+import os
+import time
+import random
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from tiktok_compliance import TikTokAPIErrorHandler
+
+logger = logging.getLogger(__name__)
+
+# TikTok API configuration
+TIKTOK_BASE_URL = 'https://open.tiktokapis.com/v2'
+TIKTOK_TOKEN_URL = f'{TIKTOK_BASE_URL}/oauth/token/'
+
+# Connection pool and retry settings
+TIKTOK_HTTP_POOL_SIZE = int(os.environ.get('TIKTOK_HTTP_POOL_SIZE', 32))
+TIKTOK_HTTP_MAX_RETRIES = int(os.environ.get('TIKTOK_HTTP_MAX_RETRIES', 2))
+TIKTOK_HTTP_BACKOFF_SECONDS = float(os.environ.get('TIKTOK_HTTP_BACKOFF_SECONDS', 0.5))
+TIKTOK_HTTP_MAX_BACKOFF_SECONDS = float(os.environ.get('TIKTOK_HTTP_MAX_BACKOFF_SECONDS', 8))
+
+# (connect timeout, read timeout) in seconds, and whether a request may be
+# safely repeated after the server could have received it
+ENDPOINT_POLICIES = {
+    '/oauth/token/': {'timeout': (5, 15), 'idempotent': False},
+    '/oauth/revoke/': {'timeout': (5, 15), 'idempotent': True},
+    '/user/info/': {'timeout': (5, 10), 'idempotent': True},
+    '/post/publish/creator_info/query/': {'timeout': (5, 10), 'idempotent': True},
+    '/post/publish/video/init/': {'timeout': (5, 30), 'idempotent': False},
+    '/post/publish/status/fetch/': {'timeout': (5, 10), 'idempotent': True},
+}
+DEFAULT_POLICY = {'timeout': (5, 30), 'idempotent': False}
+UPLOAD_POLICY = {'timeout': (10, 300), 'idempotent': True}
+
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+
+class TikTokClient:
+    """
+    Thin wrapper around a pooled requests.Session.
+
+    Methods return the requests.Response so callers keep their existing
+    status_code / json() handling; transient failures are retried here.
+    """
+
+    def __init__(self, base_url=TIKTOK_BASE_URL, pool_size=TIKTOK_HTTP_POOL_SIZE,
+                 max_retries=TIKTOK_HTTP_MAX_RETRIES):
+        self.base_url = base_url.rstrip('/')
+        self.max_retries = max(0, max_retries)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _policy(self, path):
+        if path.startswith('http'):
+            for endpoint, policy in ENDPOINT_POLICIES.items():
+                if path.endswith(endpoint):
+                    return policy
+            return UPLOAD_POLICY
+        return ENDPOINT_POLICIES.get(path, DEFAULT_POLICY)
+
+    @staticmethod
+    def _error_code(response):
+        try:
+            return response.json().get('error', {}).get('code')
+        except (ValueError, AttributeError):
+            return None
+
+    @staticmethod
+    def _never_sent(error):
+        """True when the connection could not be established, so TikTok never saw the request"""
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+
+    def _should_retry_response(self, response, idempotent):
+        """
+        Decide whether a completed HTTP response is worth retrying.
+
+        Any response means TikTok received the request, and an error body does
+        not prove nothing was created (e.g. a post initialized before a
+        temporary_error), so non-idempotent calls are never retried here; they
+        are only replayed when the connection was never established.
+        """
+        if response.status_code < 400 or not idempotent:
+            return False
+
+        error_code = self._error_code(response)
+        if error_code and TikTokAPIErrorHandler.should_retry(error_code):
+            return True
+
+        return response.status_code in RETRYABLE_STATUS_CODES
+
+    @staticmethod
+    def _backoff(attempt, response=None):
+        """Exponential backoff with jitter, honouring Retry-After when present"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), TIKTOK_HTTP_MAX_BACKOFF_SECONDS)
+
+        delay = TIKTOK_HTTP_BACKOFF_SECONDS * (2 ** attempt)
+        return min(delay, TIKTOK_HTTP_MAX_BACKOFF_SECONDS) * random.uniform(0.5, 1.0)
+
+    def request(self, method, path, access_token=None, headers=None, timeout=None,
+                max_retries=None, **kwargs):
+        """
+        Send a request to the TikTok API.
+
+        Args:
+            method: HTTP method
+            path: API path relative to the v2 base URL (e.g. '/user/info/') or an absolute URL
+            access_token: Bearer token to send, if any
+            headers: Extra headers
+            timeout: Override for the endpoint's (connect, read) timeout
+            max_retries: Override for the number of retries
+            **kwargs: Passed through to requests (json, data, params, ...)
+
+        Returns:
+            requests.Response
+
+        Raises:
+            requests.exceptions.RequestException: When every attempt failed at the transport level
+        """
+        policy = self._policy(path)
+        url = path if path.startswith('http') else f'{self.base_url}{path}'
+        timeout = timeout or policy['timeout']
+        retries = self.max_retries if max_retries is None else max_retries
+
+        request_headers = {}
+        if access_token:
+            request_headers['Authorization'] = f'Bearer {access_token}'
+        if headers:
+            request_headers.update(headers)
+
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, headers=request_headers,
+                                                timeout=timeout, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                # A reset after sending may have reached TikTok, so only replay
+                # non-idempotent calls when the connection was never established
+                if attempt < retries and (policy['idempotent'] or self._never_sent(e)):
+                    delay = self._backoff(attempt)
+                    logger.warning(f"TikTok API {method} {path} connection error ({e}); retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                raise
+            except requests.exceptions.Timeout as e:
+                if attempt < retries and policy['idempotent']:
+                    delay = self._backoff(attempt)
+                    logger.warning(f"TikTok API {method} {path} timed out; retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                raise
+
+            if attempt < retries and self._should_retry_response(response, policy['idempotent']):
+                delay = self._backoff(attempt, response)
+                logger.warning(f"TikTok API {method} {path} returned {response.status_code}; retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            return response
+
+    # Convenience wrappers for the endpoints we use
+
+    def request_token(self, token_params):
+        """Exchange an authorization code or refresh token (/oauth/token/)"""
+        return self.request(
+            'POST', '/oauth/token/',
+            headers={'Content-Type': 'application/x-www-form-urlencoded', 'Cache-Control': 'no-cache'},
+            data=token_params
+        )
+
+    def revoke_token(self, revoke_params):
+        """Revoke an access token (/oauth/revoke/)"""
+        return self.request(
+            'POST', '/oauth/revoke/',
+            headers={'Content-Type': 'application/x-www-form-urlencoded', 'Cache-Control': 'no-cache'},
+            data=revoke_params
+        )
+
+    def user_info(self, access_token, fields):
+        """Get the authorized user's profile (/user/info/)"""
+        return self.request('GET', '/user/info/', access_token=access_token, params={'fields': fields})
+
+    def creator_info(self, access_token):
+        """Query posting capabilities of the creator (/post/publish/creator_info/query/)"""
+        return self.request(
+            'POST', '/post/publish/creator_info/query/', access_token=access_token,
+            headers={'Content-Type': 'application/json; charset=UTF-8'}
+        )
+
+    def publish_video_init(self, access_token, request_body, timeout=None):
+        """Initialize a video post (/post/publish/video/init/)"""
+        return self.request(
+            'POST', '/post/publish/video/init/', access_token=access_token,
+            headers={'Content-Type': 'application/json; charset=UTF-8'},
+            json=request_body, timeout=timeout
+        )
+
+    def publish_status(self, access_token, publish_id):
+        """Fetch the status of a post (/post/publish/status/fetch/)"""
+        return self.request(
+            'POST', '/post/publish/status/fetch/', access_token=access_token,
+            headers={'Content-Type': 'application/json; charset=UTF-8'},
+            json={'publish_id': publish_id}
+        )
+
+    def upload(self, upload_url, data, headers):
+        """PUT video bytes to an upload_url returned by video/init"""
+        return self.request('PUT', upload_url, headers=headers, data=data)
+
+
+# Shared client - one connection pool per process
+tiktok_client = TikTokClient()
@@ -0,0 +1,226 @@
+"""
+TikTok Token Refresh
+Shared token-update logic and a bulk refresh engine for expiring accounts
+"""
+
+import os
+import time
+import zlib
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+
+from models import TikTokAccount
+from tiktok_client import tiktok_client
+from job_metrics import RunMetrics
+
+logger = logging.getLogger(__name__)
+
+# Refresh engine settings (overridable per deployment)
+TOKEN_REFRESH_WORKERS = int(os.environ.get('TOKEN_REFRESH_WORKERS', 16))
+TOKEN_REFRESH_WINDOW_HOURS = float(os.environ.get('TOKEN_REFRESH_WINDOW_HOURS', 12))
+# Refreshes are spread over this many seconds instead of firing all at once
+TOKEN_REFRESH_SPREAD_SECONDS = float(os.environ.get('TOKEN_REFRESH_SPREAD_SECONDS', 900))
+# Tokens closer than this to expiry are refreshed immediately, without jitter
+TOKEN_REFRESH_SAFETY_MARGIN_SECONDS = float(os.environ.get('TOKEN_REFRESH_SAFETY_MARGIN_SECONDS', 1800))
+
+
+def build_refresh_params(refresh_token):
+    """Form parameters for a refresh_token grant on /oauth/token/"""
+    return {
+        'client_key': os.environ.get('TIKTOK_CLIENT_KEY'),
+        'client_secret': os.environ.get('TIKTOK_CLIENT_SECRET'),
+        'grant_type': 'refresh_token',
+        'refresh_token': refresh_token
+    }
+
+
+def apply_token_response(account, token_data, now=None):
+    """
+    Copy a successful /oauth/token/ response onto a TikTokAccount (no commit).
+
+    As per TikTok docs the refresh_token may change on every refresh, so the
+    returned one always replaces the stored one.
+
+    Returns:
+        bool: True when the response carried an access token and was applied
+    """
+    # Older responses wrapped the token fields in 'data'
+    if 'access_token' not in token_data and isinstance(token_data.get('data'), dict):
+        token_data = token_data['data']
+
+    if not token_data.get('access_token'):
+        return False
+
+    now = now or datetime.utcnow()
+    account.access_token = token_data['access_token']
+
+    if token_data.get('refresh_token'):
+        if account.refresh_token != token_data['refresh_token']:
+            logger.info(f"Refresh token changed for account {account.username}, updating to new token")
+        account.refresh_token = token_data['refresh_token']
+
+    if 'expires_in' in token_data:
+        account.token_expires_at = now + timedelta(seconds=token_data['expires_in'])
+
+    if 'refresh_expires_in' in token_data:
+        account.refresh_token_expires_at = now + timedelta(seconds=token_data['refresh_expires_in'])
+
+    if 'scope' in token_data:
+        account.scope = token_data['scope']
+
+    return True
+
+
+def request_refresh(refresh_token):
+    """
+    Call /oauth/token/ with a refresh_token grant. Does not touch the database.
+
+    Returns:
+        tuple: (status_code, token_data dict, latency_ms)
+    """
+    started = time.monotonic()
+    response = tiktok_client.request_token(build_refresh_params(refresh_token))
+    try:
+        token_data = response.json()
+    except ValueError:
+        token_data = {}
+    return response.status_code, token_data, (time.monotonic() - started) * 1000
+
+
+def refresh_jitter(account_id, spread_seconds):
+    """Deterministic per-account offset in [0, spread_seconds) so runs are repeatable"""
+    if spread_seconds <= 0:
+        return 0.0
+    return (zlib.crc32(str(account_id).encode()) % 10000) / 10000 * spread_seconds
+
+
+class TokenRefreshEngine:
+    """
+    Refreshes every token that expires within the refresh window.
+
+    HTTP calls run on a bounded thread pool; all ORM reads and writes stay on
+    the calling thread. Refresh tokens rotate and the old one stops working,
+    so each account is committed as soon as its new tokens arrive rather than
+    held in an open transaction. The session stops expiring objects on commit
+    for the run, so those per-account commits don't reload every remaining
+    account with its own SELECT. Each account's refresh is delayed by a
+    stable jitter so TikTok sees a spread-out stream of requests, but never
+    past its token's expiry minus the safety margin.
+    """
+
+    def __init__(self, max_workers=TOKEN_REFRESH_WORKERS, window_hours=TOKEN_REFRESH_WINDOW_HOURS,
+                 spread_seconds=TOKEN_REFRESH_SPREAD_SECONDS,
+                 safety_margin_seconds=TOKEN_REFRESH_SAFETY_MARGIN_SECONDS):
+        self.max_workers = max(1, max_workers)
+        self.window = timedelta(hours=window_hours)
+        self.spread_seconds = spread_seconds
+        self.safety_margin_seconds = safety_margin_seconds
+
+    def _plan(self, accounts, now):
+        """
+        Returns:
+            list: (delay_seconds, account) sorted by delay
+        """
+        plan = []
+        for account in accounts:
+            seconds_left = (account.token_expires_at - now).total_seconds() - self.safety_margin_seconds
+            delay = min(refresh_jitter(account.id, self.spread_seconds), max(0.0, seconds_left))
+            plan.append((delay, account))
+        plan.sort(key=lambda item: item[0])
+        return plan
+
+    @staticmethod
+    def _commit(session, account, metrics):
+        """Persist one account's rotated tokens right away"""
+        account_id = account.id
+        try:
+            session.commit()
+            metrics.incr('committed')
+        except Exception as e:
+            session.rollback()
+            metrics.incr('commit_failed')
+            logger.error(f"Failed to save refreshed tokens for account {account_id}; "
+                         f"it may need to be reconnected: {str(e)}")
+
+    def run(self, session):
+        """
+        Refresh all expiring tokens using the given SQLAlchemy session.
+
+        The session's expire_on_commit is switched off while the run is in
+        progress and restored afterwards.
+
+        Returns:
+            dict: Run metrics (refreshed / failed counts, latency percentiles)
+        """
+        expire_on_commit = session.expire_on_commit
+        session.expire_on_commit = False
+        try:
+            return self._run(session)
+        finally:
+            session.expire_on_commit = expire_on_commit
+
+    def _run(self, session):
+        metrics = RunMetrics('refresh_access_tokens')
+        now = datetime.utcnow()
+
+        accounts = session.query(TikTokAccount).filter(
+            TikTokAccount.is_active == True,
+            TikTokAccount.token_expires_at < now + self.window,
+            TikTokAccount.refresh_token.isnot(None)
+        ).all()
+
+        logger.info(f"Found {len(accounts)} accounts needing token refresh")
+        metrics.incr('candidates', len(accounts))
+
+        plan = self._plan(accounts, now)
+        started = time.monotonic()
+        in_flight = {}
+
+        def drain(timeout):
+            if not in_flight:
+                if timeout:
+                    time.sleep(timeout)
+                return
+            done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                account = in_flight.pop(future)
+                if self._apply_result(account, future, metrics):
+                    self._commit(session, account, metrics)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='token-refresh') as executor:
+            for delay, account in plan:
+                # Keep collecting results while waiting for this account's slot
+                while time.monotonic() - started < delay:
+                    drain(delay - (time.monotonic() - started))
+                # Only queue what the pool can start soon, so a slow TikTok doesn't pile up work
+                while len(in_flight) >= self.max_workers * 2:
+                    drain(None)
+                in_flight[executor.submit(request_refresh, account.refresh_token)] = account
+
+            while in_flight:
+                drain(None)
+
+        summary = metrics.summary()
+        logger.info(f"Token refresh run finished: {summary}")
+        return summary
+
+    @staticmethod
+    def _apply_result(account, future, metrics):
+        """Apply one finished refresh to its account. Returns True when the row changed."""
+        try:
+            status_code, token_data, latency_ms = future.result()
+        except Exception as e:
+            metrics.incr('failed')
+            logger.error(f"Error refreshing token for @{account.username}: {str(e)}")
+            return False
+
+        metrics.observe(latency_ms)
+        if status_code == 200 and apply_token_response(account, token_data):
+            metrics.incr('refreshed')
+            return True
+
+        metrics.incr('failed')
+        error = token_data.get('error')
+        logger.error(f"Failed to refresh token for @{account.username}: {status_code} {error or 'Invalid response'}")
+        return False
@@ -0,0 +1,149 @@
+"""
+User Loader Cache
+Serves Flask-Login's user_loader from a short-lived per-process snapshot (or,
+optionally, from the signed session cookie) instead of querying users on
+every authenticated request
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from flask import session, has_request_context
+from flask_login import user_logged_in, user_logged_out
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+
+from models import db, User
+
+logger = logging.getLogger(__name__)
+
+# Cache settings (overridable per deployment). Other instances only see a
+# password change or deactivation once their entry expires, so keep the TTL short.
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', 30))
+USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 10000))
+# Carry the user's identity in the signed session cookie instead of process memory
+USER_SESSION_SNAPSHOT = os.environ.get('USER_SESSION_SNAPSHOT', '0') == '1'
+USER_SESSION_SNAPSHOT_TTL_SECONDS = float(os.environ.get('USER_SESSION_SNAPSHOT_TTL_SECONDS', 300))
+
+SESSION_SNAPSHOT_KEY = '_user_snapshot'
+# Only these go into the cookie (it is signed, not encrypted); other columns load on first access
+SESSION_SNAPSHOT_FIELDS = ('id', 'email', 'is_active', 'is_verified')
+# Never cached anywhere; check_password() loads it when needed
+UNCACHED_FIELDS = {'password_hash'}
+
+
+class UserCache:
+    """
+    TTL + LRU cache of user column values keyed by id.
+
+    A hit rebuilds the User as a detached instance and merges it into the
+    request's session with load=False, so no SELECT is issued, yet lazy
+    relationships and later writes behave as if the user had been queried.
+    Entries are evicted when a User row is updated or deleted in this process
+    and on logout; other processes rely on the TTL.
+    """
+
+    def __init__(self, ttl_seconds=USER_CACHE_TTL_SECONDS, max_entries=USER_CACHE_MAX_ENTRIES,
+                 session_snapshot=USER_SESSION_SNAPSHOT):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.session_snapshot = session_snapshot
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        user_logged_in.connect(self._on_login, app)
+        user_logged_out.connect(self._on_logout, app)
+
+    @staticmethod
+    def _snapshot(user, fields=None):
+        columns = fields or [column.key for column in User.__table__.columns if column.key not in UNCACHED_FIELDS]
+        return {name: getattr(user, name) for name in columns}
+
+    @staticmethod
+    def _attach(values):
+        """Turn cached column values into a persistent User in the current session, without a query"""
+        user = User(**values)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    def load(self, user_id):
+        """
+        user_loader implementation.
+
+        Returns:
+            User or None
+        """
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+
+        if self.session_snapshot:
+            snapshot = session.get(SESSION_SNAPSHOT_KEY)
+            if (snapshot and snapshot.get('values', {}).get('id') == user_id
+                    and time.time() - snapshot.get('issued_at', 0) < USER_SESSION_SNAPSHOT_TTL_SECONDS):
+                return self._attach(snapshot['values'])
+        else:
+            with self._lock:
+                entry = self._entries.get(user_id)
+                if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds:
+                    self._entries.move_to_end(user_id)
+                    values = entry[1]
+                else:
+                    values = None
+            if values is not None:
+                return self._attach(values)
+
+        user = db.session.get(User, user_id)
+        if user is not None:
+            self._remember(user)
+        return user
+
+    def _remember(self, user):
+        if self.session_snapshot:
+            session[SESSION_SNAPSHOT_KEY] = {
+                'values': self._snapshot(user, SESSION_SNAPSHOT_FIELDS),
+                'issued_at': time.time()
+            }
+            return
+
+        values = self._snapshot(user)
+        with self._lock:
+            self._entries[user.id] = (time.monotonic(), values)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """Drop a user's cached snapshot (this process and, when in a request, this session)"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+        if self.session_snapshot and has_request_context():
+            snapshot = session.get(SESSION_SNAPSHOT_KEY)
+            if snapshot and snapshot.get('values', {}).get('id') == user_id:
+                session.pop(SESSION_SNAPSHOT_KEY, None)
+
+    def _on_login(self, sender, user=None, **extra):
+        self.invalidate(user.id)
+        self._remember(user)
+
+    def _on_logout(self, sender, user=None, **extra):
+        if user is not None and getattr(user, 'id', None) is not None:
+            self.invalidate(user.id)
+        session.pop(SESSION_SNAPSHOT_KEY, None)
+
+
+# Shared cache - one per process
+user_cache = UserCache()
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _evict_changed_user(mapper, connection, target):
+    # Password changes, deactivation and deletes must not be served from cache
+    user_cache.invalidate(target.id)
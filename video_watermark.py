@@ -1,10 +1,213 @@
 """
 Video Watermarking Script
-Adds a logo watermark to videos with animation effects using moviepy
+Adds a logo watermark to videos with animation effects, using a native ffmpeg
+filter graph when ffmpeg is available and moviepy otherwise
 """
 
-from moviepy.editor import VideoFileClip, ImageClip, CompositeVideoClip
 import os
+import re
+import json
+import queue
+import shutil
+import subprocess
+import threading
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from logo_cache import logo_cache
+
+# "auto" uses ffmpeg when it can be found and falls back to moviepy
+WATERMARK_ENGINE = os.environ.get('WATERMARK_ENGINE', 'auto')
+WATERMARK_X264_PRESET = os.environ.get('WATERMARK_X264_PRESET', 'medium')
+# Videos rendered at once by add_watermark_batch (default: one per core)
+WATERMARK_BATCH_WORKERS = int(os.environ.get('WATERMARK_BATCH_WORKERS', os.cpu_count() or 1))
+
+# Audio codecs the mp4 muxer accepts as-is, so the track can be copied
+MP4_COPYABLE_AUDIO = {'aac', 'mp3', 'ac3', 'eac3', 'alac'}
+
+# Logo position as ffmpeg overlay expressions (W/H: video size, w/h: logo size)
+OVERLAY_POSITIONS = {
+    "bottom_center": ("(W-w)/2", "H-h-{margin}"),
+    "bottom_left": ("{margin}", "H-h-{margin}"),
+    "bottom_right": ("W-w-{margin}", "H-h-{margin}"),
+    "top_center": ("(W-w)/2", "{margin}"),
+    "top_left": ("{margin}", "{margin}"),
+    "top_right": ("W-w-{margin}", "{margin}"),
+    "center": ("(W-w)/2", "(H-h)/2"),
+}
+
+
+def find_ffmpeg():
+    """
+    Locate the ffmpeg binary: PATH first, then the one bundled with imageio-ffmpeg.
+
+    Returns:
+        str or None: Path to ffmpeg
+    """
+    path = shutil.which('ffmpeg')
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+
+def probe_video(video_path, ffmpeg_path=None):
+    """
+    Read the display size, duration and audio codec of a video.
+
+    Uses ffprobe when installed, otherwise parses `ffmpeg -i` output.
+
+    Returns:
+        dict: {'width', 'height', 'duration', 'audio_codec'} (audio_codec None when there is no audio)
+    """
+    ffprobe_path = shutil.which('ffprobe')
+    if ffprobe_path:
+        result = subprocess.run(
+            [ffprobe_path, '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', video_path],
+            capture_output=True, text=True, check=True
+        )
+        info = json.loads(result.stdout)
+        video_stream = next(s for s in info['streams'] if s.get('codec_type') == 'video')
+        audio_stream = next((s for s in info['streams'] if s.get('codec_type') == 'audio'), None)
+
+        rotation = int(float(video_stream.get('tags', {}).get('rotate', 0)))
+        for side_data in video_stream.get('side_data_list', []):
+            if 'rotation' in side_data:
+                rotation = int(float(side_data['rotation']))
+
+        width, height = video_stream['width'], video_stream['height']
+        if abs(rotation) % 180 == 90:
+            width, height = height, width
+
+        return {
+            'width': width,
+            'height': height,
+            'duration': float(info.get('format', {}).get('duration') or video_stream.get('duration') or 0),
+            'audio_codec': audio_stream.get('codec_name') if audio_stream else None
+        }
+
+    result = subprocess.run([ffmpeg_path or find_ffmpeg(), '-hide_banner', '-i', video_path],
+                            capture_output=True, text=True)
+    output = result.stderr
+
+    size = re.search(r'Stream #\S+.*?: Video: .*?[ ,](\d{2,5})x(\d{2,5})', output)
+    if not size:
+        raise RuntimeError(f"Could not read video stream info from {video_path}")
+    width, height = int(size.group(1)), int(size.group(2))
+
+    rotation = re.search(r'rotat(?:e\s*:|ion of)\s*(-?[\d.]+)', output)
+    if rotation and abs(int(float(rotation.group(1)))) % 180 == 90:
+        width, height = height, width
+
+    duration = re.search(r'Duration: (\d+):(\d+):([\d.]+)', output)
+    seconds = (int(duration.group(1)) * 3600 + int(duration.group(2)) * 60 + float(duration.group(3))) if duration else 0
+    audio = re.search(r'Stream #\S+.*?: Audio: (\w+)', output)
+
+    return {'width': width, 'height': height, 'duration': seconds,
+            'audio_codec': audio.group(1) if audio else None}
+
+
+def build_filter_graph(logo_width, start_time, end_time, fade_duration, position, margin):
+    """
+    Build the overlay + fade filter graph: input 0 is the video, input 1 the looped logo.
+
+    Pass logo_width=None when the logo input is already scaled to its final size.
+
+    Returns:
+        str: Value for -filter_complex, with the result labelled [out]
+    """
+    x_expr, y_expr = OVERLAY_POSITIONS.get(position, OVERLAY_POSITIONS["bottom_center"])
+    x_expr, y_expr = x_expr.format(margin=margin), y_expr.format(margin=margin)
+
+    if end_time is None:
+        enable = f"gte(t,{start_time})"
+    else:
+        enable = f"between(t,{start_time},{end_time})"
+
+    logo_chain = "[1:v]format=rgba" if logo_width is None else f"[1:v]scale={logo_width}:-1,format=rgba"
+    if fade_duration and fade_duration > 0:
+        logo_chain += f",fade=t=in:st={start_time}:d={fade_duration}:alpha=1"
+
+    return (
+        f"{logo_chain}[logo];"
+        f"[0:v][logo]overlay=x='{x_expr}':y='{y_expr}':shortest=1:enable='{enable}',format=yuv420p[out]"
+    )
+
+
+def _run_ffmpeg(command, duration, progress_callback=None):
+    """Run ffmpeg, forwarding its -progress output to progress_callback as a 0..1 fraction"""
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+    # stderr is drained on a thread so a chatty ffmpeg can never block on a full pipe
+    stderr_lines = []
+    stderr_reader = threading.Thread(target=lambda: stderr_lines.extend(process.stderr), daemon=True)
+    stderr_reader.start()
+
+    for line in process.stdout:
+        if progress_callback and duration and line.startswith('out_time_us='):
+            value = line.split('=', 1)[1].strip()
+            if value.isdigit():
+                progress_callback(min(1.0, int(value) / 1_000_000 / duration))
+
+    process.wait()
+    stderr_reader.join()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command, stderr=''.join(stderr_lines[-20:]))
+
+
+def _add_watermark_ffmpeg(video_path, output_path, logo_path, start_time, end_time, fade_duration,
+                          logo_scale, position, margin, progress_callback=None, threads=None, ffmpeg_path=None):
+    """Watermark with a single native ffmpeg overlay/fade filter graph"""
+    ffmpeg_path = ffmpeg_path or find_ffmpeg()
+    info = probe_video(video_path, ffmpeg_path)
+    # Pre-scaled once per (logo, video width) and reused across renders
+    logo = logo_cache.get(logo_path, info['width'], logo_scale)
+    print(f"Watermarking with ffmpeg: {info['width']}x{info['height']}, {info['duration']:.2f}s, logo width {logo.width}px")
+
+    filter_graph = build_filter_graph(None, start_time, end_time, fade_duration, position, margin)
+
+    def command(audio_args):
+        return [
+            ffmpeg_path, '-hide_banner', '-nostats', '-y',
+            '-i', video_path,
+            '-loop', '1', '-i', logo.png_path,
+            '-filter_complex', filter_graph,
+            '-map', '[out]', '-map', '0:a:0?',
+            '-c:v', 'libx264', '-preset', WATERMARK_X264_PRESET,
+            *(['-threads', str(threads)] if threads else []),
+            *audio_args,
+            '-movflags', '+faststart',
+            '-progress', 'pipe:1',
+            output_path
+        ]
+
+    if info['audio_codec'] in MP4_COPYABLE_AUDIO:
+        try:
+            _run_ffmpeg(command(['-c:a', 'copy']), info['duration'], progress_callback)
+            return output_path
+        except subprocess.CalledProcessError as e:
+            print(f"Audio stream copy failed, re-encoding audio: {e.stderr}")
+
+    _run_ffmpeg(command(['-c:a', 'aac']), info['duration'], progress_callback)
+    return output_path
+
+
+def _progress_logger(callback):
+    """Build a proglog logger that forwards moviepy's frame-writing progress as a 0..1 fraction"""
+    from proglog import ProgressBarLogger
+
+    class ProgressLogger(ProgressBarLogger):
+        def bars_callback(self, bar, attr, value, old_value=None):
+            if bar == 't' and attr == 'index':
+                total = self.bars[bar].get('total')
+                if total:
+                    callback(min(1.0, value / total))
+
+    return ProgressLogger()
 
 
 def add_watermark(
@@ -16,7 +219,11 @@ def add_watermark(
     fade_duration: float = 1.0,
     logo_scale: float = 0.15,
     position: str = "bottom_center",
-    margin: int = 20
+    margin: int = 20,
+    progress_callback=None,
+    engine: str = None,
+    temp_dir: str = None,
+    threads: int = None
 ):
     """
     Add an animated watermark to a video.
@@ -31,11 +238,51 @@ def add_watermark(
         logo_scale (float): Scale of logo relative to video width (default: 0.15 = 15% of video width)
         position (str): Position of logo - "bottom_center", "bottom_left", "bottom_right", etc.
         margin (int): Margin from edges in pixels (default: 20)
+        progress_callback (callable): Called with the encode progress as a fraction 0..1 (optional)
+        engine (str): "ffmpeg", "moviepy" or "auto" (default: WATERMARK_ENGINE, "auto")
+        temp_dir (str): Directory for intermediate files (default: the output's directory)
+        threads (int): Encoder thread limit (default: None = let the encoder decide)
 
     Returns:
         str: Path to the output video file
     """
 
+    # Generate output path if not provided
+    if output_path is None:
+        base_name = os.path.splitext(video_path)[0]
+        output_path = f"{base_name}_watermarked.mp4"
+
+    engine = engine or WATERMARK_ENGINE
+    temp_dir = temp_dir or os.path.dirname(os.path.abspath(output_path))
+    options = dict(
+        video_path=video_path, output_path=output_path, logo_path=logo_path,
+        start_time=start_time, end_time=end_time, fade_duration=fade_duration,
+        logo_scale=logo_scale, position=position, margin=margin,
+        progress_callback=progress_callback, threads=threads
+    )
+
+    if engine in ("auto", "ffmpeg"):
+        ffmpeg_path = find_ffmpeg()
+        if ffmpeg_path:
+            try:
+                result = _add_watermark_ffmpeg(ffmpeg_path=ffmpeg_path, **options)
+                print("Watermarking complete!")
+                return result
+            except (subprocess.CalledProcessError, RuntimeError, OSError) as e:
+                if engine == "ffmpeg":
+                    raise
+                print(f"ffmpeg watermarking failed, falling back to moviepy: {e}")
+        elif engine == "ffmpeg":
+            raise RuntimeError("ffmpeg engine requested but ffmpeg was not found")
+
+    return _add_watermark_moviepy(temp_dir=temp_dir, **options)
+
+
+def _add_watermark_moviepy(video_path, output_path, logo_path, start_time, end_time, fade_duration,
+                           logo_scale, position, margin, progress_callback=None, threads=None, temp_dir=None):
+    """Watermark by compositing frames in moviepy (fallback engine)"""
+    from moviepy.editor import VideoFileClip, ImageClip, CompositeVideoClip
+
     # Load the video
     print(f"Loading video: {video_path}")
     video = VideoFileClip(video_path)
@@ -45,13 +292,9 @@ def add_watermark(
         end_time = video.duration
         print(f"Watermark will be visible for full video length: {end_time:.2f} seconds")
 
-    # Load the logo
+    # Load the logo, already scaled to the video width (the alpha channel becomes its mask)
     print(f"Loading logo: {logo_path}")
-    logo = ImageClip(logo_path)
-
-    # Calculate logo dimensions based on video width
-    logo_width = int(video.w * logo_scale)
-    logo = logo.resize(width=logo_width)
+    logo = ImageClip(logo_cache.get(logo_path, video.w, logo_scale).rgba)
 
     # Calculate position based on video dimensions
     if position == "bottom_center":
@@ -96,20 +339,18 @@ def add_watermark(
     print("Compositing logo onto video...")
     final_video = CompositeVideoClip([video, logo])
 
-    # Generate output path if not provided
-    if output_path is None:
-        base_name = os.path.splitext(video_path)[0]
-        output_path = f"{base_name}_watermarked.mp4"
-
     # Write the result
     print(f"Writing output to: {output_path}")
     final_video.write_videofile(
         output_path,
         codec='libx264',
         audio_codec='aac',
-        temp_audiofile='temp-audio.m4a',
+        # Unique per render so concurrent renders never share an audio temp file
+        temp_audiofile=os.path.join(temp_dir or '.', f'temp-audio-{uuid.uuid4().hex}.m4a'),
         remove_temp=True,
-        fps=video.fps
+        fps=video.fps,
+        threads=threads,
+        logger=_progress_logger(progress_callback) if progress_callback else 'bar'
     )
 
     # Close clips to free memory
@@ -121,30 +362,105 @@ def add_watermark(
     return output_path
 
 
-def add_watermark_batch(video_paths, **kwargs):
+# Progress queue handed to each batch worker process by the pool initializer
+_batch_events = None
+
+
+def _init_batch_worker(events):
+    global _batch_events
+    _batch_events = events
+
+
+def _watermark_batch_item(index, video_path, kwargs):
+    """Watermark one video of a batch. Runs in a pool process and reports progress events."""
+    last_reported = [0.0]
+
+    def report(progress):
+        # Throttle events to whole-percent steps
+        if progress - last_reported[0] >= 0.01:
+            last_reported[0] = progress
+            _batch_events.put({'index': index, 'status': 'running', 'progress': round(progress, 3)})
+
+    _batch_events.put({'index': index, 'status': 'running', 'progress': 0.0})
+    return add_watermark(video_path, progress_callback=report, **kwargs)
+
+
+def add_watermark_batch(video_paths, max_workers=None, threads_per_video=None, progress_callback=None, **kwargs):
     """
-    Add watermark to multiple videos.
+    Add watermark to multiple videos in parallel on a process pool.
+
+    Each video is rendered in its own process; encoder threads are split
+    between workers so concurrent renders don't oversubscribe the cores.
 
     Args:
         video_paths (list): List of video file paths
+        max_workers (int): Videos rendered at once (default: WATERMARK_BATCH_WORKERS)
+        threads_per_video (int): Encoder threads per video (default: cores / workers)
+        progress_callback (callable): Called with a progress event dict for every
+            state change: {'index', 'video_path', 'status', 'progress', 'output_path',
+            'error', 'completed', 'total'}; status is queued, running, completed or failed
         **kwargs: Arguments to pass to add_watermark function
 
     Returns:
-        list: List of output video paths
+        list: List of output video paths in input order (None for videos that failed)
     """
-    output_paths = []
-
-    for i, video_path in enumerate(video_paths, 1):
-        print(f"\n{'='*60}")
-        print(f"Processing video {i}/{len(video_paths)}")
-        print(f"{'='*60}")
-
-        try:
-            output_path = add_watermark(video_path, **kwargs)
-            output_paths.append(output_path)
-        except Exception as e:
-            print(f"Error processing {video_path}: {str(e)}")
-            output_paths.append(None)
+    total = len(video_paths)
+    if total == 0:
+        return []
+
+    workers = max(1, min(max_workers or WATERMARK_BATCH_WORKERS, total))
+    if threads_per_video is None:
+        threads_per_video = max(1, (os.cpu_count() or 1) // workers)
+    kwargs = dict(kwargs, threads=threads_per_video)
+    kwargs.pop('progress_callback', None)
+
+    output_paths = [None] * total
+    state = [{'progress': 0.0, 'output_path': None, 'error': None} for _ in video_paths]
+    completed = 0
+
+    def emit(index, status, **changes):
+        state[index].update(changes)
+        event = {'index': index, 'video_path': video_paths[index], 'status': status,
+                 **state[index], 'completed': completed, 'total': total}
+        if progress_callback:
+            progress_callback(event)
+        elif status in ('completed', 'failed'):
+            detail = event['output_path'] if status == 'completed' else event['error']
+            print(f"[{completed}/{total}] {status}: {video_paths[index]} -> {detail}")
+
+    context = multiprocessing.get_context('spawn')
+    events = context.Queue()
+
+    def drain_events():
+        while True:
+            try:
+                event = events.get_nowait()
+            except queue.Empty:
+                return
+            # Progress that arrives after a video finished is stale
+            if output_paths[event['index']] is None and state[event['index']]['error'] is None:
+                emit(event['index'], event['status'], progress=event['progress'])
+
+    print(f"Watermarking {total} videos with {workers} workers, {threads_per_video} encoder threads each")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_batch_worker, initargs=(events,)) as executor:
+        futures = {}
+        for index, video_path in enumerate(video_paths):
+            futures[executor.submit(_watermark_batch_item, index, video_path, kwargs)] = index
+            emit(index, 'queued')
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            drain_events()
+            for future in done:
+                index = futures[future]
+                completed += 1
+                try:
+                    output_paths[index] = future.result()
+                    emit(index, 'completed', progress=1.0, output_path=output_paths[index])
+                except Exception as e:
+                    emit(index, 'failed', error=str(e) or type(e).__name__)
 
     return output_paths
 